@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import platform
+import time
+from typing import Dict, List, Optional, Tuple
+
+from shared.exceptions import StreamError
+from shared.models import EdgeNodeCapabilities, StreamConfig
+from shared.logger import edge_node_logger as logger
+
+# Seconds spent measuring all resolution/encoding combinations together
+DEFAULT_BUDGET = 10.0
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "ministream")
+# Bump when the measurement changes, so results cached by older versions are not reused
+CALIBRATION_VERSION = 1
+
+
+def hardware_fingerprint(capabilities: EdgeNodeCapabilities, hal_name: str) -> str:
+    """
+    Identify the hardware a calibration was measured on: the HAL, what it
+    reports about the device, its sensors and encoders, and the host CPU.
+    """
+    identity = {
+        'version': CALIBRATION_VERSION,
+        'hal': hal_name,
+        'node_type': capabilities.node_type,
+        'hardware_info': capabilities.hardware_info,
+        'sensors': [sensor.dict() for sensor in capabilities.sensors],
+        'encodings': sorted(capabilities.supported_encodings),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count()
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class Calibrator:
+    """
+    Measures the frame rate the node sustains for each resolution and
+    encoding its HAL advertises, so the limits it publishes are ones it can
+    actually deliver rather than the hardcoded sensor maximum.
+
+    Each combination is streamed through the HAL for an equal share of the
+    time budget and the captured frames are counted. Results are cached on
+    disk keyed by the hardware fingerprint, so only the first start on a
+    given device pays for the measurement.
+    """
+
+    def __init__(self, hal, budget: float = DEFAULT_BUDGET, cache_dir: str = DEFAULT_CACHE_DIR,
+                 refresh: bool = False):
+        """
+        Args:
+            hal: The HAL to measure. It must not be streaming.
+            budget (float): Seconds to spend measuring, shared by all combinations.
+            cache_dir (str): Directory of the cached results.
+            refresh (bool): Measure again even if cached results exist.
+        """
+        self.hal = hal
+        self.budget = budget
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.refresh = refresh
+
+    @classmethod
+    def from_config(cls, hal, config: Optional[Dict]) -> Optional["Calibrator"]:
+        """Build a Calibrator from the edge config's calibration section, or None if disabled."""
+        if not config or not config.get('enabled', False):
+            return None
+        return cls(
+            hal,
+            budget=config.get('budget', DEFAULT_BUDGET),
+            cache_dir=config.get('cache_dir', DEFAULT_CACHE_DIR),
+            refresh=config.get('refresh', False)
+        )
+
+    def cache_path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"calibration-{fingerprint}.json")
+
+    def limits(self, capabilities: Optional[EdgeNodeCapabilities] = None) -> Dict[str, Dict[str, float]]:
+        """
+        The measured limits, from the cache when possible. Blocks for up to
+        the time budget; run it in an executor.
+
+        Args:
+            capabilities (EdgeNodeCapabilities, optional): The HAL's capabilities, if
+                already known; probed from the HAL otherwise.
+
+        Returns:
+            dict: Highest sustainable fps by resolution and encoding, capped at
+            each sensor's max_fps.
+        """
+        capabilities = capabilities or self.hal.probe_capabilities()
+        limits = self.cached_limits(capabilities)
+        if limits is not None:
+            return limits
+        fingerprint = hardware_fingerprint(capabilities, type(self.hal).__name__)
+        path = self.cache_path(fingerprint)
+        measured = self.measure(capabilities)
+        limits = {}
+        for (resolution, encoding), fps in measured.items():
+            sensor_fps = max(sensor.max_fps for sensor in capabilities.sensors if resolution in sensor.resolutions)
+            limits.setdefault(resolution, {})[encoding] = round(min(fps, sensor_fps), 1)
+        unmeasured = len(self.combinations(capabilities)) - len(measured)
+        if unmeasured:
+            # An incomplete calibration is not cached, so the next start measures again
+            logger.warning(f"{unmeasured} combinations failed to calibrate; not caching the limits")
+        else:
+            self._save(path, fingerprint, measured, limits)
+        return limits
+
+    def cached_limits(self, capabilities: EdgeNodeCapabilities) -> Optional[Dict[str, Dict[str, float]]]:
+        """The limits cached for this hardware, or None if it must be measured. Does not touch the HAL."""
+        if self.refresh:
+            return None
+        path = self.cache_path(hardware_fingerprint(capabilities, type(self.hal).__name__))
+        try:
+            with open(path) as f:
+                limits = json.load(f)['limits']
+        except (OSError, ValueError, KeyError):
+            return None
+        logger.info(f"Using cached calibration {path}")
+        return limits
+
+    @staticmethod
+    def combinations(capabilities: EdgeNodeCapabilities) -> List[Tuple[str, str]]:
+        """Every resolution/encoding combination the HAL reports, in a stable order."""
+        return sorted({(resolution, encoding)
+                       for sensor in capabilities.sensors for resolution in sensor.resolutions
+                       for encoding in capabilities.supported_encodings})
+
+    def measure(self, capabilities: EdgeNodeCapabilities) -> Dict[Tuple[str, str], float]:
+        """
+        Stream every resolution/encoding combination for its share of the
+        budget and return the frame rate each achieved. Combinations that
+        fail to stream are left out.
+        """
+        combinations = self.combinations(capabilities)
+        if not combinations:
+            return {}
+        max_fps = max(sensor.max_fps for sensor in capabilities.sensors)
+        share = self.budget / len(combinations)
+        measured = {}
+        for resolution, encoding in combinations:
+            config = StreamConfig(resolution=resolution, fps=max_fps, encoding=encoding)
+            try:
+                measured[(resolution, encoding)] = self._throughput(config, share)
+            except StreamError as e:
+                # Left unmeasured rather than cached as 0 fps, so a transient failure is not a permanent limit
+                logger.warning(f"Calibrating {resolution} {encoding} failed: {str(e)}")
+        logger.info("Calibrated " + ", ".join(f"{resolution} {encoding}: {fps:.1f} fps"
+                                              for (resolution, encoding), fps in measured.items()))
+        return measured
+
+    def _throughput(self, config: StreamConfig, duration: float) -> float:
+        self.hal.start_stream(config)
+        try:
+            # The first frame pays for pipeline start-up, so timing starts after it
+            self.hal.get_frame()
+            frames = 0
+            started = time.perf_counter()
+            deadline = started + duration
+            while True:
+                self.hal.get_frame()
+                frames += 1
+                now = time.perf_counter()
+                if now >= deadline:
+                    return frames / (now - started)
+        finally:
+            self.hal.stop_stream()
+
+    def _save(self, path: str, fingerprint: str, measured: Dict[Tuple[str, str], float],
+              limits: Dict[str, Dict[str, float]]) -> None:
+        record = {
+            'fingerprint': fingerprint,
+            'measured_at': time.time(),
+            'budget': self.budget,
+            'measured_fps': {f"{resolution}/{encoding}": round(fps, 1) for (resolution, encoding), fps in measured.items()},
+            'limits': limits
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, 'w') as f:
+                json.dump(record, f, indent=2)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Could not cache calibration in {path}: {str(e)}")
@@ -1,8 +1,10 @@
+import time
 import zmq
 import zmq.asyncio
 from shared.models import StreamConfig, DeviceStatus
-from shared.exceptions import ConfigurationError, StreamError
 from shared.logger import edge_node_logger as logger
+from shared.serialization import dumps, loads, model_dict
+from edge_node.src.profiler import ProfilerControl, DEFAULT_INTERVAL_MS
 
 class Controller:
     """
@@ -11,7 +13,7 @@ class Controller:
     and provides status information about the device.
     """
 
-    def __init__(self, sensor_manager, streamer, config):
+    def __init__(self, sensor_manager, streamer, config, data_plane=None, loop_lag=None, measured_limits=None):
         """
         Initialize the Controller with necessary components and configuration.
 
@@ -19,10 +21,20 @@ class Controller:
             sensor_manager: The SensorManager instance for managing sensors.
             streamer: The Streamer instance for managing video streams.
             config (dict): Configuration dictionary for the Controller.
+            data_plane (DataPlane, optional): The thread running the streamer; changes to
+                the streamer are made there. Without one they are made inline.
+            loop_lag (dict, optional): LoopLagMonitor per event loop name, reported with latency.
+            measured_limits (dict, optional): Calibrated fps limits by resolution and encoding;
+                configurations above them are rejected.
         """
         self.sensor_manager = sensor_manager
         self.streamer = streamer
         self.config = config
+        self.data_plane = data_plane
+        self.loop_lag = loop_lag or {}
+        self.measured_limits = measured_limits or {}
+        # On-demand sampling profiler, disabled unless config['profiling']['enabled'] is set
+        self.profiler = ProfilerControl(self.config.get('profiling'))
         self.context = zmq.asyncio.Context()
         self.socket = self.context.socket(zmq.REP)
         self.socket.bind(f"tcp://*:{self.config.get('port', 5555)}")
@@ -35,30 +47,72 @@ class Controller:
         """
         logger.info("Controller starting")
         while True:
-            message = await self.socket.recv_json()
+            message = loads(await self.socket.recv())
+            received_at = time.monotonic()
             logger.debug(f"Received message: {message}")
-            response = await self.handle_message(message)
-            await self.socket.send_json(response)
+            try:
+                response = await self.handle_message(message, received_at)
+            except Exception as e:
+                # A failed request must still get a reply, or the REP socket stops accepting requests
+                logger.error(f"Error handling {message.get('type')} request: {str(e)}", exc_info=True)
+                response = {'error': f"Error handling request: {str(e)}"}
+            await self.socket.send(dumps(response))
             logger.debug(f"Sent response: {response}")
 
-    async def handle_message(self, message):
+    async def handle_message(self, message, received_at=None):
         """
         Process incoming messages based on their type.
 
         Args:
-            message (dict): The incoming message to process.
+            message (dict): The incoming message to process. Its optional 'budget' is the
+                number of seconds the caller waits for the reply.
+            received_at (float, optional): time.monotonic() when the message arrived; now if omitted.
+                The budget counts from then on the node's own clock, which need not agree with the caller's.
 
         Returns:
             dict: The response to the message.
         """
+        budget = message.get('budget')
+        if received_at is None:
+            received_at = time.monotonic()
+        if budget is not None and time.monotonic() > received_at + budget:
+            # The caller has already given up; skip the work and just free the REP socket
+            logger.warning(f"Dropping expired {message['type']} request")
+            return {'error': 'Deadline exceeded'}
         if message['type'] == 'get_status':
             return self.get_status()
         elif message['type'] == 'configure_stream':
             return await self.configure_stream(message['config'])
+        elif message['type'] == 'get_outputs':
+            return await self.get_outputs()
+        elif message['type'] == 'remove_output':
+            return await self.remove_output(message['output'])
+        elif message['type'] == 'get_latency':
+            return self.get_latency()
+        elif message['type'] == 'start_profile':
+            return self.profiler.start(
+                float(message.get('duration', 10.0)),
+                float(message.get('interval_ms', DEFAULT_INTERVAL_MS)),
+                self._profiled_threads()
+            )
+        elif message['type'] == 'stop_profile':
+            return self.profiler.stop()
         else:
             logger.warning(f"Unknown message type: {message['type']}")
             return {'error': 'Unknown message type'}
 
+    def _profiled_threads(self):
+        # Frame work runs on the data plane thread, so it is profiled along with the control loop
+        thread = self.data_plane.thread if self.data_plane is not None else None
+        if thread is None or not thread.is_alive():
+            return {}
+        return {'data_plane': thread.ident}
+
+    async def _on_data_plane(self, function, *args):
+        if self.data_plane is None:
+            return function(*args)
+        return await self.data_plane.call(function, *args)
+
     def get_status(self):
         """
         Retrieve the current status of the device, including sensor information.
@@ -67,42 +121,90 @@ class Controller:
             dict: The device status.
         """
         sensors = self.sensor_manager.get_sensors()
-        status = DeviceStatus(
+        telemetry = {}
+        if self.streamer.change_gate is not None:
+            telemetry['change_detection'] = self.streamer.change_gate.stats()
+        status = model_dict(DeviceStatus(
             id="jetson_edge_node_0",
             status="running",
             sensors=sensors,
-            online=True
-        ).dict()
-        logger.info(f"Device status: {status}")
+            online=True,
+            telemetry=telemetry
+        ))
+        logger.debug(f"Device status: {status}")
         return status
 
+    def get_latency(self):
+        """
+        Retrieve capture-to-hop latency histograms and frame gap counts, and
+        the scheduling lag of the control and data plane event loops.
+
+        Returns:
+            dict: Latency statistics keyed by hop name and sensor id, and lag
+            histograms keyed by loop name.
+        """
+        return {
+            'latency': self.streamer.latency.snapshot(),
+            'loop_lag': {name: monitor.histogram.to_dict() for name, monitor in self.loop_lag.items()}
+        }
+
+    async def get_outputs(self):
+        """
+        Retrieve the configured output streams and the capture feeding them.
+
+        Returns:
+            dict: Output configurations with frames sent, and the capture configuration.
+        """
+        outputs, capture = await self._on_data_plane(
+            lambda: (self.streamer.output_configs(), self.streamer.capture_config)
+        )
+        return {
+            'outputs': outputs,
+            'capture': model_dict(capture) if capture is not None else None
+        }
+
+    async def remove_output(self, name):
+        """
+        Stop a named output stream; the others keep streaming.
+
+        Args:
+            name (str): The output to remove.
+
+        Returns:
+            dict: A status message, or an error if the output is not configured.
+        """
+        try:
+            await self._on_data_plane(self.streamer.remove_output, name)
+        except KeyError:
+            return {'error': f"Unknown output: {name}"}
+        logger.info(f"Removed output {name}")
+        return {'status': 'success'}
+
     async def configure_stream(self, config):
         """
-        Configure the video stream with the provided configuration.
+        Configure one named output stream (config['output'], "default" if
+        omitted). Other outputs keep streaming; the shared capture is only
+        restarted if the new set of outputs needs a different one.
 
         Args:
             config (dict): The stream configuration parameters.
 
         Returns:
-            dict: A status message indicating success or failure.
-
-        Raises:
-            ConfigurationError: If the stream configuration is invalid.
-            StreamError: If there's an error while configuring the stream.
+            dict: A status message, or an error if the configuration is invalid (including
+            above the measured limits or outside the sensor) or the stream could not be configured.
         """
         try:
             stream_config = StreamConfig(**config)
-            logger.info(f"Configuring stream with: {stream_config}")
-            # Update streamer configuration
-            self.streamer.config.update(stream_config.dict())
-            # Restart the stream with new configuration
-            await self.streamer.stop()
-            await self.streamer.run()
-            logger.info("Stream reconfigured and restarted")
+            stream_config.validate_against(await self._on_data_plane(self.streamer.hal.detect_sensors),
+                                           self.measured_limits)
+            logger.info(f"Configuring output {stream_config.output} with: {stream_config}")
+            # The running streamer picks the new output up with the next captured frame
+            capture = await self._on_data_plane(self.streamer.configure_output, stream_config)
+            logger.info(f"Output {stream_config.output} configured, capturing with: {capture}")
             return {'status': 'success'}
         except ValueError as e:
             logger.error(f"Invalid stream configuration: {str(e)}")
-            raise ConfigurationError(f"Invalid stream configuration: {str(e)}")
+            return {'error': f"Invalid stream configuration: {str(e)}"}
         except Exception as e:
             logger.error(f"Error configuring stream: {str(e)}")
-            raise StreamError(f"Error configuring stream: {str(e)}")
+            return {'error': f"Error configuring stream: {str(e)}"}
@@ -0,0 +1,143 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from shared.exceptions import StreamError
+from shared.latency import LatencyHistogram
+from shared.logger import edge_node_logger as logger
+
+DEFAULT_LAG_INTERVAL = 0.05
+# How often the data plane picks up commands from the control plane, in seconds
+COMMAND_POLL_INTERVAL = 0.005
+
+
+class LoopLagMonitor:
+    """
+    Measures how late an event loop wakes a sleeping task, which is how long
+    any ready callback on that loop can be kept waiting.
+
+    Lag is kept in a cumulative histogram for on-demand reports and in a
+    window that take_window() hands over and restarts, for periodic telemetry.
+    """
+
+    def __init__(self, interval: float = DEFAULT_LAG_INTERVAL):
+        self.interval = interval
+        self.histogram = LatencyHistogram()
+        self.window = LatencyHistogram()
+
+    async def run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.monotonic() - expected) * 1000)
+            self.histogram.record(lag_ms)
+            self.window.record(lag_ms)
+
+    def take_window(self) -> Dict:
+        """Summary of the lag since the previous call, then start a new window."""
+        window, self.window = self.window, LatencyHistogram()
+        return {
+            'count': window.count,
+            'p50_ms': window.percentile(50),
+            'p99_ms': window.percentile(99),
+            'max_ms': window.max_ms
+        }
+
+
+class DataPlane:
+    """
+    Runs the Streamer (capture, processing and transports) in a dedicated
+    thread with its own event loop, so a slow capture or frame transform never
+    delays the controller or heartbeats on the control loop.
+
+    The control plane hands work to the data plane through a deque, whose
+    append and popleft are atomic and need no lock; the data plane runs each
+    command between frames and resolves its future, which the control loop
+    awaits. Read-only snapshots (latency, queue depths) are taken directly
+    from the control thread, as they are copied atomically.
+    """
+
+    def __init__(self, streamer, name: str = "data-plane"):
+        self.streamer = streamer
+        self.name = name
+        self.commands: deque = deque()
+        self.lag = LoopLagMonitor()
+        self.thread: Optional[threading.Thread] = None
+        self.accepting = True
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=asyncio.run, args=(self._serve(),), name=self.name, daemon=True)
+        self.thread.start()
+        logger.info(f"Data plane started in thread {self.name}")
+
+    async def _serve(self) -> None:
+        tasks = [asyncio.ensure_future(self.lag.run()), asyncio.ensure_future(self._run_commands())]
+        try:
+            await self.streamer.run()
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Anything appended before this flag flips is still drained below
+            self.accepting = False
+            self._drain()
+
+    async def _run_commands(self) -> None:
+        while True:
+            self._drain()
+            await asyncio.sleep(COMMAND_POLL_INTERVAL)
+
+    def _next_command(self):
+        try:
+            return self.commands.popleft()
+        except IndexError:
+            return None
+
+    def _drain(self) -> None:
+        command = self._next_command()
+        while command is not None:
+            future, function, args = command
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            command = self._next_command()
+
+    def _fail_pending(self) -> None:
+        command = self._next_command()
+        while command is not None:
+            future = command[0]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(StreamError("Data plane is not running"))
+            command = self._next_command()
+
+    def submit(self, function: Callable, *args) -> concurrent.futures.Future:
+        """
+        Run a function on the data plane thread between frames.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the function's result or exception.
+        """
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self.commands.append((future, function, args))
+        if not self.accepting:
+            self._fail_pending()  # The data plane has stopped and will never drain the queue
+        return future
+
+    async def call(self, function: Callable, *args) -> Any:
+        """Run a function on the data plane thread and await its result on the calling loop."""
+        return await asyncio.wrap_future(self.submit(function, *args))
+
+    async def wait(self) -> None:
+        """Wait, without blocking the calling loop, until the data plane thread exits."""
+        if self.thread is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.thread.join)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop streaming and join the data plane thread."""
+        self.submit(setattr, self.streamer, 'running', False)
+        if self.thread is not None:
+            self.thread.join(timeout)
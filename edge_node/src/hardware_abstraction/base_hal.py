@@ -1,8 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
-from shared.models import StreamConfig
+from typing import List, Dict, Optional
+from shared.models import EdgeNodeCapabilities, StreamConfig
+from shared.frames import FrameStamper
 
 class BaseHAL(ABC):
+    def __init__(self):
+        # Stamps captured frames with sequence numbers and capture timestamps
+        self.stamper = FrameStamper()
+        self._capabilities: Optional[EdgeNodeCapabilities] = None
+
     @abstractmethod
     def detect_sensors(self) -> List[Dict]:
         """
@@ -29,10 +35,34 @@ class BaseHAL(ABC):
         Capture and return a single frame from the video stream.
         
         Returns:
-            The captured frame (format may vary depending on the implementation).
+            Frame: The captured frame payload (format may vary depending on the
+            implementation) wrapped with its FrameMetadata, stamped via self.stamper.
         """
         pass
 
+    def frame_delay(self) -> Optional[float]:
+        """
+        Seconds to wait before the next frame is due.
+
+        Returns:
+            Optional[float]: The delay, or None to let the Streamer pace frames
+            by the configured fps.
+        """
+        return None
+
+    def probe_capabilities(self) -> EdgeNodeCapabilities:
+        """
+        The HAL's capabilities, probed on first use only. Sensor detection
+        and encoder discovery can be slow and their results do not change
+        while the node runs.
+
+        Returns:
+            EdgeNodeCapabilities: The result of get_capabilities(); treat it as read-only.
+        """
+        if self._capabilities is None:
+            self._capabilities = self.get_capabilities()
+        return self._capabilities
+
     @abstractmethod
     def stop_stream(self) -> None:
         """
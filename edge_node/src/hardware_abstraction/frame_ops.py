@@ -0,0 +1,64 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from shared.models import StreamConfig
+
+
+class FrameTransform:
+    """
+    Region-of-interest crop and downscale for CPU capture paths.
+
+    The crop is a zero-copy slice of the captured frame. Downscaling uses
+    nearest-neighbour sampling with row and column index arrays precomputed
+    once per configuration, so each frame costs one vectorized gather per axis.
+    """
+
+    def __init__(self, config: StreamConfig, source_size: Optional[Tuple[int, int]] = None):
+        """
+        Precompute the crop window and sampling indices for a stream configuration.
+
+        Args:
+            config (StreamConfig): The stream configuration, already validated.
+            source_size (Tuple[int, int], optional): Width and height of the frames the
+                transform is applied to, when they are captured at a different resolution
+                than config.resolution. The ROI is mapped onto the source frame and the
+                result is scaled to config.output_size().
+        """
+        sensor_width, sensor_height = config.sensor_size()
+        if config.roi:
+            x, y, w, h = config.roi.x, config.roi.y, config.roi.w, config.roi.h
+        else:
+            x, y, w, h = 0, 0, sensor_width, sensor_height
+        source_width, source_height = source_size or (sensor_width, sensor_height)
+        scale_x, scale_y = source_width / sensor_width, source_height / sensor_height
+        self.x, self.y = int(x * scale_x), int(y * scale_y)
+        self.w, self.h = max(1, int(round(w * scale_x))), max(1, int(round(h * scale_y)))
+        self.output_width, self.output_height = config.output_size()
+        self.scaled = (self.output_width, self.output_height) != (self.w, self.h)
+        # Sample at pixel centres; indices are absolute so the gather also performs the crop
+        self.rows = self.y + ((np.arange(self.output_height) + 0.5) * self.h / self.output_height).astype(np.intp)
+        self.cols = self.x + ((np.arange(self.output_width) + 0.5) * self.w / self.output_width).astype(np.intp)
+
+    @property
+    def key(self) -> Tuple[int, ...]:
+        """Crop window and output size; transforms with equal keys produce identical frames."""
+        return self.x, self.y, self.w, self.h, self.output_width, self.output_height
+
+    @property
+    def is_identity(self) -> bool:
+        return not self.scaled and self.x == 0 and self.y == 0
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Crop and scale a captured frame.
+
+        Args:
+            frame (np.ndarray): Frame of shape (H, W) or (H, W, C).
+
+        Returns:
+            np.ndarray: A view when only cropping, otherwise a new scaled array.
+        """
+        if not self.scaled:
+            return frame[self.y:self.y + self.h, self.x:self.x + self.w]
+        # Two single-axis takes are several times faster than one 2-D fancy-index gather
+        return frame.take(self.rows, axis=0).take(self.cols, axis=1)
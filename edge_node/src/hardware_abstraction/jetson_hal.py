@@ -1,4 +1,6 @@
+from typing import Dict, Optional
 from .base_hal import BaseHAL
+from .pipeline_builder import PipelineBuilder, PipelineOptions, encoder_elements
 from shared.models import StreamConfig, EdgeNodeCapabilities, SensorInfo
 import Jetson.GPIO as GPIO
 import gi
@@ -17,18 +19,44 @@ class JetsonHAL(BaseHAL):
     including sensor detection, stream management, and device capabilities.
     """
 
-    def __init__(self):
+    # How long stop_stream() waits for the recording to be finalized
+    EOS_TIMEOUT = 2 * Gst.SECOND
+
+    def __init__(self, pipeline_options: Optional[Dict] = None):
         """
         Initialize the Jetson HAL.
-        Sets up the GStreamer pipeline, generates a unique device ID,
-        and initializes Zeroconf for service discovery.
+        Initializes GStreamer and generates a unique device ID. Encoder
+        discovery and the Zeroconf instance used to announce streams are
+        deferred to first use, so constructing the HAL does not hold up
+        edge node startup.
+
+        Args:
+            pipeline_options (dict, optional): PipelineOptions fields (source, keyframe
+                interval and the network, record and preview branches).
         """
         super().__init__()
         self.pipeline = None
         self.device_id = str(uuid.uuid4())
-        self.zeroconf = Zeroconf()
+        self.pipeline_options = pipeline_options
+        self._pipeline_builder = None
+        self._zeroconf = None
+        self._service_info = None
         Gst.init(None)
-        logger.info("Jetson HAL initialized")
+
+    @property
+    def pipeline_builder(self) -> PipelineBuilder:
+        """The pipeline builder for the encoders present on the device, discovered on first use."""
+        if self._pipeline_builder is None:
+            available = [name for name in encoder_elements() if Gst.ElementFactory.find(name) is not None]
+            self._pipeline_builder = PipelineBuilder(PipelineOptions(**(self.pipeline_options or {})), available)
+            logger.info(f"Jetson HAL found encoders: {', '.join(available) or 'none'}")
+        return self._pipeline_builder
+
+    @property
+    def zeroconf(self) -> Zeroconf:
+        if self._zeroconf is None:
+            self._zeroconf = Zeroconf()
+        return self._zeroconf
 
     def detect_sensors(self):
         """
@@ -64,38 +92,45 @@ class JetsonHAL(BaseHAL):
             StreamError: If there's an error starting the stream.
         """
         try:
-            resolution = config.resolution
-            fps = config.fps
-            encoding = config.encoding
-
-            pipeline_str = (
-                f"v4l2src device=/dev/video0 ! video/x-raw,width={resolution.split('x')[0]},"
-                f"height={resolution.split('x')[1]},framerate={fps}/1 ! tee name=t "
-                f"t. ! queue ! {encoding}enc ! rtph264pay ! udpsink host=224.1.1.1 port=5000 "
-                f"t. ! queue ! {encoding}enc ! mp4mux ! filesink location=/path/to/local/storage/video.mp4"
-            )
+            pipeline_str = self.pipeline_builder.build(config)
+            logger.debug(f"Launching pipeline: {pipeline_str}")
             self.pipeline = Gst.parse_launch(pipeline_str)
             self.pipeline.set_state(Gst.State.PLAYING)
-
-            # Register the service for discovery
-            info = ServiceInfo(
-                "_ministream._tcp.local.",
-                f"Jetson_{self.device_id}._ministream._tcp.local.",
-                addresses=[socket.inet_aton(socket.gethostbyname(socket.gethostname()))],
-                port=5000,
-                properties={"device_id": self.device_id}
-            )
-            self.zeroconf.register_service(info)
+            self._register_service()
             logger.info(f"Stream started with config: {config}")
         except Exception as e:
             logger.error(f"Error starting stream: {str(e)}")
             raise StreamError(f"Error starting stream: {str(e)}")
 
+    def _register_service(self):
+        """
+        Register the service for discovery on the first stream start. It stays
+        registered across restarts, as Zeroconf rejects a second registration
+        of the same name.
+        """
+        if self._service_info is not None:
+            return
+        info = ServiceInfo(
+            "_ministream._tcp.local.",
+            f"Jetson_{self.device_id}._ministream._tcp.local.",
+            addresses=[socket.inet_aton(socket.gethostbyname(socket.gethostname()))],
+            port=5000,
+            properties={"device_id": self.device_id}
+        )
+        self.zeroconf.register_service(info)
+        self._service_info = info
+
     def stop_stream(self):
         """
         Stop the current video stream.
         """
         if self.pipeline:
+            if self.pipeline_builder.options.record.enabled:
+                # mp4mux only writes a playable file once it has seen end-of-stream
+                self.pipeline.send_event(Gst.Event.new_eos())
+                self.pipeline.get_bus().timed_pop_filtered(
+                    self.EOS_TIMEOUT, Gst.MessageType.EOS | Gst.MessageType.ERROR
+                )
             self.pipeline.set_state(Gst.State.NULL)
             self.pipeline = None
             logger.info("Stream stopped")
@@ -124,10 +159,14 @@ class JetsonHAL(BaseHAL):
             hardware_info={
                 "model": "Jetson Nano",
                 "cpu": "Quad-core ARM Cortex-A57",
-                "gpu": "NVIDIA Maxwell architecture with 128 NVIDIA CUDA cores"
+                "gpu": "NVIDIA Maxwell architecture with 128 NVIDIA CUDA cores",
+                "encoders": ", ".join(
+                    self.pipeline_builder.select_encoder(encoding).element
+                    for encoding in self.pipeline_builder.supported_encodings()
+                )
             },
             sensors=self.detect_sensors(),
-            supported_encodings=["h264", "h265"]
+            supported_encodings=self.pipeline_builder.supported_encodings()
         )
 
     def get_frame(self):
@@ -135,7 +174,7 @@ class JetsonHAL(BaseHAL):
         Capture a frame from the video stream.
 
         Returns:
-            bytes: The captured frame data.
+            Frame: The captured frame data stamped with capture metadata.
 
         Raises:
             StreamError: If there's an error capturing the frame.
@@ -143,7 +182,7 @@ class JetsonHAL(BaseHAL):
         try:
             # Implement actual frame capture using GStreamer
             # This is a placeholder and needs to be implemented
-            return b"Actual frame data"
+            return self.stamper.stamp("jetson_camera_0", b"Actual frame data")
         except Exception as e:
             logger.error(f"Error capturing frame: {str(e)}")
             raise StreamError(f"Error capturing frame: {str(e)}")
@@ -154,5 +193,6 @@ class JetsonHAL(BaseHAL):
         Ensures that the stream is stopped and Zeroconf is closed when the object is destroyed.
         """
         self.stop_stream()
-        self.zeroconf.close()
+        if self._zeroconf is not None:
+            self._zeroconf.close()
         logger.info("Jetson HAL destroyed")
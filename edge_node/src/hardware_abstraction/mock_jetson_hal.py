@@ -1,9 +1,13 @@
 import uuid
+import numpy as np
 from .base_hal import BaseHAL
+from .frame_ops import FrameTransform
 from shared.models import StreamConfig, EdgeNodeCapabilities, SensorInfo
 from shared.exceptions import StreamError, SensorError
 from shared.logger import edge_node_logger as logger
 
+DEFAULT_STREAM_CONFIG = StreamConfig(resolution="640x480", fps=30.0, encoding="h264")
+
 class MockJetsonHAL(BaseHAL):
     """
     A mock implementation of the Hardware Abstraction Layer (HAL) for Jetson devices.
@@ -18,6 +22,21 @@ class MockJetsonHAL(BaseHAL):
         super().__init__()
         self.device_id = str(uuid.uuid4())
         self.pipeline = None
+        self._prepare_frames(DEFAULT_STREAM_CONFIG)
+
+    def _prepare_frames(self, config: StreamConfig):
+        """
+        Build the static test pattern for the configured sensor resolution and
+        the ROI/scale transform applied to it on every capture.
+        """
+        width, height = config.sensor_size()
+        pattern = np.empty((height, width, 3), dtype=np.uint8)
+        pattern[..., 0] = np.arange(width) % 256
+        pattern[..., 1] = (np.arange(height) % 256)[:, None]
+        pattern[..., 2] = 128
+        pattern.setflags(write=False)
+        self.sensor_frame = pattern
+        self.transform = FrameTransform(config)
 
     def detect_sensors(self):
         """
@@ -54,6 +73,7 @@ class MockJetsonHAL(BaseHAL):
         """
         try:
             logger.info(f"Starting mock stream with config: {config}")
+            self._prepare_frames(config)
             self.pipeline = "Mock GStreamer pipeline"
         except Exception as e:
             logger.error(f"Error starting mock stream: {str(e)}")
@@ -71,13 +91,14 @@ class MockJetsonHAL(BaseHAL):
         Simulate capturing a frame from the video stream.
 
         Returns:
-            bytes: A mock frame data.
+            Frame: A test-pattern frame of shape (H, W, 3), cropped and scaled
+            per the stream configuration and stamped with capture metadata.
 
         Raises:
             StreamError: If there's an error capturing the frame (simulated).
         """
         try:
-            return b"Mock frame data"
+            return self.stamper.stamp("mock_camera_0", self.transform.apply(self.sensor_frame))
         except Exception as e:
             logger.error(f"Error capturing mock frame: {str(e)}")
             raise StreamError(f"Error capturing mock frame: {str(e)}")
@@ -0,0 +1,185 @@
+from fractions import Fraction
+from typing import Iterable, List, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+from shared.models import StreamConfig
+from shared.exceptions import StreamError
+
+
+class EncoderSpec(NamedTuple):
+    element: str
+    parser: str
+    payloader: str
+    hardware: bool
+    # Encoder-specific property snippets, formatted with the keyframe interval
+    properties: str = ""
+    # Hardware encoders take frames in NVMM memory, converted by nvvidconv
+    nvmm: bool = False
+
+
+# Candidate encoders per encoding, most preferred first
+ENCODERS = {
+    'h264': [
+        EncoderSpec('nvv4l2h264enc', 'h264parse', 'rtph264pay', True,
+                    'insert-sps-pps=true idrinterval={keyframe_interval} iframeinterval={keyframe_interval}', True),
+        EncoderSpec('omxh264enc', 'h264parse', 'rtph264pay', True,
+                    'insert-sps-pps=true iframeinterval={keyframe_interval}', True),
+        EncoderSpec('x264enc', 'h264parse', 'rtph264pay', False,
+                    'tune=zerolatency speed-preset=ultrafast key-int-max={keyframe_interval}'),
+    ],
+    'h265': [
+        EncoderSpec('nvv4l2h265enc', 'h265parse', 'rtph265pay', True,
+                    'insert-sps-pps=true idrinterval={keyframe_interval} iframeinterval={keyframe_interval}', True),
+        EncoderSpec('omxh265enc', 'h265parse', 'rtph265pay', True,
+                    'iframeinterval={keyframe_interval}', True),
+        EncoderSpec('x265enc', 'h265parse', 'rtph265pay', False,
+                    'tune=zerolatency speed-preset=ultrafast key-int-max={keyframe_interval}'),
+    ],
+}
+
+
+def encoder_elements() -> List[str]:
+    """Every encoder element the builder may select, for probing with Gst.ElementFactory.find()."""
+    return [spec.element for specs in ENCODERS.values() for spec in specs]
+
+
+class NetworkBranch(BaseModel):
+    enabled: bool = True
+    host: str = "224.1.1.1"
+    port: int = 5000
+
+
+class RecordBranch(BaseModel):
+    enabled: bool = True
+    location: str = "/path/to/local/storage/video.mp4"
+
+
+class PreviewBranch(BaseModel):
+    enabled: bool = False
+    sink: str = "nvoverlaysink"
+
+
+class PipelineOptions(BaseModel):
+    source: str = "v4l2src device=/dev/video0"
+    keyframe_interval: int = 30
+    queue_buffers: int = 4
+    network: NetworkBranch = NetworkBranch()
+    record: RecordBranch = RecordBranch()
+    preview: PreviewBranch = PreviewBranch()
+
+
+class PipelineBuilder:
+    """
+    Builds gst-launch descriptions for JetsonHAL.
+
+    Frames are encoded exactly once and the encoded stream is teed to the
+    enabled network and record branches; the optional preview branch taps the
+    raw frames before the encoder. Encoders are chosen from the elements the
+    device actually provides, preferring the Jetson hardware encoders. The
+    builder only produces strings, so it can be tested without GStreamer.
+    """
+
+    def __init__(self, options: Optional[PipelineOptions] = None, available_elements: Optional[Iterable[str]] = None):
+        """
+        Args:
+            options (PipelineOptions, optional): Source, encoder and branch settings.
+            available_elements (Iterable[str], optional): GStreamer elements present on the
+                device. If omitted, every encoder is assumed to be available.
+        """
+        self.options = options or PipelineOptions()
+        self.available = set(available_elements) if available_elements is not None else set(encoder_elements())
+
+    def supported_encodings(self) -> List[str]:
+        return [encoding for encoding in ENCODERS if self._candidates(encoding)]
+
+    def _candidates(self, encoding: str) -> List[EncoderSpec]:
+        return [spec for spec in ENCODERS.get(encoding, []) if spec.element in self.available]
+
+    def select_encoder(self, encoding: str) -> EncoderSpec:
+        """
+        Pick the preferred available encoder for an encoding.
+
+        Raises:
+            StreamError: If no encoder for the encoding is available.
+        """
+        candidates = self._candidates(encoding)
+        if not candidates:
+            raise StreamError(f"No encoder available for {encoding}")
+        return candidates[0]
+
+    def transform_elements(self, config: StreamConfig) -> str:
+        """
+        Build the GStreamer elements that crop to the configured ROI and apply
+        output_scale, so only the pixels actually used are encoded and sent.
+
+        Args:
+            config (StreamConfig): Configuration for the stream.
+
+        Returns:
+            str: Pipeline fragment ending in "! ", or an empty string if no transform is needed.
+        """
+        elements = ""
+        width, height = config.sensor_size()
+        if config.roi:
+            roi = config.roi
+            elements += (
+                f"videocrop left={roi.x} top={roi.y} "
+                f"right={width - roi.x - roi.w} bottom={height - roi.y - roi.h} ! "
+            )
+        if config.output_scale and config.output_scale != 1:
+            output_width, output_height = config.output_size()
+            elements += f"videoscale ! video/x-raw,width={output_width},height={output_height} ! "
+        return elements
+
+    def _queue(self, leaky: bool = False) -> str:
+        queue = f"queue max-size-buffers={self.options.queue_buffers}"
+        return queue + " leaky=downstream" if leaky else queue
+
+    def build(self, config: StreamConfig) -> str:
+        """
+        Build the pipeline description for a stream configuration.
+
+        Args:
+            config (StreamConfig): Configuration for the stream.
+
+        Returns:
+            str: A description for Gst.parse_launch().
+
+        Raises:
+            StreamError: If no branch is enabled or the encoding is unsupported.
+        """
+        options = self.options
+        if not (options.network.enabled or options.record.enabled or options.preview.enabled):
+            raise StreamError("At least one pipeline branch must be enabled")
+        width, height = config.sensor_size()
+        # GStreamer caps need the frame rate as a fraction, e.g. 29.97 -> 2997/100
+        framerate = Fraction(config.fps).limit_denominator(1001)
+        parts = [
+            f"{options.source} ! video/x-raw,width={width},height={height},"
+            f"framerate={framerate.numerator}/{framerate.denominator} ! "
+            f"{self.transform_elements(config)}"
+        ]
+        encoded = options.network.enabled or options.record.enabled
+        if options.preview.enabled and encoded:
+            parts.append(f"tee name=raw raw. ! {self._queue()} ! ")
+        if encoded:
+            encoder = self.select_encoder(config.encoding)
+            if encoder.nvmm:
+                parts.append("nvvidconv ! video/x-raw(memory:NVMM),format=NV12 ! ")
+            properties = encoder.properties.format(keyframe_interval=options.keyframe_interval)
+            parts.append(f"{encoder.element} {properties} ! {encoder.parser} ! tee name=t")
+            if options.network.enabled:
+                # Leaky so a stalled network never backs up into the encoder or the recording
+                parts.append(
+                    f" t. ! {self._queue(leaky=True)} ! {encoder.payloader} config-interval=1 pt=96 ! "
+                    f"udpsink host={options.network.host} port={options.network.port} sync=false async=false"
+                )
+            if options.record.enabled:
+                parts.append(
+                    f" t. ! {self._queue()} ! mp4mux ! filesink location={options.record.location}"
+                )
+        if options.preview.enabled:
+            tap = " raw. ! " if encoded else ""
+            parts.append(f"{tap}{self._queue(leaky=True)} ! {options.preview.sink} sync=false")
+        return "".join(parts).strip()
@@ -0,0 +1,336 @@
+import json
+import mmap
+import os
+import struct
+import time
+import uuid
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .base_hal import BaseHAL
+from .frame_ops import FrameTransform
+from shared.models import StreamConfig, EdgeNodeCapabilities, SensorInfo
+from shared.exceptions import StreamError, SensorError
+from shared.logger import edge_node_logger as logger
+
+MAGIC = b'MSREC1\n'
+# capture_ns, keyframe, payload size
+RECORD_HEADER = struct.Struct('<qBI')
+LENGTH = struct.Struct('<I')
+
+
+class RecordIndex(NamedTuple):
+    offset: int
+    nbytes: int
+    capture_ns: int
+    keyframe: bool
+
+
+def write_recording(path: str, frames, fps: float = 30.0, encoding: str = "raw",
+                    width: Optional[int] = None, height: Optional[int] = None,
+                    channels: int = 3, dtype: str = "uint8", wall_offset_ns: int = 0) -> None:
+    """
+    Write frames to a recording file that ReplayHAL can play back.
+
+    Args:
+        path (str): Output file path.
+        frames (Iterable): Raw NumPy frames, encoded bytes, or (payload, capture_ns, keyframe) tuples.
+        fps (float): Frame rate used to synthesize timestamps when none are given.
+        encoding (str): "raw" for uncompressed pixels, otherwise the codec name.
+        width, height (int, optional): Frame size, taken from the first raw frame if omitted.
+        channels (int): Channels per pixel for raw recordings.
+        dtype (str): Pixel dtype for raw recordings.
+        wall_offset_ns (int): Offset from the capture clock to the wall clock, so
+            recorded frames can be looked up by wall time.
+    """
+    with open(path, 'wb') as f:
+        header_written = False
+        for index, item in enumerate(frames):
+            payload, capture_ns, keyframe = item if isinstance(item, tuple) else (item, None, True)
+            if capture_ns is None:
+                capture_ns = int(index * 1e9 / fps)
+            if not header_written:
+                if hasattr(payload, 'shape'):
+                    height, width = payload.shape[:2]
+                    channels = payload.shape[2] if payload.ndim == 3 else 1
+                    dtype = str(payload.dtype)
+                header = json.dumps({
+                    'encoding': encoding, 'width': width, 'height': height,
+                    'channels': channels, 'dtype': dtype, 'fps': fps,
+                    'wall_offset_ns': wall_offset_ns
+                }).encode('utf-8')
+                f.write(MAGIC + LENGTH.pack(len(header)) + header)
+                header_written = True
+            data = payload.tobytes() if hasattr(payload, 'tobytes') else bytes(payload)
+            f.write(RECORD_HEADER.pack(capture_ns, int(keyframe), len(data)))
+            f.write(data)
+
+
+def read_header(buffer) -> Tuple[dict, int]:
+    """
+    Parse the header of a recording written by write_recording().
+
+    Args:
+        buffer: The recording's bytes, typically a memory map of the file.
+
+    Returns:
+        tuple: The header dict and the offset of the first record.
+
+    Raises:
+        ValueError: If the buffer does not start with a recording header.
+    """
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a Ministream recording")
+    offset = len(MAGIC)
+    (header_size,) = LENGTH.unpack_from(buffer, offset)
+    offset += LENGTH.size
+    header = json.loads(bytes(buffer[offset:offset + header_size]).decode('utf-8'))
+    return header, offset + header_size
+
+
+def index_records(buffer, offset: int) -> Tuple[List[RecordIndex], int]:
+    """
+    Index the complete records of a recording from offset onwards.
+
+    A record that is cut short, such as the one still being written to a
+    growing file, ends the index.
+
+    Returns:
+        tuple: The records and the offset just past the last complete one.
+    """
+    records: List[RecordIndex] = []
+    end = len(buffer)
+    while offset + RECORD_HEADER.size <= end:
+        capture_ns, keyframe, nbytes = RECORD_HEADER.unpack_from(buffer, offset)
+        if offset + RECORD_HEADER.size + nbytes > end:
+            break
+        offset += RECORD_HEADER.size
+        records.append(RecordIndex(offset, nbytes, capture_ns, bool(keyframe)))
+        offset += nbytes
+    return records, offset
+
+
+class ReplayHAL(BaseHAL):
+    """
+    Hardware Abstraction Layer that plays back pre-recorded frames from disk.
+
+    Recordings are memory-mapped, so frames are served as zero-copy views of
+    the file. Playback either follows the recorded timing or runs as fast as
+    the pipeline can consume frames, which makes it suitable for deterministic
+    benchmarks of the Streamer, encoders and transports off-device.
+
+    Two file layouts are supported: recordings written by write_recording(),
+    which carry per-frame timestamps and keyframe flags for raw or encoded
+    payloads, and headerless raw dumps of fixed-size frames given raw_shape.
+    """
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = True,
+                 raw_shape: Optional[Tuple[int, ...]] = None, raw_dtype: str = "uint8",
+                 raw_fps: float = 30.0, sensor_id: str = "replay_camera_0"):
+        """
+        Open and index a recording.
+
+        Args:
+            path (str): Path to the recording file.
+            realtime (bool): Pace frames at their recorded timing instead of as fast as possible.
+            loop (bool): Restart from the first frame when the recording ends.
+            raw_shape (tuple, optional): (H, W[, C]) of a headerless raw dump.
+            raw_dtype (str): Pixel dtype of a headerless raw dump.
+            raw_fps (float): Frame rate of a headerless raw dump.
+            sensor_id (str): Sensor id reported for the replayed stream.
+
+        Raises:
+            SensorError: If the recording cannot be opened or parsed.
+        """
+        super().__init__()
+        self.device_id = str(uuid.uuid4())
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.sensor_id = sensor_id
+        self.pipeline = None
+        self.config = None
+        self.transform = None
+        try:
+            self._file = open(path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if raw_shape is not None:
+                self._index_raw(raw_shape, raw_dtype, raw_fps)
+            else:
+                self._index_recording()
+        except (OSError, ValueError, struct.error) as e:
+            logger.error(f"Error opening recording {path}: {str(e)}")
+            raise SensorError(f"Error opening recording {path}: {str(e)}")
+        if not self.records:
+            raise SensorError(f"Recording {path} contains no frames")
+        self.position = 0
+        self._epoch = None
+        logger.info(f"Replay HAL opened {path}: {len(self.records)} {self.encoding} frames at {self.fps:.1f} fps")
+
+    def _index_raw(self, shape, dtype, fps):
+        self.encoding = "raw"
+        self.dtype = np.dtype(dtype)
+        self.height, self.width = shape[:2]
+        self.channels = shape[2] if len(shape) == 3 else 1
+        self.fps = fps
+        frame_size = int(np.prod(shape)) * self.dtype.itemsize
+        count = len(self._mmap) // frame_size
+        self.records = [
+            RecordIndex(i * frame_size, frame_size, int(i * 1e9 / fps), True) for i in range(count)
+        ]
+
+    def _index_recording(self):
+        header, offset = read_header(self._mmap)
+        self.encoding = header['encoding']
+        self.width, self.height = header.get('width'), header.get('height')
+        self.channels = header.get('channels', 3)
+        self.dtype = np.dtype(header.get('dtype', 'uint8'))
+        # Only the small record headers are touched here; payloads stay on disk until played
+        self.records, end = index_records(self._mmap, offset)
+        if end + RECORD_HEADER.size <= len(self._mmap):
+            logger.warning(f"Recording {self.path} is truncated after {len(self.records)} frames")
+        span_ns = self.records[-1].capture_ns - self.records[0].capture_ns if len(self.records) > 1 else 0
+        self.fps = (len(self.records) - 1) * 1e9 / span_ns if span_ns else header.get('fps', 30.0)
+
+    @property
+    def resolution(self) -> str:
+        return f"{self.width}x{self.height}"
+
+    def detect_sensors(self):
+        """
+        Report the recording as a single sensor.
+
+        Returns:
+            list: A list containing one SensorInfo describing the recording.
+        """
+        return [SensorInfo(
+            id=self.sensor_id,
+            name=f"Replay of {os.path.basename(self.path)}",
+            resolutions=[self.resolution],
+            max_fps=round(self.fps, 3)
+        )]
+
+    def start_stream(self, config: StreamConfig):
+        """
+        Start playback from the first frame with the given configuration.
+
+        Args:
+            config (StreamConfig): Configuration for the stream. The resolution and
+                encoding must match the recording; ROI and output_scale apply to raw
+                recordings.
+
+        Raises:
+            StreamError: If the configuration cannot be honored by the recording.
+        """
+        if config.resolution != self.resolution:
+            raise StreamError(f"Recording is {self.resolution}, cannot stream at {config.resolution}")
+        if self.encoding != "raw" and (config.roi or config.output_scale):
+            raise StreamError("ROI and output_scale require a raw recording")
+        if config.encoding != self.encoding:
+            # There is no encoder; frames are served exactly as recorded
+            raise StreamError(f"Recording is {self.encoding}, cannot stream as {config.encoding}")
+        self.config = config
+        self.transform = FrameTransform(config) if self.encoding == "raw" else None
+        self.position = 0
+        self._epoch = None
+        self.pipeline = f"replay:{self.path}"
+        logger.info(f"Replay stream started with config: {config}")
+
+    def stop_stream(self):
+        """
+        Stop playback.
+        """
+        self.pipeline = None
+        self._epoch = None
+
+    def frame_delay(self) -> Optional[float]:
+        """
+        Seconds until the next frame is due. Zero in max-rate mode; in realtime
+        mode the recorded timing (scaled to the configured fps) is followed
+        against a fixed epoch so pacing errors do not accumulate.
+        """
+        if not self.realtime:
+            return 0.0
+        if self._epoch is None:
+            return 0.0
+        record = self.records[self.position % len(self.records)]
+        due_ns = self._epoch + (record.capture_ns - self.records[0].capture_ns) * self._time_scale()
+        return max(0.0, (due_ns - time.monotonic_ns()) / 1e9)
+
+    def _time_scale(self) -> float:
+        if self.config is None or not self.config.fps:
+            return 1.0
+        return self.fps / self.config.fps
+
+    def get_frame(self):
+        """
+        Return the next recorded frame.
+
+        Returns:
+            Frame: A read-only NumPy view (raw) or memoryview (encoded) of the
+            mapped file, stamped with capture metadata.
+
+        Raises:
+            StreamError: If the recording has ended and looping is disabled.
+        """
+        if self.position >= len(self.records):
+            if not self.loop:
+                raise StreamError(f"Recording {self.path} has ended")
+            self.position = 0
+            self._epoch = None
+        record = self.records[self.position]
+        if self._epoch is None:
+            self._epoch = time.monotonic_ns() - int(
+                (record.capture_ns - self.records[0].capture_ns) * self._time_scale()
+            )
+        self.position += 1
+        if self.encoding == "raw":
+            shape = (self.height, self.width, self.channels) if self.channels > 1 else (self.height, self.width)
+            data = np.frombuffer(self._mmap, dtype=self.dtype, count=int(np.prod(shape)),
+                                 offset=record.offset).reshape(shape)
+            if self.transform is not None:
+                data = self.transform.apply(data)
+        else:
+            data = memoryview(self._mmap)[record.offset:record.offset + record.nbytes]
+        return self.stamper.stamp(self.sensor_id, data, keyframe=record.keyframe)
+
+    def adjust_settings(self, settings):
+        """
+        Adjust playback settings.
+
+        Args:
+            settings (dict): Supports "realtime" and "loop" booleans.
+        """
+        self.realtime = settings.get('realtime', self.realtime)
+        self.loop = settings.get('loop', self.loop)
+
+    def get_capabilities(self):
+        """
+        Get the capabilities of the replay device.
+
+        Returns:
+            EdgeNodeCapabilities: The recording exposed as a single sensor.
+        """
+        return EdgeNodeCapabilities(
+            node_type="replay",
+            hardware_info={
+                "model": "Replay",
+                "source": os.path.basename(self.path),
+                "frames": str(len(self.records))
+            },
+            sensors=self.detect_sensors(),
+            supported_encodings=[self.encoding]
+        )
+
+    def __del__(self):
+        """
+        Destructor for the ReplayHAL class.
+        Stops playback and releases the memory map once no frame views remain.
+        """
+        self.stop_stream()
+        try:
+            self._mmap.close()
+            self._file.close()
+        except (AttributeError, BufferError):
+            pass
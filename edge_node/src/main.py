@@ -1,11 +1,24 @@
+import time
+# Startup phases are timed from here, before the heavier imports below
+STARTED = time.monotonic()
 import asyncio
 import os
 import json
 import uuid
+from functools import partial
 from edge_node.src.sensor_manager import SensorManager
 from edge_node.src.controller import Controller
 from edge_node.src.config import load_config
 from edge_node.src.streamer import Streamer  # Import the Streamer class
+from edge_node.src.motion import ChangeGate
+from edge_node.src.dataplane import DataPlane, LoopLagMonitor
+from edge_node.src.transport import ZmqFrameTransport
+from edge_node.src.shm_transport import ShmFrameTransport
+from edge_node.src.calibration import Calibrator, DEFAULT_CACHE_DIR
+from edge_node.src.startup import CapabilityProbe, StartupTimer
+from edge_node.src.recordings import RecordingLibrary, RecordingServer, DEFAULT_RECORDINGS_PORT
+from edge_node.src.telemetry import TelemetryCollector, HeartbeatTelemetry, MIN_HEARTBEAT_INTERVAL, MAX_HEARTBEAT_INTERVAL
+from shared.gop_cache import GopCache, DEFAULT_MAX_FRAMES, DEFAULT_MAX_BYTES
 from zeroconf.asyncio import AsyncZeroconf
 from zeroconf import ServiceInfo
 import socket
@@ -14,62 +27,153 @@ import aiohttp
 
 # Determine which HAL to use based on the environment
 USE_MOCK = os.environ.get('USE_MOCK_HAL', 'true').lower() == 'true'
+REPLAY_FILE = os.environ.get('REPLAY_FILE')
 
-if USE_MOCK:
+if REPLAY_FILE:
+    from edge_node.src.hardware_abstraction.replay_hal import ReplayHAL
+    HAL = partial(
+        ReplayHAL,
+        REPLAY_FILE,
+        realtime=os.environ.get('REPLAY_REALTIME', 'true').lower() == 'true',
+        loop=os.environ.get('REPLAY_LOOP', 'true').lower() == 'true'
+    )
+elif USE_MOCK:
     from edge_node.src.hardware_abstraction.mock_jetson_hal import MockJetsonHAL as HAL
 else:
     from edge_node.src.hardware_abstraction.jetson_hal import JetsonHAL as HAL
 
-async def send_heartbeat(device_id, api_url):
+
+async def send_heartbeat(device_id, api_url, telemetry=None):
     async with aiohttp.ClientSession() as session:
         while True:
+            payload = telemetry.next_payload() if telemetry is not None else None
             try:
-                async with session.post(f"{api_url}/devices/{device_id}/heartbeat") as response:
+                async with session.post(f"{api_url}/devices/{device_id}/heartbeat", json=payload) as response:
                     if response.status == 200:
                         logger.debug(f"Heartbeat sent for device {device_id}")
+                        if telemetry is not None:
+                            telemetry.handle_response(await response.json())
                     else:
                         logger.warning(f"Failed to send heartbeat: {response.status}")
+                        if telemetry is not None:
+                            telemetry.encoder.request_full()
             except Exception as e:
                 logger.error(f"Error sending heartbeat: {e}")
-            await asyncio.sleep(5)  # Send heartbeat every 5 seconds
+                if telemetry is not None:
+                    telemetry.encoder.request_full()
+            # Telemetry adapts the interval to how much is changing; plain heartbeats every 5 seconds
+            await asyncio.sleep(telemetry.interval if telemetry is not None else 5)
+
+
+def replay_port(config):
+    """The port answering GOP replay requests, by default the one after the stream port."""
+    return config.get('replay_port', config.get('stream_port', 5556) + 1)
+
 
-async def register_service(config):
+def service_info(config, capabilities):
     """
-    Register the edge node service with Zeroconf for discovery.
+    Build the Zeroconf record advertising the edge node and its capabilities.
 
     Args:
         config (dict): The configuration dictionary for the edge node.
+        capabilities (EdgeNodeCapabilities): The capabilities to advertise.
 
     Returns:
-        tuple: A tuple containing the Zeroconf instance and the registered ServiceInfo.
+        ServiceInfo: The service record.
     """
-    zeroconf = AsyncZeroconf()
     host_ip = socket.gethostbyname(socket.gethostname())
     
     device_id = config.get('device_id', str(uuid.uuid4()))
     
-    capabilities = HAL().get_capabilities()
     properties = {
         b"device_id": device_id.encode('utf-8'),
         b"node_type": capabilities.node_type.encode('utf-8'),
         b"hardware_info": json.dumps(capabilities.hardware_info).encode('utf-8'),
         b"sensors": json.dumps([sensor.dict() for sensor in capabilities.sensors]).encode('utf-8'),
-        b"supported_encodings": json.dumps(capabilities.supported_encodings).encode('utf-8')
+        b"supported_encodings": json.dumps(capabilities.supported_encodings).encode('utf-8'),
+        b"stream_port": str(config.get('stream_port', 5556)).encode('utf-8'),
+        b"replay_port": str(replay_port(config)).encode('utf-8'),
+        b"tags": json.dumps(config.get('tags', [])).encode('utf-8')
     }
+    if capabilities.measured_limits:
+        # Compact JSON: TXT record strings are limited to 255 bytes
+        properties[b"measured_limits"] = json.dumps(capabilities.measured_limits, separators=(',', ':')).encode('utf-8')
+    recordings_config = config.get('recordings')
+    if recordings_config:
+        properties[b"recordings_port"] = str(recordings_config.get('port', DEFAULT_RECORDINGS_PORT)).encode('utf-8')
     
-    info = ServiceInfo(
+    logger.debug(f"Service properties: {properties}")
+    return ServiceInfo(
         "_ministream._tcp.local.",
         f"EdgeNode_{device_id}._ministream._tcp.local.",
         addresses=[socket.inet_aton(host_ip)],
         port=config.get('zmq', {}).get('port', 0),  # Using .get() with default value
         properties=properties
     )
-    
-    logger.debug(f"Registering service with properties: {properties}")
-    
-    await zeroconf.async_register_service(info)
+
+
+async def register_service(config, capabilities, zeroconf=None):
+    """
+    Register the edge node service with Zeroconf for discovery.
+
+    The service name embeds the device id, so by default it is announced
+    without first probing the network for a name conflict, which takes over
+    a second. Set startup.probe_name in the config to probe anyway.
+
+    Args:
+        config (dict): The configuration dictionary for the edge node.
+        capabilities (EdgeNodeCapabilities): The capabilities to advertise.
+        zeroconf (AsyncZeroconf, optional): The Zeroconf instance to register with;
+            a new one is created if omitted.
+
+    Returns:
+        tuple: A tuple containing the Zeroconf instance and the registered ServiceInfo.
+    """
+    zeroconf = zeroconf or AsyncZeroconf()
+    info = service_info(config, capabilities)
+    probe_name = config.get('startup', {}).get('probe_name', False)
+    await zeroconf.async_register_service(info, cooperating_responders=not probe_name)
     return zeroconf, info
 
+
+async def reconcile_capabilities(probing, advertised, config, zeroconf, controller, calibrator=None):
+    """
+    Wait for the fresh capability probe and, if it differs from the cached
+    capabilities the node was advertised with, advertise the probed ones.
+
+    Args:
+        probing (Future): The running CapabilityProbe.probe().
+        advertised (EdgeNodeCapabilities): The capabilities currently advertised.
+        config (dict): The configuration dictionary for the edge node.
+        zeroconf (AsyncZeroconf): The Zeroconf instance the node is registered with.
+        controller (Controller): Its measured limits are updated along with the record.
+        calibrator (Calibrator, optional): Recomputes measured limits for the new capabilities.
+    """
+    try:
+        probed = await probing
+    except Exception as e:
+        logger.error(f"Probing capabilities failed, keeping the cached ones: {str(e)}")
+        return
+    if probed.dict(exclude={'measured_limits'}) == advertised.dict(exclude={'measured_limits'}):
+        return
+    logger.info("Capabilities changed since the last start, advertising the probed ones")
+    if calibrator is not None:
+        limits = await asyncio.get_running_loop().run_in_executor(None, calibrator.limits, probed)
+        probed = probed.copy(update={'measured_limits': limits})
+        controller.measured_limits = limits
+    await zeroconf.async_update_service(service_info(config, probed))
+
+
+async def stream_after_probe(data_plane, probing, advertised, config, zeroconf, controller, calibrator=None):
+    """
+    Start the data plane once the capability probe, and any calibration its
+    result calls for, are done with the HAL, then run until it exits.
+    Control requests that need the data plane wait for it meanwhile.
+    """
+    await reconcile_capabilities(probing, advertised, config, zeroconf, controller, calibrator)
+    data_plane.start()
+    await data_plane.wait()  # The streamer runs on the data plane thread
+
 async def register_device(device_id, api_url, capabilities):
     async with aiohttp.ClientSession() as session:
         try:
@@ -88,8 +192,10 @@ async def main():
     """
     The main function that sets up and runs the edge node.
     """
+    timer = StartupTimer(STARTED)
     logger.info("Starting Edge Node")
-    config = load_config()
+    with timer.phase('config'):
+        config = load_config()
     
     # Ensure device_id is in the config
     if 'device_id' not in config:
@@ -98,35 +204,103 @@ async def main():
 
     logger.info(f"Loaded configuration: {config}")
 
-    hal = HAL()
+    loop = asyncio.get_running_loop()
+    # One HAL for the whole node: probing, calibration and streaming all share it
+    with timer.phase('hal'):
+        hal = HAL()
+    # Probing runs on a worker thread while discovery and the transports start. A restarting node
+    # advertises the capabilities it probed last time and corrects them once the probe finishes.
+    probe = CapabilityProbe(hal, config.get('startup', {}).get('cache_dir', DEFAULT_CACHE_DIR))
+    cached = probe.cached()
+    probe_started = timer.elapsed_ms()
+    probing = loop.run_in_executor(None, probe.probe)
+    probing.add_done_callback(lambda _: timer.record('probe', probe_started))
+    with timer.phase('discovery'):
+        zeroconf = AsyncZeroconf()
+    capabilities = cached or await probing
+    # Optionally measure what the node can sustain before advertising it, cached per hardware
+    calibrator = Calibrator.from_config(hal, config.get('calibration'))
+    if calibrator is not None:
+        with timer.phase('calibration'):
+            limits = calibrator.cached_limits(capabilities)
+            if limits is None:
+                # Measuring streams through the HAL, which the probe may still be using
+                await asyncio.wait([probing])
+                limits = await loop.run_in_executor(None, calibrator.limits, capabilities)
+        capabilities = capabilities.copy(update={'measured_limits': limits})
     sensor_manager = SensorManager(hal)
-    streamer = Streamer(hal, config)  # Create a Streamer instance
-    controller = Controller(sensor_manager, streamer, config)  # Pass streamer to Controller
+    gop_cache = GopCache(
+        max_frames=config.get('gop_cache_frames', DEFAULT_MAX_FRAMES),
+        max_bytes=config.get('gop_cache_bytes', DEFAULT_MAX_BYTES)
+    )
+    transport = ZmqFrameTransport(config.get('stream_port', 5556), gop_cache=gop_cache, replay_port=replay_port(config))
+    local_transport = None
+    shm_config = config.get('shm_transport')
+    if shm_config:
+        local_transport = ShmFrameTransport(
+            shm_config.get('name', f"ministream_{config['device_id'][:8]}"),
+            slots=shm_config.get('slots', 8),
+            slot_size=shm_config.get('slot_size', 1920 * 1080 * 3),
+            notify_address=shm_config.get('notify_address')
+        )
+    change_gate = ChangeGate.from_config(config.get('change_detection'))
+    streamer = Streamer(hal, config, transport, gop_cache, local_transport, change_gate)  # Create a Streamer instance
+    # Capture, processing and transports run on their own thread and event loop,
+    # so frame work never delays control requests or heartbeats
+    data_plane = DataPlane(streamer)
+    loop_lag = {'control': LoopLagMonitor(), 'data_plane': data_plane.lag}
+    controller = Controller(sensor_manager, streamer, config, data_plane, loop_lag, capabilities.measured_limits)
+
+    # Recorded footage is served over HTTP by time range, with Range requests
+    recording_server = None
+    recordings_config = config.get('recordings')
+    if recordings_config:
+        recording_server = RecordingServer(
+            RecordingLibrary(recordings_config['directory'], recordings_config.get('pattern', '*.msrec')),
+            port=recordings_config.get('port', DEFAULT_RECORDINGS_PORT)
+        )
+        with timer.phase('recordings'):
+            await recording_server.start()
 
-    zeroconf, info = await register_service(config)
+    with timer.phase('advertise'):
+        zeroconf, info = await register_service(config, capabilities, zeroconf)
+    logger.info(f"Edge node advertised {timer.elapsed_ms():.0f} ms after start"
+                + (" with cached capabilities" if cached is not None else ""))
 
     # Define api_url and device_id
     api_url = os.environ.get('API_URL', 'http://network_api:8000')  # Use the service name as the hostname
     device_id = config.get('device_id', str(uuid.uuid4()))
 
     # Start the heartbeat task
-    heartbeat_task = asyncio.create_task(send_heartbeat(device_id, api_url))
-
-    # Register the device
-    await register_device(device_id, api_url, hal.get_capabilities())
+    heartbeat_config = config.get('heartbeat', {})
+    telemetry = HeartbeatTelemetry(
+        TelemetryCollector(streamer, loop_lag=loop_lag),
+        min_interval=heartbeat_config.get('min_interval', MIN_HEARTBEAT_INTERVAL),
+        max_interval=heartbeat_config.get('max_interval', MAX_HEARTBEAT_INTERVAL)
+    )
+    heartbeat_task = asyncio.create_task(send_heartbeat(device_id, api_url, telemetry))
 
     try:
         await asyncio.gather(
+            register_device(device_id, api_url, capabilities),
+            stream_after_probe(data_plane, probing, capabilities, config, zeroconf, controller, calibrator),
             sensor_manager.run(),
-            streamer.run(),  # Run the streamer
             controller.run(),
+            loop_lag['control'].run(),
             heartbeat_task  # Include the heartbeat task in the gather call
         )
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}", exc_info=True)
     finally:
+        # Transports are closed below, so the thread using them must be done first
+        data_plane.stop()
         await zeroconf.async_unregister_service(info)  # Changed to async_unregister_service
         await zeroconf.cancel()  # Use cancel() instead of close()
+        if recording_server is not None:
+            await recording_server.stop()
+        transport.close()
+        if local_transport is not None:
+            local_transport.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,143 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from shared.frames import Frame
+from shared.logger import edge_node_logger as logger
+
+DEFAULT_DOWNSAMPLE = 8
+DEFAULT_PIXEL_THRESHOLD = 20
+DEFAULT_THRESHOLD = 0.005
+DEFAULT_KEEPALIVE_INTERVAL = 1.0
+DEFAULT_HOLD = 1.0
+
+
+class SensorState:
+    def __init__(self):
+        # Downsampled copy of the last frame that was sent, compared against new captures
+        self.reference: Optional[np.ndarray] = None
+        self.last_sent_ns: Optional[int] = None
+        self.hold_until_ns = 0
+        self.sequence = 0
+        self.frames = 0
+        self.suppressed = 0
+        self.last_score = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'frames': self.frames,
+            'sent': self.frames - self.suppressed,
+            'suppressed': self.suppressed,
+            'suppression_ratio': round(self.suppressed / self.frames, 3) if self.frames else 0.0,
+            'change_score': round(self.last_score, 4)
+        }
+
+
+class ChangeGate:
+    """
+    Drops frames of static scenes between HAL capture and the transports.
+
+    Each raw frame is subsampled on a coarse grid (the green plane of colour
+    frames) and compared with the subsampled copy of the last frame that was
+    sent, so gradual drifts such as lighting changes still add up to a send. A frame is sent when the fraction
+    of grid pixels that changed by more than pixel_threshold exceeds threshold.
+    Otherwise it is suppressed, except for one keepalive frame every
+    keepalive_interval seconds. After a change the full capture rate is kept
+    for hold seconds, so motion is not chopped up at its start and end.
+    Encoded payloads cannot be compared and always pass.
+
+    Sent frames are renumbered per sensor, so consumers and gap counters
+    downstream see a contiguous stream.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, pixel_threshold: int = DEFAULT_PIXEL_THRESHOLD,
+                 keepalive_interval: float = DEFAULT_KEEPALIVE_INTERVAL, hold: float = DEFAULT_HOLD,
+                 downsample: int = DEFAULT_DOWNSAMPLE):
+        """
+        Args:
+            threshold (float): Fraction of grid pixels that must change for a frame to be sent.
+            pixel_threshold (int): Intensity difference at which a grid pixel counts as changed.
+            keepalive_interval (float): Seconds between frames sent while the scene is static.
+            hold (float): Seconds of full-rate output after a change.
+            downsample (int): Grid stride in pixels along each axis.
+        """
+        if downsample < 1:
+            raise ValueError("downsample must be at least 1")
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.keepalive_ns = int(keepalive_interval * 1e9)
+        self.hold_ns = int(hold * 1e9)
+        self.downsample = downsample
+        self.sensors: Dict[str, SensorState] = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> Optional["ChangeGate"]:
+        """Build a gate from the 'change_detection' config section, or None if it is not enabled."""
+        if not config or not config.get('enabled', False):
+            return None
+        return cls(
+            threshold=config.get('threshold', DEFAULT_THRESHOLD),
+            pixel_threshold=config.get('pixel_threshold', DEFAULT_PIXEL_THRESHOLD),
+            keepalive_interval=config.get('keepalive_interval', DEFAULT_KEEPALIVE_INTERVAL),
+            hold=config.get('hold', DEFAULT_HOLD),
+            downsample=config.get('downsample', DEFAULT_DOWNSAMPLE)
+        )
+
+    def _grid(self, data: np.ndarray) -> np.ndarray:
+        grid = data[::self.downsample, ::self.downsample]
+        if grid.ndim == 3:
+            # Green carries most of the luma; one plane is ~10x cheaper than comparing all three
+            grid = grid[..., 1 if grid.shape[2] > 1 else 0]
+        # int16 so differences of uint8 pixels neither wrap nor need a float conversion
+        return grid.astype(np.int16)
+
+    def change_score(self, reference: np.ndarray, grid: np.ndarray) -> float:
+        """Fraction of grid samples whose intensity changed by more than pixel_threshold."""
+        changed = np.abs(grid - reference) > self.pixel_threshold
+        return float(np.count_nonzero(changed)) / changed.size
+
+    def admit(self, frame: Frame) -> Optional[Frame]:
+        """
+        Decide whether a captured frame is sent.
+
+        Args:
+            frame (Frame): The stamped frame returned by the HAL.
+
+        Returns:
+            Frame: The frame, renumbered in the sent stream, or None if it is suppressed.
+        """
+        metadata = frame.metadata
+        state = self.sensors.get(metadata.sensor_id)
+        if state is None:
+            state = self.sensors[metadata.sensor_id] = SensorState()
+        state.frames += 1
+        now_ns = metadata.capture_ns
+        if isinstance(frame.data, np.ndarray):
+            grid = self._grid(frame.data)
+            if state.reference is None or state.reference.shape != grid.shape:
+                send = True  # First frame, or the stream was reconfigured
+            else:
+                state.last_score = self.change_score(state.reference, grid)
+                if state.last_score > self.threshold:
+                    if now_ns >= state.hold_until_ns:
+                        logger.debug(f"Change detected on {metadata.sensor_id}: {state.last_score:.4f}")
+                    state.hold_until_ns = now_ns + self.hold_ns
+                    send = True
+                else:
+                    send = (now_ns < state.hold_until_ns
+                            or now_ns - state.last_sent_ns >= self.keepalive_ns)
+            if send:
+                state.reference = grid
+        else:
+            send = True
+        if not send:
+            state.suppressed += 1
+            return None
+        state.last_sent_ns = now_ns
+        sequence = state.sequence
+        state.sequence += 1
+        return Frame(frame.data, metadata._replace(sequence=sequence))
+
+    def stats(self) -> Dict[str, Dict]:
+        """Frames seen, sent and suppressed per sensor, with the suppression ratio."""
+        return {sensor_id: state.to_dict() for sensor_id, state in list(self.sensors.items())}
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from shared.latency import LatencyHistogram
+from shared.logger import edge_node_logger as logger
+
+DEFAULT_INTERVAL_MS = 10.0
+MIN_INTERVAL_MS = 5.0
+MAX_DURATION_S = 60.0
+MAX_STACK_DEPTH = 64
+MAX_UNIQUE_STACKS = 2000
+MAX_REPORTED_STACKS = 500
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _is_asyncio_handle_run(frame) -> bool:
+    code = frame.f_code
+    return code.co_name == '_run' and code.co_filename.endswith(os.path.join('asyncio', 'events.py'))
+
+
+class SamplingProfiler:
+    """
+    Time-bounded sampling profiler for the edge node's event loop threads.
+
+    A daemon thread samples the Python stack of the control loop thread, and
+    of any other named threads such as the data plane, every interval and
+    folds them into flamegraph-ready "thread;frame;frame count" lines. The
+    outermost coroutine on each sample is attributed to its task, giving an
+    approximate per-task time breakdown per thread, while a small coroutine
+    on the control loop measures its scheduling lag. Overhead is bounded by a minimum sampling
+    interval, a maximum duration, a stack depth limit and a cap on distinct
+    stacks.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, duration: float, interval_ms: float = DEFAULT_INTERVAL_MS,
+                 min_interval_ms: float = MIN_INTERVAL_MS, max_duration: float = MAX_DURATION_S,
+                 threads: Optional[Dict[str, int]] = None):
+        """
+        Configure a profiling session; nothing runs until start() is called.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The loop to profile; must be running in this thread.
+            duration (float): Requested profile length in seconds, clamped to max_duration.
+            interval_ms (float): Requested sampling interval, clamped to min_interval_ms.
+            min_interval_ms (float): Smallest permitted sampling interval.
+            max_duration (float): Longest permitted profile.
+            threads (Dict[str, int], optional): Further threads to sample, by name and
+                thread id; the calling thread is sampled as "control".
+        """
+        self.loop = loop
+        self.duration = min(max(duration, 0.1), max_duration)
+        self.interval = max(interval_ms, min_interval_ms) / 1000.0
+        self.threads = {'control': threading.get_ident()}
+        self.threads.update(threads or {})
+        self.stacks = Counter()
+        self.task_samples = Counter()
+        self.thread_samples = Counter()
+        self.loop_lag = LatencyHistogram()
+        self.samples = 0
+        self.dropped_stacks = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lag_task = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._sample_loop, name="edge-profiler", daemon=True)
+        self._thread.start()
+        self._lag_task = self.loop.create_task(self._measure_loop_lag())
+        logger.info(f"Profiling for {self.duration}s at {self.interval * 1000:.1f} ms intervals")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+        if self.stopped_at is None:
+            self.stopped_at = time.monotonic()
+
+    def _sample_loop(self) -> None:
+        deadline = self.started_at + self.duration
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            for thread, thread_id in self.threads.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._record(thread, frame)
+        self.stopped_at = time.monotonic()
+
+    def _record(self, thread: str, frame) -> None:
+        labels = []
+        task = "idle"
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            if _is_asyncio_handle_run(frame) and labels:
+                # The frame just above Handle._run is the outermost coroutine of the running task
+                task = labels[-1]
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(thread)
+        stack = ';'.join(reversed(labels))
+        self.samples += 1
+        self.thread_samples[thread] += 1
+        self.task_samples[f"{thread}/{task}"] += 1
+        if stack in self.stacks or len(self.stacks) < MAX_UNIQUE_STACKS:
+            self.stacks[stack] += 1
+        else:
+            self.dropped_stacks += 1
+
+    async def _measure_loop_lag(self) -> None:
+        deadline = self.started_at + self.duration
+        while time.monotonic() < deadline and not self._stop.is_set():
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.loop_lag.record(max(0.0, (time.monotonic() - expected) * 1000))
+
+    def results(self) -> Dict:
+        """
+        Compact, flamegraph-ready profile results.
+
+        Returns:
+            dict: Folded stacks rooted at their thread (most frequent first), per-thread
+            and per-task time in ms, control loop lag histogram and sampling metadata.
+        """
+        elapsed = ((self.stopped_at or time.monotonic()) - self.started_at) if self.started_at else 0.0
+        interval_ms = self.interval * 1000
+        return {
+            'duration_s': round(elapsed, 3),
+            'interval_ms': interval_ms,
+            'samples': self.samples,
+            'folded': [f"{stack} {count}" for stack, count in self.stacks.most_common(MAX_REPORTED_STACKS)],
+            'truncated': self.dropped_stacks > 0 or len(self.stacks) > MAX_REPORTED_STACKS,
+            'threads_ms': {thread: round(count * interval_ms, 1) for thread, count in self.thread_samples.most_common()},
+            'tasks_ms': {task: round(count * interval_ms, 1) for task, count in self.task_samples.most_common()},
+            'loop_lag': self.loop_lag.to_dict()
+        }
+
+
+class ProfilerControl:
+    """
+    Owns at most one profiling session at a time on behalf of the Controller.
+    Profiling is disabled unless the edge config enables it.
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        config = config or {}
+        self.enabled = config.get('enabled', False)
+        self.min_interval_ms = config.get('min_interval_ms', MIN_INTERVAL_MS)
+        self.max_duration = config.get('max_duration', MAX_DURATION_S)
+        self.session: Optional[SamplingProfiler] = None
+
+    def start(self, duration: float, interval_ms: float = DEFAULT_INTERVAL_MS,
+              threads: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Start a session sampling the calling loop's thread and any further threads,
+        given by name and thread id.
+        """
+        if not self.enabled:
+            return {'error': 'Profiling is disabled on this node'}
+        if self.session is not None and self.session.running:
+            return {'error': 'A profile is already running'}
+        self.session = SamplingProfiler(
+            asyncio.get_running_loop(), duration, interval_ms, self.min_interval_ms, self.max_duration, threads
+        )
+        self.session.start()
+        return {'status': 'started', 'duration_s': self.session.duration, 'interval_ms': self.session.interval * 1000}
+
+    def stop(self) -> Dict:
+        if self.session is None:
+            return {'error': 'No profile has been started'}
+        self.session.stop()
+        results = self.session.results()
+        self.session = None
+        return {'status': 'complete', 'profile': results}
@@ -0,0 +1,335 @@
+import asyncio
+import bisect
+import glob
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from aiohttp import web
+
+from edge_node.src.hardware_abstraction.replay_hal import RECORD_HEADER, RecordIndex, index_records, read_header
+from shared.logger import edge_node_logger as logger
+
+DEFAULT_RECORDINGS_PORT = 8090
+CONTENT_TYPE = "application/x-ministream-recording"
+# Bytes read through the event loop per write when sendfile is not available
+CHUNK_SIZE = 256 * 1024
+# Leading bytes of each part written through aiohttp before the rest goes to sendfile
+FIRST_CHUNK = 64 * 1024
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class Recording:
+    """
+    Index of one recording file, kept current while the file grows.
+
+    Records are only ever appended, so a refresh indexes just the records
+    written since the previous one. Frame times are kept on the wall clock,
+    using the offset stored in the recording's header.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.header: Optional[Dict] = None
+        self.header_end = 0
+        self.records: List[RecordIndex] = []
+        self.times: List[int] = []
+        self.indexed_to = 0
+        self.size = 0
+        self.mtime_ns = 0
+
+    def refresh(self) -> None:
+        """
+        Raises:
+            OSError: If the file cannot be read.
+            ValueError: If it is not a recording.
+        """
+        stat = os.stat(self.path)
+        if stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns:
+            return
+        if stat.st_size < self.size:
+            self.__init__(self.path)  # Rewritten rather than appended to
+        if stat.st_size == 0:
+            raise ValueError("empty file")
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if self.header is None:
+                self.header, self.header_end = read_header(buffer)
+                self.indexed_to = self.header_end
+            records, self.indexed_to = index_records(buffer, self.indexed_to)
+        wall_offset_ns = self.header.get('wall_offset_ns', 0)
+        self.records.extend(records)
+        self.times.extend(record.capture_ns + wall_offset_ns for record in records)
+        self.size, self.mtime_ns = stat.st_size, stat.st_mtime_ns
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'start': self.times[0] / 1e9,
+            'end': self.times[-1] / 1e9,
+            'frames': len(self.records),
+            'bytes': self.indexed_to,
+            'encoding': self.header['encoding'],
+            'resolution': f"{self.header.get('width')}x{self.header.get('height')}"
+        }
+
+    def clip(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Optional["Clip"]:
+        """
+        Cut the frames captured in [start_ns, end_ns) out of the recording.
+
+        The clip starts on the last keyframe at or before start_ns, so it
+        decodes on its own.
+
+        Returns:
+            Clip: The clip, or None if no frames fall in the range.
+        """
+        first = 0 if start_ns is None else bisect.bisect_left(self.times, start_ns)
+        last = len(self.times) - 1 if end_ns is None else bisect.bisect_left(self.times, end_ns) - 1
+        if first > last:
+            return None
+        while first > 0 and not self.records[first].keyframe:
+            first -= 1
+        begin = self.records[first].offset - RECORD_HEADER.size
+        end = self.records[last].offset + self.records[last].nbytes
+        return Clip(self, first, last, ((0, self.header_end), (begin, end - begin)))
+
+
+class Clip(NamedTuple):
+    """
+    A time range of a recording, served as a recording file of its own: the
+    original header followed by the records in range. Both parts are byte
+    ranges of the file, so a clip is never copied into memory.
+    """
+    recording: Recording
+    first: int
+    last: int
+    # (file offset, length) of each part, in body order
+    parts: Tuple[Tuple[int, int], ...]
+
+    @property
+    def length(self) -> int:
+        return sum(length for _, length in self.parts)
+
+    @property
+    def start_ns(self) -> int:
+        return self.recording.times[self.first]
+
+    @property
+    def end_ns(self) -> int:
+        return self.recording.times[self.last]
+
+    @property
+    def etag(self) -> str:
+        # Appended records never change bytes already written, so the byte span identifies the content
+        offset, length = self.parts[-1]
+        return f'"{self.recording.name}:{offset:x}:{length:x}"'
+
+    def pieces(self, start: int, stop: int) -> Iterator[Tuple[int, int]]:
+        """File (offset, count) pieces holding bytes [start, stop) of the clip body."""
+        position = 0
+        for offset, length in self.parts:
+            low, high = max(start, position), min(stop, position + length)
+            if low < high:
+                yield offset + low - position, high - low
+            position += length
+
+
+class RecordingLibrary:
+    """
+    The recordings in a directory, indexed on demand.
+
+    Indexes are cached between requests and only extended as files grow, so
+    listing or cutting clips from hours of footage touches just the record
+    headers written since the last request. Methods block on file I/O and
+    are meant to run in an executor; a lock serializes them.
+    """
+
+    def __init__(self, directory: str, pattern: str = "*.msrec"):
+        self.directory = directory
+        self.pattern = pattern
+        self.recordings: Dict[str, Recording] = {}
+        self._lock = threading.Lock()
+
+    def scan(self) -> List[Recording]:
+        """Refresh the index and return the non-empty recordings, oldest first."""
+        with self._lock:
+            found = {}
+            for path in glob.glob(os.path.join(self.directory, self.pattern)):
+                recording = self.recordings.get(path) or Recording(path)
+                try:
+                    recording.refresh()
+                except (OSError, ValueError, struct.error) as e:
+                    logger.warning(f"Skipping recording {path}: {str(e)}")
+                    continue
+                found[path] = recording
+            self.recordings = found
+            return sorted((recording for recording in found.values() if recording.records),
+                          key=lambda recording: recording.times[0])
+
+    def catalog(self) -> List[Dict]:
+        return [recording.to_dict() for recording in self.scan()]
+
+    def clip(self, start: Optional[float] = None, end: Optional[float] = None) -> Optional[Clip]:
+        """
+        Cut a clip from the first recording with frames in [start, end).
+
+        A range spanning several recordings is served one recording at a
+        time; clients continue from the returned clip's end.
+
+        Args:
+            start (float, optional): Range start in seconds since the epoch.
+            end (float, optional): Range end in seconds since the epoch.
+
+        Returns:
+            Clip: The clip, or None if no recording has frames in the range.
+        """
+        start_ns = None if start is None else int(start * 1e9)
+        end_ns = None if end is None else int(end * 1e9)
+        for recording in self.scan():
+            clip = recording.clip(start_ns, end_ns)
+            if clip is not None:
+                return clip
+        return None
+
+
+def parse_range(value: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """
+    Resolve a Range header against a body of the given length.
+
+    Only single byte ranges are honored. Multiple ranges and malformed
+    headers are ignored, as RFC 9110 allows, and the whole body is served.
+
+    Returns:
+        tuple: The selected bytes as [start, stop), or None for the whole body.
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    match = BYTE_RANGE.match(value.strip()) if value else None
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        return max(0, length - suffix), length
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= length:
+        raise ValueError(f"range starts past the end of {length} bytes")
+    return start, min(length, int(last) + 1) if last else length
+
+
+def seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return None if value is None else float(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"Invalid time: {value}")
+
+
+class RecordingServer:
+    """
+    HTTP server for the edge node's recordings.
+
+    GET /recordings?from=&to= serves the frames captured in a wall clock
+    range as a recording clip, with Range requests, so a player can scrub
+    over a slow link and only transfer the bytes it shows. Clip bytes are
+    sent from the page cache with sendfile; nothing is read into memory
+    except a small first chunk. GET /recordings/index lists the recordings.
+    """
+
+    def __init__(self, library: RecordingLibrary, host: str = "0.0.0.0", port: int = DEFAULT_RECORDINGS_PORT):
+        self.library = library
+        self.host = host
+        self.port = port
+        self.app = web.Application()
+        self.app.router.add_get('/recordings', self.get_clip)
+        self.app.router.add_get('/recordings/index', self.get_index)
+        self.runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"Serving recordings from {self.library.directory} on port {self.port}")
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def get_index(self, request: web.Request) -> web.Response:
+        catalog = await asyncio.get_running_loop().run_in_executor(None, self.library.catalog)
+        return web.json_response({'recordings': catalog})
+
+    async def get_clip(self, request: web.Request) -> web.StreamResponse:
+        start, end = seconds(request.query.get('from')), seconds(request.query.get('to'))
+        if start is not None and end is not None and end <= start:
+            raise web.HTTPBadRequest(text="'to' must be after 'from'")
+        # Indexing reads the file, so it stays off the event loop serving control requests
+        clip = await asyncio.get_running_loop().run_in_executor(None, self.library.clip, start, end)
+        if clip is None:
+            raise web.HTTPNotFound(text="No recorded frames in the requested range")
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'ETag': clip.etag,
+            'X-Recording': clip.recording.name,
+            'X-Clip-Start': f"{clip.start_ns / 1e9:.6f}",
+            'X-Clip-End': f"{clip.end_ns / 1e9:.6f}",
+            'X-Clip-Frames': str(clip.last - clip.first + 1)
+        }
+        byte_range = None
+        # A stale If-Range validator means the client's partial copy is outdated; send everything
+        if request.headers.get('If-Range', clip.etag) == clip.etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), clip.length)
+            except ValueError:
+                raise web.HTTPRequestRangeNotSatisfiable(
+                    headers=dict(headers, **{'Content-Range': f"bytes */{clip.length}"})
+                )
+        start_byte, stop_byte = byte_range or (0, clip.length)
+        response = web.StreamResponse(status=206 if byte_range else 200, headers=headers)
+        response.content_type = CONTENT_TYPE
+        response.content_length = stop_byte - start_byte
+        if byte_range:
+            response.headers['Content-Range'] = f"bytes {start_byte}-{stop_byte - 1}/{clip.length}"
+        await response.prepare(request)
+        if request.method != 'HEAD':
+            await self._send(request, response, clip, start_byte, stop_byte)
+        await response.write_eof()
+        return response
+
+    async def _send(self, request: web.Request, response: web.StreamResponse, clip: Clip,
+                    start: int, stop: int) -> None:
+        with open(clip.recording.path, 'rb') as f:
+            for offset, count in clip.pieces(start, stop):
+                # Writing the first bytes through aiohttp flushes any headers it still buffers;
+                # sendfile then waits for the transport's buffer to drain before sending
+                head = min(count, FIRST_CHUNK)
+                await self._copy(response, f, offset, head)
+                if count > head and not await self._sendfile(request, f, offset + head, count - head):
+                    await self._copy(response, f, offset + head, count - head)
+
+    async def _sendfile(self, request: web.Request, f, offset: int, count: int) -> bool:
+        if request.transport is None:
+            raise ConnectionResetError("Connection lost")
+        try:
+            await asyncio.get_running_loop().sendfile(request.transport, f, offset, count)
+        except NotImplementedError:
+            return False
+        return True
+
+    async def _copy(self, response: web.StreamResponse, f, offset: int, count: int) -> None:
+        loop = asyncio.get_running_loop()
+        while count > 0:
+            chunk = await loop.run_in_executor(None, os.pread, f.fileno(), min(CHUNK_SIZE, count), offset)
+            if not chunk:
+                raise ConnectionResetError(f"{f.name} was truncated while being sent")
+            await response.write(chunk)
+            offset += len(chunk)
+            count -= len(chunk)
@@ -0,0 +1,197 @@
+import struct
+from multiprocessing import shared_memory, resource_tracker
+from typing import NamedTuple, Optional
+
+import numpy as np
+import zmq
+import zmq.asyncio
+
+from shared.frames import Frame, FrameMetadata
+from shared.exceptions import StreamError
+from shared.logger import edge_node_logger as logger
+
+MAGIC = b'MSHM'
+VERSION = 2
+# magic, version, slot count, slot payload size, slot stride
+SEGMENT_HEADER = struct.Struct('<4sIIQQ')
+# state, sequence, capture_ns, wall_offset_ns, keyframe, ndim, dtype, nbytes, shape[4], sensor_id, output
+SLOT_HEADER = struct.Struct('<QQqqBB8sQ4Q32s14s')
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 128
+# Each notification is the slot index and the write counter it was written under
+NOTIFICATION = struct.Struct('<IQ')
+
+
+def _slot_stride(slot_size: int) -> int:
+    # Keep every payload 64-byte aligned for SIMD-friendly consumers
+    return SLOT_HEADER_SIZE + (slot_size + 63) // 64 * 64
+
+
+def default_notify_address(name: str) -> str:
+    return f"ipc:///tmp/{name}.ipc"
+
+
+class ShmFrameTransport:
+    """
+    Zero-copy transport for consumers on the same host.
+
+    Frames are written into a ring of fixed-size slots in a
+    multiprocessing.shared_memory segment, and a tiny (slot, counter)
+    notification is published over a ZMQ ipc:// socket. Each slot is guarded
+    by a seqlock-style state word: it is odd while the slot is being written
+    and 2 * (counter + 1) once the frame for write counter `counter` is
+    complete, so readers can detect a slot that was overwritten under them.
+    """
+
+    def __init__(self, name: str, slots: int = 8, slot_size: int = 1920 * 1080 * 3,
+                 notify_address: Optional[str] = None, context=None):
+        """
+        Create the shared-memory ring and bind the notification socket.
+
+        Args:
+            name (str): Shared memory segment name consumers attach to.
+            slots (int): Number of frame slots in the ring.
+            slot_size (int): Maximum payload size of a single frame in bytes.
+            notify_address (str, optional): ZMQ address for notifications.
+            context (zmq.asyncio.Context, optional): ZMQ context to use.
+        """
+        self.name = name
+        self.slots = slots
+        self.slot_size = slot_size
+        self.stride = _slot_stride(slot_size)
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + slots * self.stride)
+        SEGMENT_HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, slots, slot_size, self.stride)
+        self.counter = 0
+        self.notify_address = notify_address or default_notify_address(name)
+        self.context = context or zmq.asyncio.Context.instance()
+        self.socket = self.context.socket(zmq.PUB)
+        self.socket.bind(self.notify_address)
+        logger.info(f"Shared memory transport '{name}' with {slots} slots of {slot_size} bytes")
+
+    def write(self, frame: Frame) -> Optional[int]:
+        """
+        Copy a frame into the next ring slot.
+
+        Args:
+            frame (Frame): The frame to write; bytes or a NumPy array of up to 4 dimensions.
+
+        Returns:
+            int: The slot index written, or None if the frame does not fit in a slot.
+        """
+        data = frame.data if hasattr(frame.data, 'dtype') else np.frombuffer(frame.data, dtype=np.uint8)
+        if data.nbytes > self.slot_size or data.ndim > 4:
+            logger.warning(f"Frame of {data.nbytes} bytes does not fit shared memory slot of {self.slot_size}")
+            return None
+        slot = self.counter % self.slots
+        offset = HEADER_SIZE + slot * self.stride
+        buf = self.shm.buf
+        struct.pack_into('<Q', buf, offset, 2 * self.counter + 1)  # Mark slot as being written
+        destination = np.ndarray(data.shape, dtype=data.dtype, buffer=buf, offset=offset + SLOT_HEADER_SIZE)
+        np.copyto(destination, data)  # Handles strided ROI views without an intermediate copy
+        metadata = frame.metadata
+        shape = list(data.shape) + [0] * (4 - data.ndim)
+        SLOT_HEADER.pack_into(
+            buf, offset, 2 * self.counter + 1, metadata.sequence, metadata.capture_ns,
+            metadata.wall_offset_ns, int(metadata.keyframe), data.ndim, data.dtype.str.encode('ascii'),
+            data.nbytes, *shape, metadata.sensor_id.encode('utf-8')[:32], metadata.output.encode('utf-8')[:14]
+        )
+        struct.pack_into('<Q', buf, offset, 2 * (self.counter + 1))  # Publish the completed slot
+        self.counter += 1
+        return slot
+
+    async def send(self, frame: Frame) -> None:
+        slot = self.write(frame)
+        if slot is not None:
+            await self.socket.send(NOTIFICATION.pack(slot, self.counter - 1))
+
+    def close(self) -> None:
+        self.socket.close(linger=0)
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ShmFrame(NamedTuple):
+    """A read-only view of a frame in shared memory."""
+    data: np.ndarray
+    metadata: FrameMetadata
+    reader: "ShmFrameReader"
+    slot: int
+    counter: int
+
+    def valid(self) -> bool:
+        """True while the slot still holds this frame; check after using data."""
+        return self.reader.slot_state(self.slot) == 2 * (self.counter + 1)
+
+
+class ShmFrameReader:
+    """
+    Consumer side of ShmFrameTransport. Frames are returned as read-only NumPy
+    views directly on the shared memory slots; no bytes are copied.
+    """
+
+    def __init__(self, name: str, notify_address: Optional[str] = None, context=None):
+        """
+        Attach to a shared-memory ring and subscribe to its notifications.
+
+        Args:
+            name (str): Shared memory segment name used by the producer.
+            notify_address (str, optional): ZMQ address of the producer's notifications.
+            context (zmq.asyncio.Context, optional): ZMQ context to use.
+
+        Raises:
+            StreamError: If the segment is not a Ministream frame ring.
+        """
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Python's resource tracker would unlink the producer's segment when this process exits
+        try:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+        magic, version, self.slots, self.slot_size, self.stride = SEGMENT_HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise StreamError(f"Shared memory segment '{name}' is not a frame ring")
+        self.context = context or zmq.asyncio.Context.instance()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"")
+        self.socket.connect(notify_address or default_notify_address(name))
+        self.overwritten = 0
+
+    def slot_state(self, slot: int) -> int:
+        return struct.unpack_from('<Q', self.shm.buf, HEADER_SIZE + slot * self.stride)[0]
+
+    def read(self, slot: int, counter: int) -> Optional[ShmFrame]:
+        """
+        Build a view of the frame written to `slot` under write counter `counter`.
+
+        Returns:
+            ShmFrame: The frame view, or None if the slot was already overwritten.
+        """
+        offset = HEADER_SIZE + slot * self.stride
+        (state, sequence, capture_ns, wall_offset_ns, keyframe, ndim, dtype, nbytes,
+         s0, s1, s2, s3, sensor_id, output) = SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if state != 2 * (counter + 1):
+            self.overwritten += 1
+            return None
+        data = np.ndarray((s0, s1, s2, s3)[:ndim], dtype=np.dtype(dtype.rstrip(b'\0').decode('ascii')),
+                          buffer=self.shm.buf, offset=offset + SLOT_HEADER_SIZE)
+        data.flags.writeable = False
+        metadata = FrameMetadata(sensor_id.rstrip(b'\0').decode('utf-8'), sequence, capture_ns,
+                                 wall_offset_ns, bool(keyframe), output.rstrip(b'\0').decode('utf-8'))
+        frame = ShmFrame(data, metadata, self, slot, counter)
+        if not frame.valid():  # Overwritten while the header was being read
+            self.overwritten += 1
+            return None
+        return frame
+
+    async def next_frame(self) -> ShmFrame:
+        """Wait for the next notified frame that is still intact."""
+        while True:
+            slot, counter = NOTIFICATION.unpack(await self.socket.recv())
+            frame = self.read(slot, counter)
+            if frame is not None:
+                return frame
+
+    def close(self) -> None:
+        """Close the reader. All ShmFrame views must be released first."""
+        self.socket.close(linger=0)
+        self.shm.close()
@@ -0,0 +1,104 @@
+import glob
+import hashlib
+import json
+import os
+import platform
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from edge_node.src.calibration import DEFAULT_CACHE_DIR
+from shared.models import EdgeNodeCapabilities
+from shared.logger import edge_node_logger as logger
+
+# Device nodes whose appearance or removal means the sensors must be probed again
+SENSOR_DEVICES = "/dev/video*"
+
+
+class StartupTimer:
+    """
+    Times the phases of edge node startup relative to process start, and
+    logs each one as it ends, so slow boots show which phase to blame.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        """
+        Args:
+            started (float, optional): time.monotonic() at process start, defaults to now.
+        """
+        self.started = time.monotonic() if started is None else started
+        self.phases: Dict[str, Dict[str, float]] = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+    @contextmanager
+    def phase(self, name: str):
+        start_ms = self.elapsed_ms()
+        try:
+            yield
+        finally:
+            self.record(name, start_ms)
+
+    def record(self, name: str, start_ms: float) -> None:
+        """Record a phase that began start_ms after process start and ends now."""
+        end_ms = self.elapsed_ms()
+        self.phases[name] = {'start_ms': round(start_ms, 1), 'duration_ms': round(end_ms - start_ms, 1)}
+        logger.info(f"Startup phase {name}: {end_ms - start_ms:.0f} ms, done {end_ms:.0f} ms after start")
+
+    def mark(self, name: str) -> None:
+        """Record a milestone, such as the node being advertised."""
+        self.record(name, self.elapsed_ms())
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return dict(self.phases)
+
+
+class CapabilityProbe:
+    """
+    Probes a HAL's capabilities and persists the result, so a restarting
+    node can advertise what it found last time without waiting for sensor
+    detection and encoder discovery. The cache is keyed by the HAL, the
+    machine and the video device nodes present; callers still probe afresh
+    in the background and re-advertise if anything changed.
+    """
+
+    def __init__(self, hal, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.hal = hal
+        self.cache_dir = os.path.expanduser(cache_dir)
+
+    @property
+    def cache_path(self) -> str:
+        identity = {
+            'hal': type(self.hal).__name__,
+            'machine': platform.machine(),
+            'node': platform.node(),
+            'devices': sorted(glob.glob(SENSOR_DEVICES))
+        }
+        key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"capabilities-{key}.json")
+
+    def cached(self) -> Optional[EdgeNodeCapabilities]:
+        """The capabilities persisted by an earlier probe on this hardware, or None."""
+        try:
+            with open(self.cache_path) as f:
+                return EdgeNodeCapabilities(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def probe(self) -> EdgeNodeCapabilities:
+        """
+        Probe the HAL (once per HAL instance) and persist the result. Blocks
+        on hardware; run it in an executor.
+        """
+        capabilities = self.hal.probe_capabilities()
+        path = self.cache_path
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, 'w') as f:
+                json.dump(capabilities.dict(), f)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Could not cache capabilities in {path}: {str(e)}")
+        return capabilities
@@ -1,17 +1,256 @@
 import asyncio
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from edge_node.src.hardware_abstraction.frame_ops import FrameTransform
+from shared.exceptions import StreamError
+from shared.frames import Frame, FrameMetadata
+from shared.gop_cache import GopCache
+from shared.latency import LatencyTracker
 from shared.logger import edge_node_logger as logger
+from shared.models import StreamConfig
+from shared.serialization import model_dict
+
+DEFAULT_FPS = 30.0
+# Fraction of an output's frame period a capture may arrive early and still be used
+RATE_SLACK = 0.1
+# Seconds between checks for a new output while the capture is stopped
+IDLE_POLL_INTERVAL = 0.05
+
+
+class OutputProfile:
+    """
+    One named output stream rendered from the shared capture.
+
+    Frames are decimated to the output's fps and numbered with the output's
+    own sequence, so gap detection downstream is not confused by decimation.
+    """
+
+    def __init__(self, config: StreamConfig):
+        self.config = config
+        self.name = config.output
+        # Crop/scale applied to the capture on the CPU, or None when the capture already matches
+        self.transform: Optional[FrameTransform] = None
+        self.sequence = 0
+        self.next_due_ns: Optional[float] = None
+
+    def due(self, capture_ns: int, capture_fps: float) -> bool:
+        """Whether a frame captured at capture_ns belongs to this output."""
+        if self.config.fps >= capture_fps:
+            return True
+        period_ns = 1e9 / self.config.fps
+        if self.next_due_ns is not None and capture_ns < self.next_due_ns - RATE_SLACK * period_ns:
+            return False
+        # Stay on the output's frame grid unless the capture fell a whole period behind it
+        if self.next_due_ns is None or capture_ns - self.next_due_ns > period_ns:
+            self.next_due_ns = capture_ns
+        self.next_due_ns += period_ns
+        return True
+
+    def stamp(self, metadata: FrameMetadata) -> FrameMetadata:
+        sequence = self.sequence
+        self.sequence += 1
+        return metadata._replace(sequence=sequence, output=self.name)
+
 
 class Streamer:
-    def __init__(self, hal, config):
+    def __init__(self, hal, config, transport=None, gop_cache=None, local_transport=None, change_gate=None):
         self.hal = hal
         self.config = config
+        self.transport = transport
+        # Optional ChangeGate suppressing frames of static scenes before they are sent
+        self.change_gate = change_gate
+        # Optional shared-memory transport for consumers on the same host
+        self.local_transport = local_transport
+        # Last keyframe and following deltas per stream, replayed to late joiners
+        self.gop_cache = gop_cache if gop_cache is not None else GopCache()
+        # Capture-to-hop latency and sequence-gap statistics per stream
+        self.latency = LatencyTracker()
+        # Named outputs fed from one capture; until one is configured, captured
+        # frames are published unchanged
+        self.outputs: Dict[str, OutputProfile] = {}
+        self.capture_config: Optional[StreamConfig] = None
+        # False once the last output is removed: the HAL is stopped until an output is configured again
+        self.capturing = True
+        self.running = False
 
     async def run(self):
         logger.info("Streamer starting")
-        while True:
-            # Implement your streaming logic here
-            await asyncio.sleep(1)  # Placeholder, replace with actual streaming code
+        self.running = True
+        while self.running:
+            if not self.capturing:
+                await asyncio.sleep(IDLE_POLL_INTERVAL)
+                continue
+            try:
+                frame = self.hal.get_frame()
+            except StreamError as e:
+                logger.error(f"Capture stopped: {str(e)}")
+                self.running = False
+                break
+            await self.publish(frame)
+            delay = self.hal.frame_delay()
+            if delay is None:
+                fps = self.capture_config.fps if self.capture_config else self.config.get('fps', DEFAULT_FPS)
+                delay = 1.0 / float(fps)
+            await asyncio.sleep(delay)
+
+    def configure_output(self, config: StreamConfig) -> StreamConfig:
+        """
+        Add or replace a named output, restarting the capture only if the
+        outputs now need a different one. Other outputs keep streaming.
+
+        Args:
+            config (StreamConfig): The output's configuration, already validated.
+
+        Returns:
+            StreamConfig: The configuration the capture now runs with.
+
+        Raises:
+            StreamError: If the HAL cannot start the capture; the previous outputs are kept.
+        """
+        previous = dict(self.outputs)
+        self.outputs[config.output] = OutputProfile(config)
+        try:
+            capture = self._plan()
+        except Exception:
+            # Bring the previous outputs back on the capture they were using
+            self.outputs = previous
+            if previous:
+                self.capture_config = None
+                try:
+                    self._plan()
+                except Exception as e:
+                    # Report the original failure; the capture stays down until the next configuration
+                    logger.error(f"Could not restore the previous capture: {str(e)}")
+                    self.capturing = False
+            raise
+        if not previous:
+            self.gop_cache.clear()
+        # A reconfigured output starts a new GOP; its stale frames must not be replayed
+        self._discard_cached(config.output)
+        return capture
+
+    def remove_output(self, name: str) -> Optional[StreamConfig]:
+        """
+        Stop a named output. Removing the last one stops the capture until
+        another output is configured.
+
+        Args:
+            name (str): The output to remove.
+
+        Returns:
+            StreamConfig: The capture configuration, or None if no outputs remain.
+
+        Raises:
+            KeyError: If no such output is configured.
+        """
+        del self.outputs[name]
+        self._discard_cached(name)
+        if not self.outputs:
+            logger.info("No outputs remain, stopping capture")
+            if self.hal is not None:
+                self.hal.stop_stream()
+            self.capture_config = None
+            self.capturing = False
+            return None
+        return self._plan()
+
+    def output_configs(self) -> List[Dict]:
+        """Configuration and frames sent so far of every output."""
+        return [dict(model_dict(output.config), frames_sent=output.sequence) for output in self.outputs.values()]
+
+    def _discard_cached(self, name: str) -> None:
+        for stream_id in list(self.gop_cache.streams):
+            if stream_id.endswith(f"/{name}"):
+                self.gop_cache.discard(stream_id)
+
+    def _plan(self) -> StreamConfig:
+        """
+        Derive the single capture that serves every output, and the transform
+        each output applies to it.
+
+        A lone output is captured exactly as configured, so the HAL crops and
+        scales in its own pipeline. Several outputs share one capture at the
+        largest configured resolution and the highest fps; each output then
+        crops and scales on the CPU, and outputs with the same crop and size
+        share one transform, which runs once per frame however many use it.
+        """
+        configs = [output.config for output in self.outputs.values()]
+        if len(configs) == 1:
+            capture = configs[0]
+        else:
+            largest = max(configs, key=lambda config: config.sensor_size()[0] * config.sensor_size()[1])
+            capture = StreamConfig(resolution=largest.resolution, fps=max(config.fps for config in configs),
+                                   encoding=largest.encoding, output=largest.output)
+        transforms: Dict[tuple, FrameTransform] = {}
+        for output in self.outputs.values():
+            output.transform = None
+            if output.config is not capture:
+                transform = FrameTransform(output.config, capture.sensor_size())
+                output.transform = transforms.setdefault(transform.key, transform)
+        if capture != self.capture_config and self.hal is not None:
+            logger.info(f"Restarting capture with: {capture}")
+            self.hal.stop_stream()
+            self.hal.start_stream(capture)
+        self.capture_config = capture
+        self.capturing = True
+        logger.info(f"Serving outputs {sorted(self.outputs)} with {len(transforms)} distinct transforms")
+        return capture
+
+    async def publish(self, frame):
+        """
+        Hand a captured frame to the transport once for every output it is due
+        for, recording latency at each hop.
+
+        Args:
+            frame (Frame): The stamped frame returned by the HAL.
+        """
+        self.latency.observe('streamer', frame.metadata)
+        if self.change_gate is not None:
+            frame = self.change_gate.admit(frame)
+            if frame is None:
+                return
+        if not self.outputs:
+            if self.capturing:
+                await self._send(frame)
+            return
+        capture_fps = self.capture_config.fps
+        rendered = {}  # Results of this frame's transforms, shared by outputs with equal keys
+        for output in list(self.outputs.values()):
+            if not output.due(frame.metadata.capture_ns, capture_fps):
+                continue
+            data = frame.data
+            if output.transform is not None:
+                if not isinstance(data, np.ndarray):
+                    logger.debug(f"Output {output.name} needs raw frames to crop or scale")
+                    continue
+                data = rendered.get(output.transform.key)
+                if data is None:
+                    data = rendered[output.transform.key] = output.transform.apply(frame.data)
+            await self._send(Frame(data, output.stamp(frame.metadata)))
+
+    async def _send(self, frame):
+        if self.transport is not None:
+            await self.transport.send(frame)
+            self.latency.observe('transport', frame.metadata)
+        if self.local_transport is not None:
+            await self.local_transport.send(frame)
+            self.latency.observe('local_transport', frame.metadata)
+        # Cache after sending so a subscriber served during send() isn't replayed this frame twice
+        self.gop_cache.add(frame)
+
+    def queue_depths(self):
+        """
+        Frames currently buffered at each stage, reported in heartbeat telemetry.
+
+        Returns:
+            dict: Buffered frame counts keyed by stage name.
+        """
+        return {'gop_cache': sum(stream['frames'] for stream in self.gop_cache.stats().values())}
 
     async def stop(self):
         logger.info("Streamer stopping")
-        # Implement any cleanup or stop logic here
+        self.running = False
+        # A reconfigured stream starts a new GOP; stale frames must not be replayed
+        self.gop_cache.clear()
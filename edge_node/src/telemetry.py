@@ -0,0 +1,173 @@
+import glob
+import os
+import time
+from typing import Dict, Optional
+
+from shared.telemetry import DeltaEncoder
+from shared.logger import edge_node_logger as logger
+
+MIN_HEARTBEAT_INTERVAL = 1.0
+MAX_HEARTBEAT_INTERVAL = 8.0  # Must stay below the API's heartbeat timeout
+# Host metrics jitter by a few points between samples; only moves larger than these count as changes
+SYSTEM_TOLERANCES = {
+    'system.cpu_percent': 10,
+    'system.gpu_percent': 10,
+    'system.memory_percent': 5,
+    'system.temperature_c': 2.0
+}
+
+
+class SystemMonitor:
+    """
+    Lightweight host metrics read straight from procfs and sysfs.
+
+    CPU use is derived from the difference between successive /proc/stat
+    samples, so the first sample reports None. GPU load is read from the
+    Jetson's gpu.0 load file and temperature is the hottest thermal zone;
+    either is None where the host does not expose it.
+    """
+
+    def __init__(self, proc_root: str = "/proc", sys_root: str = "/sys"):
+        self.proc_root = proc_root
+        self.sys_root = sys_root
+        self._cpu_times = None
+
+    def _read(self, path: str) -> Optional[str]:
+        try:
+            with open(path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def cpu_percent(self) -> Optional[float]:
+        stat = self._read(os.path.join(self.proc_root, "stat"))
+        if not stat:
+            return None
+        fields = [int(value) for value in stat.splitlines()[0].split()[1:]]
+        idle, total = fields[3] + (fields[4] if len(fields) > 4 else 0), sum(fields)
+        previous, self._cpu_times = self._cpu_times, (idle, total)
+        if previous is None or total == previous[1]:
+            return None
+        return round(100.0 * (1 - (idle - previous[0]) / (total - previous[1])))
+
+    def memory_percent(self) -> Optional[float]:
+        meminfo = self._read(os.path.join(self.proc_root, "meminfo"))
+        if not meminfo:
+            return None
+        values = {}
+        for line in meminfo.splitlines():
+            key, _, rest = line.partition(':')
+            values[key] = int(rest.split()[0]) if rest.split() else 0
+        if not values.get('MemTotal') or 'MemAvailable' not in values:
+            return None
+        return round(100.0 * (1 - values['MemAvailable'] / values['MemTotal']))
+
+    def gpu_percent(self) -> Optional[float]:
+        load = self._read(os.path.join(self.sys_root, "devices", "gpu.0", "load"))
+        return round(int(load) / 10.0) if load and load.strip().isdigit() else None
+
+    def temperature_c(self) -> Optional[float]:
+        temperatures = []
+        for path in glob.glob(os.path.join(self.sys_root, "class", "thermal", "thermal_zone*", "temp")):
+            value = self._read(path)
+            if value and value.strip().lstrip('-').isdigit():
+                temperatures.append(int(value) / 1000.0)
+        return round(max(temperatures), 1) if temperatures else None
+
+    def sample(self) -> Dict[str, float]:
+        metrics = {
+            'cpu_percent': self.cpu_percent(),
+            'gpu_percent': self.gpu_percent(),
+            'memory_percent': self.memory_percent(),
+            'temperature_c': self.temperature_c()
+        }
+        return {name: value for name, value in metrics.items() if value is not None}
+
+
+class TelemetryCollector:
+    """
+    Builds the telemetry block carried by heartbeats from the Streamer's
+    counters: effective fps and drop counts per sensor, queue depths, host
+    metrics, event loop lag and, when change detection is enabled,
+    suppression per sensor.
+    """
+
+    def __init__(self, streamer, monitor: Optional[SystemMonitor] = None, loop_lag: Optional[Dict] = None):
+        """
+        Args:
+            streamer (Streamer): The streamer whose counters are reported.
+            monitor (SystemMonitor, optional): Source of host metrics.
+            loop_lag (dict, optional): LoopLagMonitor per event loop name; the p99 lag
+                since the previous snapshot is reported for each.
+        """
+        self.streamer = streamer
+        self.monitor = monitor or SystemMonitor()
+        self.loop_lag = loop_lag or {}
+        self._frames: Dict[str, int] = {}
+        self._sampled_at = None
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._sampled_at if self._sampled_at is not None else None
+        self._sampled_at = now
+        sensors = {}
+        # Copies, as the data plane may add streams while the snapshot is taken
+        hops = {hop: dict(streams) for hop, streams in list(self.streamer.latency.hops.items())}
+        for sensor_id, stats in hops.get('streamer', {}).items():
+            received = stats.sequence.received
+            previous = self._frames.get(sensor_id)
+            self._frames[sensor_id] = received
+            fps = (received - previous) / elapsed if previous is not None and elapsed else 0.0
+            dropped = max(hop[sensor_id].sequence.lost for hop in hops.values() if sensor_id in hop)
+            sensors[sensor_id] = {'fps': round(fps, 1), 'dropped': dropped}
+        snapshot = {
+            'sensors': sensors,
+            'queues': self.streamer.queue_depths(),
+            'system': self.monitor.sample()
+        }
+        if self.loop_lag:
+            # Percentiles are bucket bounds, so they only move when lag really changes
+            snapshot['loop_lag_p99_ms'] = {
+                name: monitor.take_window()['p99_ms'] or 0.0 for name, monitor in self.loop_lag.items()
+            }
+        if self.streamer.change_gate is not None:
+            snapshot['change_detection'] = self.streamer.change_gate.stats()
+        return snapshot
+
+
+class HeartbeatTelemetry:
+    """
+    Produces heartbeat payloads and decides when the next one is due.
+
+    Payloads are delta-encoded against what the API last acknowledged. The
+    interval halves whenever telemetry changed and grows by half when nothing
+    did, between min_interval and max_interval, so an idle node heartbeats
+    rarely while a node whose fps or drops are moving reports promptly. Host
+    metrics are compared with the absolute SYSTEM_TOLERANCES rather than the
+    relative tolerance, so their usual jitter does not pin the interval at
+    min_interval. Each payload tells the API when the next heartbeat is due
+    so it can adapt its offline detection.
+    """
+
+    def __init__(self, collector: TelemetryCollector, min_interval: float = MIN_HEARTBEAT_INTERVAL,
+                 max_interval: float = MAX_HEARTBEAT_INTERVAL, tolerance: float = 0.05, full_every: int = 60):
+        self.collector = collector
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.encoder = DeltaEncoder(tolerance, full_every, SYSTEM_TOLERANCES)
+
+    def next_payload(self) -> Dict:
+        payload = self.encoder.encode(self.collector.snapshot())
+        if self.encoder.changed:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        payload['interval'] = round(self.interval, 3)
+        return payload
+
+    def handle_response(self, response: Dict) -> None:
+        if response.get('resync'):
+            logger.info("API requested a full telemetry snapshot")
+            self.encoder.request_full()
+            self.interval = self.min_interval
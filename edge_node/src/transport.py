@@ -0,0 +1,106 @@
+from typing import Optional
+import zmq
+import zmq.asyncio
+from shared.frames import Frame, encode_frame_header
+from shared.logger import edge_node_logger as logger
+
+
+class ZmqFrameTransport:
+    """
+    Publishes stamped frames over a ZMQ PUB socket.
+
+    Each frame is sent as a three-part message: the sensor id (used as the
+    subscription topic), a JSON header carrying the FrameMetadata, and the raw
+    payload. NumPy payloads additionally carry their shape and dtype in the
+    header so subscribers can rebuild them without copying.
+
+    When a GopCache and a replay port are given, a ROUTER socket on the
+    replay port answers each late joiner's request with the cached keyframe
+    and deltas of the streams it asked for, sent to that subscriber alone.
+    The replay is not subject to the live feed's high water mark, so a GOP
+    longer than it arrives whole, and subscribers that are already receiving
+    the stream never see it. Replayed frames carry "replay": true in their
+    header; shared.subscriber.ZmqFrameSubscriber requests and merges the replay
+    itself.
+    """
+
+    def __init__(self, port=5556, high_water_mark=10, context=None, gop_cache=None, replay_port=None):
+        """
+        Initialize the transport and bind its sockets.
+
+        Args:
+            port (int): TCP port to publish frames on.
+            high_water_mark (int): Frames queued per subscriber before dropping.
+            context (zmq.asyncio.Context, optional): ZMQ context to use.
+            gop_cache (GopCache, optional): Cache replayed to late joiners.
+            replay_port (int, optional): TCP port answering GOP replay requests; no
+                replay is served without one.
+        """
+        self.port = port
+        self.gop_cache = gop_cache
+        self.context = context or zmq.asyncio.Context.instance()
+        self.socket = self.context.socket(zmq.PUB)
+        self.socket.setsockopt(zmq.SNDHWM, high_water_mark)
+        self.socket.bind(f"tcp://*:{port}")
+        self.replay_port = replay_port if gop_cache is not None else None
+        self.replay_socket = None
+        if self.replay_port is not None:
+            self.replay_socket = self.context.socket(zmq.ROUTER)
+            # A replay is bounded by the GOP cache and is only queued until its requester reads or leaves
+            self.replay_socket.setsockopt(zmq.SNDHWM, 0)
+            self.replay_socket.bind(f"tcp://*:{self.replay_port}")
+        logger.info(f"Frame transport publishing on port {port}"
+                    + (f", replaying GOPs on port {self.replay_port}" if self.replay_port is not None else ""))
+
+    async def send(self, frame: Frame) -> None:
+        """
+        Publish a single frame, first answering any pending replay requests.
+
+        Args:
+            frame (Frame): The stamped frame to publish.
+        """
+        await self.serve_replays()
+        await self._send_frame(frame)
+
+    async def serve_replays(self) -> int:
+        """
+        Send the cached GOPs to subscribers that requested them since the last call.
+
+        Each request names a topic prefix and is answered with the cached
+        frames of the matching streams followed by an empty end marker.
+
+        Returns:
+            int: The number of frames replayed.
+        """
+        replayed = 0
+        if self.replay_socket is None:
+            return replayed
+        while await self.replay_socket.poll(0, zmq.POLLIN):
+            identity, topic = await self.replay_socket.recv_multipart()
+            topic = topic.decode('utf-8', errors='replace')
+            frames = self.gop_cache.frames_for(topic)
+            for cached in frames:
+                await self._send_frame(cached, replay=True, identity=identity)
+            await self.replay_socket.send_multipart([identity, b""])
+            replayed += len(frames)
+            logger.debug(f"Replayed {len(frames)} cached frames to new subscriber on '{topic}'")
+        return replayed
+
+    async def _send_frame(self, frame: Frame, replay: bool = False, identity: Optional[bytes] = None) -> None:
+        data = frame.data
+        extra = {'replay': True} if replay else {}
+        if hasattr(data, 'shape') and hasattr(data, 'dtype'):
+            if not data.flags['C_CONTIGUOUS']:
+                data = data.copy()  # ROI crops are strided views; zmq needs a flat buffer
+            extra.update(shape=list(data.shape), dtype=str(data.dtype))
+        header = encode_frame_header(frame.metadata, **extra)
+        parts = [frame.metadata.stream_id.encode('utf-8'), header, data]
+        if identity is None:
+            await self.socket.send_multipart(parts, copy=False)
+        else:
+            await self.replay_socket.send_multipart([identity] + parts, copy=False)
+
+    def close(self) -> None:
+        self.socket.close(linger=0)
+        if self.replay_socket is not None:
+            self.replay_socket.close(linger=0)
@@ -1,13 +1,41 @@
 import sys
 import os
+import asyncio
+import struct
+import threading
+import time
+import numpy as np
 import pytest
+import zmq
+import zmq.asyncio
+from unittest.mock import MagicMock, patch
 
 # Add the project root directory to the Python path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.insert(0, project_root)
 
 from edge_node.src.hardware_abstraction.mock_jetson_hal import MockJetsonHAL as HAL
+from edge_node.src.hardware_abstraction.frame_ops import FrameTransform
+from edge_node.src.hardware_abstraction.replay_hal import ReplayHAL, write_recording
+from edge_node.src.hardware_abstraction.pipeline_builder import PipelineBuilder, PipelineOptions
+from edge_node.src.profiler import ProfilerControl
+from edge_node.src.controller import Controller
+from edge_node.src.sensor_manager import SensorManager
+from edge_node.src.streamer import Streamer
+from edge_node.src.motion import ChangeGate
+from edge_node.src.dataplane import DataPlane, LoopLagMonitor
+from edge_node.src.recordings import RecordingLibrary, RecordingServer, parse_range
+from edge_node.src.calibration import Calibrator
+from edge_node.src.startup import CapabilityProbe, StartupTimer
+from edge_node.src.telemetry import SystemMonitor, TelemetryCollector, HeartbeatTelemetry
+from edge_node.src.transport import ZmqFrameTransport
+from shared.subscriber import ZmqFrameSubscriber
+from edge_node.src.shm_transport import ShmFrameTransport, ShmFrameReader
+from shared.frames import FrameStamper, decode_frame_header
+from shared.gop_cache import GopCache
+from shared.batching import FrameBatcher
 from shared.models import StreamConfig, SensorInfo
+from shared.exceptions import StreamError
 
 @pytest.fixture
 def jetson_hal():
@@ -43,3 +71,732 @@ def test_jetson_hal_get_capabilities(jetson_hal):
     assert "model" in capabilities.hardware_info
     assert len(capabilities.sensors) > 0
     assert len(capabilities.supported_encodings) > 0
+
+
+def test_jetson_hal_get_frame_is_stamped(jetson_hal):
+    first = jetson_hal.get_frame()
+    second = jetson_hal.get_frame()
+    assert first.data.shape == (480, 640, 3)
+    assert first.metadata.sensor_id == "mock_camera_0"
+    assert second.metadata.sequence == first.metadata.sequence + 1
+
+
+def test_streamer_records_latency(jetson_hal):
+    streamer = Streamer(jetson_hal, {})
+    asyncio.run(streamer.publish(jetson_hal.get_frame()))
+    stats = streamer.latency.snapshot()["streamer"]["mock_camera_0"]
+    assert stats["count"] == 1
+    assert stats["lost"] == 0
+
+
+def test_mock_hal_applies_roi_and_scale(jetson_hal):
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264",
+                          roi={"x": 100, "y": 50, "w": 400, "h": 300}, output_scale=0.5)
+    jetson_hal.start_stream(config)
+    frame = jetson_hal.get_frame().data
+    assert frame.shape == (150, 200, 3)
+    # Red channel encodes the sensor column, green the sensor row
+    assert frame[0, 0, 0] == 101 and frame[0, 0, 1] == 51
+
+
+def test_frame_transform_crop_is_a_view():
+    config = StreamConfig(resolution="640x480", fps=30.0, encoding="h264", roi={"x": 10, "y": 20, "w": 64, "h": 32})
+    sensor_frame = np.zeros((480, 640), dtype=np.uint8)
+    cropped = FrameTransform(config).apply(sensor_frame)
+    assert cropped.shape == (32, 64)
+    assert np.shares_memory(cropped, sensor_frame)
+
+
+def test_stream_config_validated_against_sensor(jetson_hal):
+    sensors = jetson_hal.detect_sensors()
+    StreamConfig(resolution="640x480", fps=30.0, encoding="h264").validate_against(sensors)
+    with pytest.raises(ValueError):
+        StreamConfig(resolution="800x600", fps=30.0, encoding="h264").validate_against(sensors)
+    with pytest.raises(ValueError):
+        StreamConfig(resolution="640x480", fps=30.0, encoding="h264",
+                     roi={"x": 600, "y": 0, "w": 100, "h": 100}).validate_against(sensors)
+
+
+def test_transport_replays_gop_to_late_joiner():
+    async def scenario():
+        context = zmq.asyncio.Context()
+        try:
+            stamper = FrameStamper()
+            cache = GopCache()
+            # The GOP is six times the high water mark, and keeps growing while the late joiner connects
+            transport = ZmqFrameTransport(25570, high_water_mark=10, context=context, gop_cache=cache,
+                                          replay_port=25571)
+            streamer = Streamer(None, {}, transport, cache)
+            existing = context.socket(zmq.SUB)
+            existing.setsockopt(zmq.SUBSCRIBE, b"cam_0")
+            existing.connect("tcp://127.0.0.1:25570")
+            await asyncio.sleep(0.2)
+            await streamer.publish(stamper.stamp("cam_0", b"key"))
+            for index in range(59):
+                await streamer.publish(stamper.stamp("cam_0", b"delta%d" % index, keyframe=False))
+
+            async def keep_publishing():
+                for index in range(59, 200):
+                    await streamer.publish(stamper.stamp("cam_0", b"delta%d" % index, keyframe=False))
+                    await asyncio.sleep(0.005)
+
+            publishing = asyncio.ensure_future(keep_publishing())
+            late = ZmqFrameSubscriber("tcp://127.0.0.1:25570", ("cam_0",), context,
+                                      replay_address="tcp://127.0.0.1:25571")
+            received = [await asyncio.wait_for(late.next_frame(), 2) for _ in range(80)]
+            await publishing
+            late.close()
+
+            existing_headers = []
+            while await existing.poll(0, zmq.POLLIN):
+                existing_headers.append(decode_frame_header((await existing.recv_multipart())[1]))
+            existing.close()
+            transport.close()
+            return received, late, existing_headers
+        finally:
+            context.destroy(linger=0)
+
+    received, late, existing_headers = asyncio.run(scenario())
+    assert [frame.metadata.sequence for frame in received] == list(range(80))
+    assert bytes(received[0].data) == b"key" and received[0].metadata.keyframe
+    assert late.replayed >= 60
+    # The replay went to the late joiner alone
+    assert not any(header.get("replay") for header in existing_headers)
+    sequences = [header["sequence"] for header in existing_headers]
+    assert sequences == sorted(set(sequences))
+
+
+def test_shm_transport_zero_copy_round_trip(jetson_hal):
+    async def scenario():
+        context = zmq.asyncio.Context()
+        name = f"ministream_test_{os.getpid()}"
+        writer = ShmFrameTransport(name, slots=2, slot_size=640 * 480 * 3, context=context)
+        reader = ShmFrameReader(name, context=context)
+        await asyncio.sleep(0.1)  # Let the notification subscription connect
+
+        frame = jetson_hal.get_frame()
+        await writer.send(frame)
+        received = await asyncio.wait_for(reader.next_frame(), 2)
+        assert np.array_equal(received.data, frame.data)
+        assert received.metadata == frame.metadata
+        assert not received.data.flags.writeable
+        assert received.valid()
+
+        # Two more writes wrap the two-slot ring and overwrite the frame being held
+        writer.write(jetson_hal.get_frame())
+        writer.write(jetson_hal.get_frame())
+        assert not received.valid()
+        assert reader.read(received.slot, received.counter) is None
+
+        del received
+        reader.close()
+        writer.close()
+        context.term()
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def raw_recording(tmp_path):
+    path = str(tmp_path / "raw.msrec")
+    frames = [np.full((48, 64, 3), i, dtype=np.uint8) for i in range(5)]
+    write_recording(path, frames, fps=10.0)
+    return path
+
+
+def test_replay_hal_plays_raw_recording_and_loops(raw_recording):
+    hal = ReplayHAL(raw_recording, realtime=False)
+    assert hal.detect_sensors()[0].resolutions == ["64x48"]
+    assert hal.detect_sensors()[0].max_fps == 10.0
+    assert hal.get_capabilities().supported_encodings == ["raw"]
+    # There is no encoder, so a raw recording cannot be served as h264
+    with pytest.raises(StreamError):
+        hal.start_stream(StreamConfig(resolution="64x48", fps=10.0, encoding="h264"))
+    hal.start_stream(StreamConfig(resolution="64x48", fps=10.0, encoding="raw",
+                                  roi={"x": 0, "y": 0, "w": 32, "h": 16}))
+    values = [int(hal.get_frame().data[0, 0, 0]) for _ in range(7)]
+    assert values == [0, 1, 2, 3, 4, 0, 1]
+    assert hal.get_frame().data.shape == (16, 32, 3)
+    assert hal.frame_delay() == 0.0
+
+
+def test_replay_hal_realtime_pacing_and_end(raw_recording):
+    hal = ReplayHAL(raw_recording, realtime=True, loop=False)
+    hal.start_stream(StreamConfig(resolution="64x48", fps=10.0, encoding="raw"))
+    hal.get_frame()
+    assert 0.05 < hal.frame_delay() <= 0.1
+    for _ in range(4):
+        hal.get_frame()
+    with pytest.raises(StreamError):
+        hal.get_frame()
+
+
+def test_replay_hal_encoded_recording(tmp_path):
+    path = str(tmp_path / "h264.msrec")
+    write_recording(path, [(b"key", 0, True), (b"delta", 33_000_000, False)], encoding="h264", width=64, height=48)
+    hal = ReplayHAL(path, realtime=False)
+    with pytest.raises(StreamError):
+        hal.start_stream(StreamConfig(resolution="64x48", fps=30.0, encoding="h265"))
+    hal.start_stream(StreamConfig(resolution="64x48", fps=30.0, encoding="h264"))
+    first, second = hal.get_frame(), hal.get_frame()
+    assert bytes(first.data) == b"key" and first.metadata.keyframe
+    assert bytes(second.data) == b"delta" and not second.metadata.keyframe
+
+
+def test_profiler_disabled_by_default():
+    assert "error" in ProfilerControl().start(1.0)
+
+
+def test_profiler_collects_folded_stacks_and_loop_lag():
+    def blocking_work(seconds):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            sum(range(1000))
+
+    async def busy_task():
+        for _ in range(15):
+            blocking_work(0.02)  # Long enough to span GIL switch intervals
+            await asyncio.sleep(0)
+
+    def data_plane_work(stop):
+        while not stop.is_set():
+            blocking_work(0.02)
+
+    async def scenario():
+        stop = threading.Event()
+        data_plane = threading.Thread(target=data_plane_work, args=(stop,), daemon=True)
+        data_plane.start()
+        control = ProfilerControl({'enabled': True, 'min_interval_ms': 5})
+        assert control.start(5.0, interval_ms=1, threads={'data_plane': data_plane.ident})["interval_ms"] == 5
+        assert "error" in control.start(5.0)
+        await busy_task()
+        result = control.stop()
+        stop.set()
+        data_plane.join()
+        return result
+
+    result = asyncio.run(scenario())
+    profile = result["profile"]
+    assert result["status"] == "complete"
+    assert profile["samples"] > 0
+    assert any(line.startswith("control;") and "blocking_work" in line for line in profile["folded"])
+    assert any(line.startswith("data_plane;") and "data_plane_work" in line for line in profile["folded"])
+    assert set(profile["threads_ms"]) == {"control", "data_plane"}
+    assert any(task.startswith("control/") and task.endswith(":scenario") for task in profile["tasks_ms"])
+    assert profile["loop_lag"]["count"] > 0
+
+
+def test_system_monitor_reads_proc_and_sys(tmp_path):
+    proc, sys_root = tmp_path / "proc", tmp_path / "sys"
+    (sys_root / "class" / "thermal" / "thermal_zone0").mkdir(parents=True)
+    (sys_root / "class" / "thermal" / "thermal_zone0" / "temp").write_text("48500\n")
+    (sys_root / "devices" / "gpu.0").mkdir(parents=True)
+    (sys_root / "devices" / "gpu.0" / "load").write_text("250\n")
+    proc.mkdir()
+    (proc / "meminfo").write_text("MemTotal: 1000 kB\nMemAvailable: 750 kB\n")
+    (proc / "stat").write_text("cpu  100 0 100 800 0 0 0 0\n")
+    monitor = SystemMonitor(str(proc), str(sys_root))
+    assert monitor.sample() == {'gpu_percent': 25, 'memory_percent': 25, 'temperature_c': 48.5}
+    (proc / "stat").write_text("cpu  150 0 150 900 0 0 0 0\n")
+    assert monitor.cpu_percent() == 50
+
+
+def test_heartbeat_telemetry_adapts_interval(jetson_hal, tmp_path):
+    streamer = Streamer(jetson_hal, {})
+    monitor = SystemMonitor(str(tmp_path), str(tmp_path))
+    telemetry = HeartbeatTelemetry(TelemetryCollector(streamer, monitor), min_interval=1.0, max_interval=8.0)
+    jetson_hal.start_stream(StreamConfig(resolution="640x480", fps=30, encoding="raw"))
+    for _ in range(3):
+        asyncio.run(streamer.publish(jetson_hal.get_frame()))
+    first = telemetry.next_payload()
+    assert first["full"] and first["telemetry"]["sensors.mock_camera_0.dropped"] == 0
+    assert first["telemetry"]["queues.gop_cache"] == 1  # Raw frames are all keyframes
+    # Nothing moves while idle, so heartbeats back off towards max_interval
+    intervals = [telemetry.next_payload()["interval"] for _ in range(8)]
+    assert intervals == sorted(intervals) and intervals[-1] == 8.0
+    telemetry.handle_response({"status": "ok", "resync": True})
+    assert telemetry.interval == 1.0 and telemetry.next_payload()["full"]
+
+
+def test_heartbeat_backs_off_despite_fluctuating_host_metrics(jetson_hal):
+    import random
+    jitter = random.Random(3)
+
+    class NoisyMonitor:
+        def sample(self):
+            return {'cpu_percent': 40 + jitter.randint(-6, 6), 'memory_percent': 55 + jitter.randint(-2, 2),
+                    'temperature_c': round(51 + jitter.uniform(-1, 1), 1)}
+
+    telemetry = HeartbeatTelemetry(TelemetryCollector(Streamer(jetson_hal, {}), NoisyMonitor()),
+                                   min_interval=1.0, max_interval=8.0)
+    telemetry.next_payload()
+    intervals = [telemetry.next_payload()["interval"] for _ in range(8)]
+    assert intervals[-1] == 8.0
+    # A real change in load still brings the heartbeat forward
+    telemetry.collector.monitor.sample = lambda: {'cpu_percent': 95, 'memory_percent': 55, 'temperature_c': 51.0}
+    payload = telemetry.next_payload()
+    assert payload["telemetry"] == {"system.cpu_percent": 95} and payload["interval"] == 4.0
+
+
+def test_jetson_hal_restarts_stream_without_registering_twice():
+    # GStreamer and the Jetson GPIO bindings only exist on the device
+    fakes = {name: MagicMock() for name in ("gi", "gi.repository", "Jetson", "Jetson.GPIO")}
+    with patch.dict(sys.modules, fakes):
+        sys.modules.pop("edge_node.src.hardware_abstraction.jetson_hal", None)
+        from edge_node.src.hardware_abstraction import jetson_hal
+        sys.modules.pop("edge_node.src.hardware_abstraction.jetson_hal")
+    zeroconf = MagicMock()
+    zeroconf.register_service.side_effect = [None, Exception("NonUniqueNameException")]
+    hal = jetson_hal.JetsonHAL()
+    hal._zeroconf = zeroconf
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264")
+    hal.start_stream(config)
+    hal.stop_stream()
+    assert hal.pipeline is None
+    hal.start_stream(config)
+    assert hal.pipeline is not None
+    assert zeroconf.register_service.call_count == 1
+
+
+def test_pipeline_builder_encodes_once_with_hardware_encoder():
+    builder = PipelineBuilder(available_elements=["nvv4l2h264enc", "x264enc"])
+    pipeline = builder.build(StreamConfig(resolution="1280x720", fps=30, encoding="h264"))
+    assert pipeline.count("enc ") == 1 and "nvv4l2h264enc" in pipeline
+    assert "video/x-raw(memory:NVMM)" in pipeline
+    # The encoded stream is teed to both branches after the single encoder
+    assert pipeline.index("nvv4l2h264enc") < pipeline.index("tee name=t")
+    assert "rtph264pay" in pipeline and "mp4mux" in pipeline
+    assert builder.supported_encodings() == ["h264"]
+
+
+def test_pipeline_builder_optional_branches_and_fallback():
+    options = PipelineOptions(record={"enabled": False}, preview={"enabled": True, "sink": "autovideosink"})
+    builder = PipelineBuilder(options, available_elements=["x265enc"])
+    pipeline = builder.build(StreamConfig(resolution="640x480", fps=15, encoding="h265"))
+    assert "x265enc" in pipeline and "nvvidconv" not in pipeline and "mp4mux" not in pipeline
+    assert "rtph265pay" in pipeline and "raw. ! queue" in pipeline and "autovideosink" in pipeline
+    with pytest.raises(StreamError):
+        builder.build(StreamConfig(resolution="640x480", fps=15, encoding="h264"))
+    preview_only = PipelineBuilder(PipelineOptions(network={"enabled": False}, record={"enabled": False},
+                                                   preview={"enabled": True}), available_elements=[])
+    assert "enc" not in preview_only.build(StreamConfig(resolution="640x480", fps=15, encoding="h264"))
+    with pytest.raises(StreamError):
+        PipelineBuilder(PipelineOptions(network={"enabled": False}, record={"enabled": False})).build(
+            StreamConfig(resolution="640x480", fps=15, encoding="h264"))
+
+
+def test_zmq_subscriber_feeds_frame_batches(jetson_hal):
+    async def scenario():
+        context = zmq.asyncio.Context()
+        transport = ZmqFrameTransport(25557, context=context)
+        subscriber = ZmqFrameSubscriber("tcp://127.0.0.1:25557", context=context)
+        await asyncio.sleep(0.2)
+        sent = [jetson_hal.get_frame() for _ in range(4)]
+        for frame in sent:
+            await transport.send(frame)
+        batcher = FrameBatcher(subscriber.next_frame, batch_size=4, max_wait=1.0)
+        batch = await asyncio.wait_for(batcher.next_batch(), 2)
+        subscriber.close()
+        transport.close()
+        context.term()
+        return sent, batch
+
+    sent, batch = asyncio.run(scenario())
+    assert batch.frames.shape == (4, 480, 640, 3)
+    assert np.array_equal(batch.frames[3], sent[3].data)
+    assert list(batch.sequences) == [frame.metadata.sequence for frame in sent]
+    assert list(batch.capture_ns) == [frame.metadata.capture_ns for frame in sent]
+
+
+class FrameSink:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, frame):
+        self.frames.append(frame)
+
+
+def test_streamer_simulcasts_outputs_from_one_capture(jetson_hal):
+    sink = FrameSink()
+    streamer = Streamer(jetson_hal, {}, sink)
+    full = StreamConfig(output="record", resolution="1280x720", fps=30.0, encoding="h265")
+    live = StreamConfig(output="live", resolution="1280x720", fps=15.0, encoding="h264", output_scale=0.25)
+    # A lone output is cropped and scaled by the HAL itself
+    assert streamer.configure_output(live) == live
+    assert jetson_hal.get_frame().data.shape == (180, 320, 3)
+    capture = streamer.configure_output(full)
+    assert (capture.resolution, capture.fps, capture.roi) == ("1280x720", 30.0, None)
+    # Same crop and size as "live", so both share one transform
+    streamer.configure_output(live.copy(update={"output": "preview", "fps": 30.0}))
+    assert streamer.outputs["preview"].transform is streamer.outputs["live"].transform
+
+    async def capture_frames(count):
+        for index in range(count):
+            frame = jetson_hal.get_frame()
+            metadata = frame.metadata._replace(capture_ns=index * 33_333_333)
+            await streamer.publish(frame._replace(metadata=metadata))
+    asyncio.run(capture_frames(6))
+
+    by_stream = {}
+    for frame in sink.frames:
+        by_stream.setdefault(frame.metadata.stream_id, []).append(frame)
+    assert len(by_stream["mock_camera_0/record"]) == 6
+    assert len(by_stream["mock_camera_0/preview"]) == 6
+    live_frames = by_stream["mock_camera_0/live"]
+    assert [frame.metadata.sequence for frame in live_frames] == [0, 1, 2]
+    assert live_frames[0].data.shape == (180, 320, 3)
+    # The shared transform ran once for both outputs
+    assert live_frames[1].data is by_stream["mock_camera_0/preview"][2].data
+    assert streamer.latency.snapshot()["transport"]["mock_camera_0/live"]["lost"] == 0
+
+    assert streamer.remove_output("record").fps == 30.0
+    with pytest.raises(KeyError):
+        streamer.remove_output("record")
+    assert [config["output"] for config in streamer.output_configs()] == ["live", "preview"]
+
+
+def test_removing_the_last_output_stops_the_capture(jetson_hal):
+    sink = FrameSink()
+    streamer = Streamer(jetson_hal, {}, sink)
+    streamer.configure_output(StreamConfig(output="live", resolution="640x480", fps=30.0, encoding="raw"))
+
+    async def stream_for(seconds):
+        running = asyncio.ensure_future(streamer.run())
+        await asyncio.sleep(seconds)
+        streamer.running = False
+        await running
+
+    assert streamer.remove_output("live") is None
+    assert jetson_hal.pipeline is None and streamer.capture_config is None
+    asyncio.run(stream_for(0.15))
+    # Nothing is captured, and no raw frames go out on the bare sensor topic
+    assert sink.frames == []
+    streamer.configure_output(StreamConfig(output="live", resolution="640x480", fps=30.0, encoding="raw"))
+    assert jetson_hal.pipeline is not None
+    asyncio.run(stream_for(0.15))
+    assert sink.frames and all(frame.metadata.output == "live" for frame in sink.frames)
+
+
+def test_streamer_keeps_outputs_when_capture_fails(raw_recording):
+    hal = ReplayHAL(raw_recording)
+    streamer = Streamer(hal, {})
+    streamer.configure_output(StreamConfig(resolution=hal.resolution, fps=10.0, encoding="raw"))
+    with pytest.raises(StreamError):
+        streamer.configure_output(StreamConfig(output="big", resolution="1920x1080", fps=10.0, encoding="raw"))
+    assert list(streamer.outputs) == ["default"]
+    assert hal.get_frame().data.shape[:2] == tuple(reversed(streamer.capture_config.sensor_size()))
+
+
+def test_streamer_reports_the_first_error_when_restore_fails(jetson_hal):
+    streamer = Streamer(jetson_hal, {})
+    streamer.configure_output(StreamConfig(resolution="640x480", fps=30.0, encoding="h264"))
+    with patch.object(jetson_hal, "start_stream", side_effect=[StreamError("Encoder busy"), StreamError("Restore failed")]):
+        with pytest.raises(StreamError, match="Encoder busy"):
+            streamer.configure_output(StreamConfig(output="big", resolution="1920x1080", fps=30.0, encoding="h264"))
+    assert list(streamer.outputs) == ["default"] and not streamer.capturing
+
+
+def test_frame_transform_maps_roi_onto_larger_capture():
+    config = StreamConfig(resolution="640x480", fps=30.0, encoding="h264", roi={"x": 320, "y": 240, "w": 320, "h": 240})
+    transform = FrameTransform(config, source_size=(1280, 960))
+    sensor_frame = np.arange(960)[:, None].repeat(1280, axis=1)
+    result = transform.apply(sensor_frame)
+    assert result.shape == (240, 320)
+    assert result[0, 0] == 481  # Row 480 of the capture, sampled at the pixel centre
+
+
+def test_change_gate_suppresses_static_frames_with_keepalive():
+    gate = ChangeGate(threshold=0.01, keepalive_interval=1.0, hold=0.25, downsample=4)
+    stamper = FrameStamper()
+    static = np.zeros((64, 64, 3), dtype=np.uint8)
+    moving = static.copy()
+    moving[:32, :32] = 200
+    sent = []
+    # 10 fps for 3 s; the scene changes at 1.5 s
+    for index in range(30):
+        data = moving if index >= 15 else static
+        frame = stamper.stamp("cam_0", data, capture_ns=index * 100_000_000)
+        admitted = gate.admit(frame)
+        if admitted is not None:
+            sent.append((index, admitted.metadata.sequence))
+    indices = [index for index, _ in sent]
+    # First frame, a keepalive after 1 s, then full rate through the change and its hold
+    assert indices == [0, 10, 15, 16, 17, 27]
+    assert [sequence for _, sequence in sent] == list(range(len(sent)))
+    stats = gate.stats()["cam_0"]
+    assert stats["suppressed"] == 24
+    assert stats["suppression_ratio"] == 0.8
+    # Encoded payloads cannot be compared and always pass
+    assert gate.admit(stamper.stamp("cam_0", b"encoded")) is not None
+
+
+def test_streamer_reports_change_detection_in_telemetry(jetson_hal, tmp_path):
+    streamer = Streamer(jetson_hal, {}, change_gate=ChangeGate.from_config({'enabled': True}))
+    for _ in range(3):
+        asyncio.run(streamer.publish(jetson_hal.get_frame()))
+    snapshot = TelemetryCollector(streamer, SystemMonitor(str(tmp_path), str(tmp_path))).snapshot()
+    assert snapshot["change_detection"]["mock_camera_0"]["suppressed"] == 2
+    assert ChangeGate.from_config({'enabled': False}) is None
+
+
+def test_data_plane_runs_streamer_on_its_own_thread(jetson_hal):
+    sink = FrameSink()
+    streamer = Streamer(jetson_hal, {}, sink)
+    data_plane = DataPlane(streamer)
+
+    async def scenario():
+        lag = LoopLagMonitor(interval=0.005)
+        lag_task = asyncio.ensure_future(lag.run())
+        data_plane.start()
+        live = StreamConfig(output="live", resolution="640x480", fps=30.0, encoding="h264", output_scale=0.5)
+        await data_plane.call(streamer.configure_output, live)
+        with pytest.raises(KeyError):
+            await data_plane.call(streamer.remove_output, "missing")
+        await asyncio.sleep(0.2)
+        lag_task.cancel()
+        data_plane.stop()
+        with pytest.raises(StreamError):
+            await data_plane.call(streamer.output_configs)
+        return lag.take_window()
+
+    window = asyncio.run(scenario())
+    assert window["count"] > 0
+    assert data_plane.thread.name == "data-plane" and not data_plane.thread.is_alive()
+    live_frames = [frame for frame in sink.frames if frame.metadata.output == "live"]
+    assert live_frames and live_frames[0].data.shape == (240, 320, 3)
+    assert data_plane.lag.histogram.count > 0
+
+
+def test_telemetry_reports_loop_lag(jetson_hal, tmp_path):
+    monitor = LoopLagMonitor()
+    monitor.window.record(12.0)
+    collector = TelemetryCollector(Streamer(jetson_hal, {}), SystemMonitor(str(tmp_path), str(tmp_path)),
+                                   loop_lag={'control': monitor})
+    assert collector.snapshot()["loop_lag_p99_ms"] == {"control": 12.0}
+    # Each snapshot covers the lag since the previous one
+    assert collector.snapshot()["loop_lag_p99_ms"] == {"control": 0.0}
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=10-19", 100) == (10, 20)
+    assert parse_range("bytes=90-", 100) == (90, 100)
+    assert parse_range("bytes=-30", 100) == (70, 100)
+    assert parse_range("bytes=50-500", 100) == (50, 100)
+    # Multiple ranges and malformed headers fall back to the whole body
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=9-3", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_recording_library_cuts_clips_by_wall_time(tmp_path):
+    # One frame every 100 ms from 1000 s on the wall clock, a keyframe every fifth frame
+    frames = [(bytes([i]) * 10, i * 100_000_000, i % 5 == 0) for i in range(30)]
+    write_recording(str(tmp_path / "a.msrec"), frames, encoding="h264", width=64, height=48,
+                    wall_offset_ns=1_000_000_000_000)
+    library = RecordingLibrary(str(tmp_path))
+    assert library.catalog()[0]["start"] == 1000.0 and library.catalog()[0]["frames"] == 30
+    clip = library.clip(1001.25, 1002.0)
+    # Starts on the keyframe before 1001.25 so the clip decodes on its own; the end is exclusive
+    assert (clip.first, clip.last) == (10, 19)
+    path = str(tmp_path / "clip.bin")
+    with open(path, 'wb') as out, open(clip.recording.path, 'rb') as f:
+        for offset, count in clip.pieces(0, clip.length):
+            f.seek(offset)
+            out.write(f.read(count))
+    hal = ReplayHAL(path, realtime=False, loop=False)
+    assert [bytes(record_frame.data)[0] for record_frame in (hal.get_frame() for _ in range(10))] == list(range(10, 20))
+    assert library.clip(1010.0) is None
+    # Appended frames are picked up without re-reading the whole file
+    with open(clip.recording.path, 'ab') as f:
+        f.write(struct.pack('<qBI', 3_000_000_000, 1, 3) + b"new")
+    assert library.clip(1002.95).last == 30
+
+
+def test_recording_server_serves_byte_ranges(tmp_path):
+    import aiohttp
+    write_recording(str(tmp_path / "a.msrec"), [np.full((48, 64, 3), i, dtype=np.uint8) for i in range(20)],
+                    fps=10.0, wall_offset_ns=1_000_000_000_000)
+    server = RecordingServer(RecordingLibrary(str(tmp_path)), host="127.0.0.1", port=25558)
+    url = "http://127.0.0.1:25558/recordings"
+
+    async def scenario():
+        await server.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(url, params={"from": "1000.5", "to": "1001.5"}) as response:
+                    assert response.status == 200 and response.headers["X-Clip-Frames"] == "10"
+                    body = await response.read()
+                    etag = response.headers["ETag"]
+                headers = {"Range": "bytes=100-80000", "If-Range": etag}
+                async with session.get(url, params={"from": "1000.5", "to": "1001.5"}, headers=headers) as response:
+                    assert response.status == 206
+                    assert response.headers["Content-Range"] == f"bytes 100-80000/{len(body)}"
+                    assert await response.read() == body[100:80001]
+                async with session.get(url, params={"from": "1000.5"}, headers={"Range": "bytes=-10"}) as response:
+                    assert response.status == 206 and len(await response.read()) == 10
+                async with session.get(url, headers={"Range": f"bytes={10 ** 9}-"}) as response:
+                    assert response.status == 416
+                async with session.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'}) as response:
+                    assert response.status == 200
+                async with session.get(url, params={"from": "2000"}) as response:
+                    assert response.status == 404
+                async with session.get(f"{url}/index") as response:
+                    assert (await response.json())["recordings"][0]["frames"] == 20
+            return body
+        finally:
+            await server.stop()
+
+    body = asyncio.run(scenario())
+    path = str(tmp_path / "clip.bin")
+    with open(path, 'wb') as f:
+        f.write(body)
+    hal = ReplayHAL(path, realtime=False, loop=False)
+    assert len(hal.records) == 10 and int(hal.get_frame().data[0, 0, 0]) == 5
+
+
+class SlowFullHDHAL(HAL):
+    """Captures 1080p at about 20 fps and smaller resolutions at full speed."""
+
+    def get_frame(self):
+        if self.sensor_frame.shape[0] == 1080:
+            time.sleep(0.05)
+        return super().get_frame()
+
+
+def test_calibration_measures_limits_and_caches_them(tmp_path):
+    hal = SlowFullHDHAL()
+    limits = Calibrator(hal, budget=1.2, cache_dir=str(tmp_path)).limits()
+    assert limits["640x480"] == {"h264": 30.0, "h265": 30.0}
+    assert 10 <= limits["1920x1080"]["h264"] <= 25
+    assert hal.pipeline is None  # Calibration leaves the HAL stopped
+    # The next start on the same hardware reads the cache instead of measuring
+    cached = Calibrator(hal, budget=1.2, cache_dir=str(tmp_path))
+    cached.measure = lambda capabilities: pytest.fail("measured despite the cache")
+    assert cached.limits() == limits
+    with pytest.raises(ValueError, match="measured limit"):
+        StreamConfig(resolution="1920x1080", fps=30, encoding="h264").validate_against(hal.detect_sensors(), limits)
+    StreamConfig(resolution="640x480", fps=30, encoding="h264").validate_against(hal.detect_sensors(), limits)
+
+
+class NoH265FullHDHAL(HAL):
+    """Fails to start 1080p H.265 streams."""
+
+    def start_stream(self, config):
+        if config.resolution == "1920x1080" and config.encoding == "h265":
+            raise StreamError("Encoder unavailable")
+        super().start_stream(config)
+
+
+def test_calibration_leaves_failed_combinations_unlimited(tmp_path):
+    limits = Calibrator(NoH265FullHDHAL(), budget=0.6, cache_dir=str(tmp_path)).limits()
+    assert "h265" not in limits["1920x1080"] and limits["1920x1080"]["h264"] > 0
+    # Without a measured limit, the configuration is not rejected on account of the failed measurement
+    StreamConfig(resolution="1920x1080", fps=30, encoding="h265").validate_against(HAL().detect_sensors(), limits)
+    # An incomplete calibration is not cached, so the next start measures every combination again
+    assert os.listdir(tmp_path) == []
+    calibrator = Calibrator(NoH265FullHDHAL(), budget=0.6, cache_dir=str(tmp_path))
+    assert calibrator.cached_limits(calibrator.hal.probe_capabilities()) is None
+
+
+class CountingHAL(HAL):
+    probes = 0
+
+    def get_capabilities(self):
+        CountingHAL.probes += 1
+        return super().get_capabilities()
+
+
+def test_capability_probe_is_memoized_and_persisted(tmp_path):
+    CountingHAL.probes = 0
+    hal = CountingHAL()
+    probe = CapabilityProbe(hal, str(tmp_path))
+    assert probe.cached() is None
+    capabilities = probe.probe()
+    assert hal.probe_capabilities() is capabilities and CountingHAL.probes == 1
+    # A restarted node reads what the last probe found without touching the hardware
+    assert CapabilityProbe(CountingHAL(), str(tmp_path)).cached() == capabilities
+    assert CountingHAL.probes == 1
+
+
+def test_startup_reconciles_cached_capabilities_with_probe(tmp_path):
+    from edge_node.src.main import reconcile_capabilities
+    hal = HAL()
+    probed = hal.probe_capabilities()
+    cached = probed.copy(update={"supported_encodings": ["h264"]})
+    updates = []
+
+    class Zeroconf:
+        async def async_update_service(self, info):
+            updates.append(info)
+
+    class Controller:
+        measured_limits = {}
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        timer = StartupTimer()
+        with timer.phase("probe"):
+            probing = loop.run_in_executor(None, hal.probe_capabilities)
+            await reconcile_capabilities(probing, probed, {"device_id": "cam_0"}, Zeroconf(), Controller())
+        assert updates == [] and timer.to_dict()["probe"]["duration_ms"] >= 0
+        probing = loop.run_in_executor(None, hal.probe_capabilities)
+        await reconcile_capabilities(probing, cached, {"device_id": "cam_0"}, Zeroconf(), Controller())
+
+    asyncio.run(scenario())
+    assert len(updates) == 1 and b"h265" in updates[0].properties[b"supported_encodings"]
+
+
+def test_data_plane_starts_after_the_probe_releases_the_hal():
+    from edge_node.src.main import stream_after_probe
+    hal = HAL()
+    events = []
+
+    def slow_probe():
+        time.sleep(0.2)
+        events.append("probed")
+        return hal.probe_capabilities()
+
+    class DataPlaneStub:
+        def start(self):
+            events.append("started")
+
+        async def wait(self):
+            pass
+
+    async def scenario():
+        probing = asyncio.get_running_loop().run_in_executor(None, slow_probe)
+        await stream_after_probe(DataPlaneStub(), probing, hal.probe_capabilities(), {"device_id": "cam_0"},
+                                 None, None)
+
+    asyncio.run(scenario())
+    assert events == ["probed", "started"]
+
+
+@pytest.fixture
+def controller(jetson_hal):
+    controller = Controller(SensorManager(jetson_hal), Streamer(jetson_hal, {}), {'port': 25580})
+    yield controller
+    controller.socket.close(linger=0)
+    controller.context.term()
+
+
+def test_controller_skips_requests_past_their_budget(controller):
+    received_at = time.monotonic() - 3.0
+    expired = asyncio.run(controller.handle_message({'type': 'get_status', 'budget': 2.0}, received_at))
+    assert expired == {'error': 'Deadline exceeded'}
+    # The budget counts from receipt on the node's clock, whatever the caller's clock says
+    status = asyncio.run(controller.handle_message({'type': 'get_status', 'budget': 2.0}))
+    assert status['status'] == 'running'
+
+
+def test_controller_reports_rejected_configurations_as_errors(controller):
+    controller.measured_limits = {"1920x1080": {"h264": 12.5}}
+    too_fast = {"resolution": "1920x1080", "fps": 30.0, "encoding": "h264"}
+    outside = {"resolution": "1280x720", "fps": 30.0, "encoding": "h264", "roi": {"x": 1200, "y": 0, "w": 200, "h": 100}}
+    for config in (too_fast, outside, {"fps": "fast"}):
+        response = asyncio.run(controller.handle_message({"type": "configure_stream", "config": config}))
+        assert "error" in response
+    response = asyncio.run(controller.handle_message({"type": "configure_stream", "config": too_fast}))
+    assert "measured limit" in response["error"]
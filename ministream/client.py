@@ -0,0 +1,415 @@
+"""
+Async Python client for the Ministream Network API and edge node frame streams.
+
+Example:
+    async with MinistreamClient("http://network-api:8000") as client:
+        await client.configure("cam_0", StreamConfig(resolution="1280x720", fps=30, encoding="h264"))
+        async for frame in client.stream("cam_0", "camera_1"):
+            process(frame.data)
+"""
+import asyncio
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import aiohttp
+
+from shared.batching import FrameBatcher
+from shared.exceptions import APIError, CommunicationError, DeviceNotFoundError
+from shared.frames import Frame, FrameMetadata
+from shared.latency import SequenceTracker
+from shared.logger import client_logger as logger
+from shared.models import DeviceStatus, EdgeNodeCapabilities, StreamConfig
+from shared.serialization import dumps, loads, model_dict
+from shared.subscriber import ZmqFrameSubscriber
+from shared.sync import DEFAULT_TOLERANCE, FrameSet, FrameSynchronizer
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_CONNECTIONS = 32
+# Seconds without a frame after which a stream resolves its address again and reconnects
+DEFAULT_STALE_TIMEOUT = 5.0
+DEFAULT_RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 10.0
+# A frame this far behind the expected sequence means the publisher restarted, not reordering
+RESTART_WINDOW = 64
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class FrameStream:
+    """
+    Frames of one device, sensor or output, as an async iterator.
+
+    Frames are yielded without copying: NumPy payloads are read-only views
+    of the received ZMQ buffers, valid for as long as the frame is
+    referenced. Sequence gaps are tracked per stream. When no frame arrives
+    for stale_timeout seconds, the stream asks the API for the device's
+    address again and reconnects with exponential backoff, so it survives
+    edge node restarts and moves. When the device serves GOP replays, each
+    connection starts with the cached keyframe and deltas of the stream;
+    frames already received before a reconnect are not yielded twice.
+    """
+
+    def __init__(self, client: "MinistreamClient", device_id: str, sensor: Optional[str] = None,
+                 output: Optional[str] = None, stale_timeout: float = DEFAULT_STALE_TIMEOUT,
+                 reconnect_delay: float = DEFAULT_RECONNECT_DELAY,
+                 on_gap: Optional[Callable[[str, int], None]] = None):
+        """
+        Args:
+            client (MinistreamClient): Client used to resolve the device's stream address.
+            device_id (str): The device to receive from.
+            sensor (str, optional): Sensor id; every sensor when omitted.
+            output (str, optional): Named output of the sensor; every output when omitted.
+            stale_timeout (float): Seconds without frames before reconnecting.
+            reconnect_delay (float): Initial delay between reconnect attempts, doubled up to MAX_RECONNECT_DELAY.
+            on_gap (Callable, optional): Called with the stream id and the number of
+                frames missing whenever a gap is detected.
+
+        Raises:
+            ValueError: If an output is given without its sensor.
+        """
+        if output and not sensor:
+            raise ValueError("An output can only be selected together with its sensor")
+        self.client = client
+        self.device_id = device_id
+        self.topic = f"{sensor}/{output}" if output else (sensor or "")
+        self.stale_timeout = stale_timeout
+        self.reconnect_delay = reconnect_delay
+        self.on_gap = on_gap
+        self.address: Optional[str] = None
+        self.subscriber: Optional[ZmqFrameSubscriber] = None
+        self.sequences: Dict[str, SequenceTracker] = {}
+        self.reconnects = 0
+        self._delay = reconnect_delay
+
+    async def connect(self) -> None:
+        """
+        Resolve the device's stream address and subscribe, replacing any
+        previous connection.
+
+        Raises:
+            DeviceNotFoundError: If the device is unknown or has no stream port.
+            CommunicationError: If the API cannot be reached.
+        """
+        info = await self.client.stream_info(self.device_id)
+        address = info["address"]
+        previous = self.subscriber
+        self.subscriber = ZmqFrameSubscriber(address, (self.topic,), self.client.context,
+                                             replay_address=info.get("replay_address"))
+        if previous is not None:
+            # Carry the last sequences over so the GOP replayed to the new socket is not yielded twice
+            self.subscriber.last_sequence = previous.last_sequence
+            self.subscriber.duplicates = previous.duplicates
+            previous.close()
+        self.address = address
+        logger.info(f"Subscribed to '{self.topic}' on {address} for device {self.device_id}")
+
+    async def _reconnect(self) -> None:
+        self.reconnects += 1
+        await asyncio.sleep(self._delay)
+        self._delay = min(self._delay * 2, MAX_RECONNECT_DELAY)
+        try:
+            await self.connect()
+        except (CommunicationError, APIError) as e:
+            # DeviceNotFoundError included: the device may be re-registering; keep the old socket meanwhile
+            logger.warning(f"Reconnecting to device {self.device_id} failed: {str(e)}")
+
+    async def next_frame(self) -> Frame:
+        """
+        Wait for the next frame, reconnecting while the stream is stale.
+
+        Raises:
+            DeviceNotFoundError: If the device is unknown when the stream first connects.
+            CommunicationError: If the API cannot be reached when the stream first connects.
+        """
+        if self.subscriber is None:
+            await self.connect()
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.subscriber.next_frame(), self.stale_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"No frames from device {self.device_id} for {self.stale_timeout}s, reconnecting")
+                await self._reconnect()
+                continue
+            self._delay = self.reconnect_delay
+            self._observe(frame.metadata)
+            return frame
+
+    def _observe(self, metadata: FrameMetadata) -> None:
+        tracker = self.sequences.get(metadata.stream_id)
+        if tracker is None:
+            tracker = self.sequences[metadata.stream_id] = SequenceTracker()
+        if tracker.expected is not None and metadata.sequence < tracker.expected - RESTART_WINDOW:
+            logger.info(f"Stream {metadata.stream_id} restarted at sequence {metadata.sequence}")
+            tracker.expected = None
+        missing = tracker.observe(metadata.sequence)
+        if missing:
+            logger.debug(f"Stream {metadata.stream_id} lost {missing} frames before {metadata.sequence}")
+            if self.on_gap is not None:
+                self.on_gap(metadata.stream_id, missing)
+
+    def batches(self, batch_size: int, max_wait: float = 0.05, **options) -> FrameBatcher:
+        """
+        Iterate the stream in batches of up to batch_size frames, returned at
+        the latest max_wait seconds after their first frame. See FrameBatcher
+        for the other options.
+        """
+        return FrameBatcher(self.next_frame, batch_size, max_wait, **options)
+
+    def stats(self) -> Dict:
+        """Reconnects, dropped replay duplicates and received/gaps/lost counts per stream."""
+        return {
+            'address': self.address,
+            'reconnects': self.reconnects,
+            'duplicates': self.subscriber.duplicates if self.subscriber is not None else 0,
+            'streams': {stream_id: tracker.to_dict() for stream_id, tracker in self.sequences.items()}
+        }
+
+    def close(self) -> None:
+        if self.subscriber is not None:
+            self.subscriber.close()
+            self.subscriber = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Frame:
+        return await self.next_frame()
+
+    async def __aenter__(self) -> "FrameStream":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SynchronizedStreams:
+    """
+    Frame sets from several streams matched by capture time, as an async
+    iterator. Frames are read from every stream concurrently and joined by a
+    FrameSynchronizer, whose bounded buffers keep memory constant when a
+    stream lags or stalls.
+    """
+
+    def __init__(self, streams: Dict[str, FrameStream], synchronizer: FrameSynchronizer):
+        self.streams = streams
+        self.synchronizer = synchronizer
+        self._pending: Dict[asyncio.Future, str] = {}
+        self._ready = deque()
+
+    def _receive(self, name: str) -> None:
+        self._pending[asyncio.ensure_future(self.streams[name].next_frame())] = name
+
+    async def next_set(self) -> FrameSet:
+        """
+        Wait for the next frame set.
+
+        Raises:
+            DeviceNotFoundError: If a device is unknown when its stream first connects.
+            CommunicationError: If the API cannot be reached when a stream first connects.
+        """
+        if not self._pending:
+            for name in self.streams:
+                self._receive(name)
+        while not self._ready:
+            done, _ = await asyncio.wait(self._pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = self._pending.pop(task)
+                self._ready.extend(self.synchronizer.push(name, task.result()))
+                self._receive(name)
+        return self._ready.popleft()
+
+    def stats(self) -> Dict:
+        """The synchronizer's alignment statistics, plus each stream's own stats."""
+        stats = self.synchronizer.stats()
+        for name, stream in self.streams.items():
+            stats['streams'][name]['stream'] = stream.stats()
+        return stats
+
+    def close(self) -> None:
+        for task in self._pending:
+            task.cancel()
+        self._pending.clear()
+        for stream in self.streams.values():
+            stream.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> FrameSet:
+        return await self.next_set()
+
+    async def __aenter__(self) -> "SynchronizedStreams":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+class MinistreamClient:
+    """
+    Async client for the Network API.
+
+    Requests share one pooled HTTP session with keep-alive connections,
+    created on first use, and follow the redirects a sharded API cluster
+    answers with. Errors are raised as the shared Ministream exceptions:
+    DeviceNotFoundError for unknown devices, APIError for other error
+    responses and CommunicationError when the API cannot be reached.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8000", timeout: float = DEFAULT_TIMEOUT,
+                 connections: int = DEFAULT_CONNECTIONS, context=None):
+        """
+        Args:
+            base_url (str): Base URL of any Network API instance.
+            timeout (float): Upper bound on each request, in seconds.
+            connections (int): Maximum pooled connections to the API.
+            context (zmq.asyncio.Context, optional): ZMQ context for frame streams.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.connections = connections
+        self.context = context
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily, as aiohttp sessions must be created inside the running loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "MinistreamClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @staticmethod
+    def _error(method: str, path: str, status: int, payload: bytes) -> Exception:
+        try:
+            detail = loads(payload).get('detail', '')
+        except (ValueError, AttributeError):
+            detail = payload.decode('utf-8', errors='replace')
+        if status == 404 and str(detail).startswith("Device not found"):
+            return DeviceNotFoundError(str(detail))
+        return APIError(f"{method} {path} failed with {status}: {detail}")
+
+    async def request(self, method: str, path: str, body: Any = None, params: Optional[Dict] = None) -> Any:
+        """
+        Send a request to the API and decode its JSON response.
+
+        Raises:
+            DeviceNotFoundError: If the API does not know the device.
+            APIError: If the API answers with another error status.
+            CommunicationError: If the API cannot be reached.
+        """
+        data = dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else None
+        if params:
+            params = {name: str(value) for name, value in params.items() if value is not None}
+        try:
+            async with self.session.request(method, self.base_url + path, data=data, params=params,
+                                            headers=headers) as response:
+                payload = await response.read()
+                if response.status >= 400:
+                    raise self._error(method, path, response.status, payload)
+                return loads(payload) if payload else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise CommunicationError(f"Error communicating with {self.base_url}: {str(e) or type(e).__name__}")
+
+    async def devices(self) -> List[str]:
+        return await self.request("GET", "/devices")
+
+    async def status(self, device_id: str) -> DeviceStatus:
+        return DeviceStatus(**await self.request("GET", f"/devices/{device_id}/status"))
+
+    async def capabilities(self, device_id: str) -> EdgeNodeCapabilities:
+        return EdgeNodeCapabilities(**await self.request("GET", f"/devices/{device_id}/capabilities"))
+
+    async def configure(self, device_id: str, config: StreamConfig) -> Dict:
+        """Add or replace the output named by config.output on a device."""
+        return await self.request("POST", f"/devices/{device_id}/configure", model_dict(config))
+
+    async def outputs(self, device_id: str) -> Dict:
+        return await self.request("GET", f"/devices/{device_id}/outputs")
+
+    async def remove_output(self, device_id: str, output: str) -> Dict:
+        return await self.request("DELETE", f"/devices/{device_id}/outputs/{output}")
+
+    async def latency(self, device_id: str) -> Dict:
+        return await self.request("GET", f"/devices/{device_id}/latency")
+
+    async def telemetry(self, device_id: str, metric: Optional[str] = None, start: Optional[float] = None,
+                        end: Optional[float] = None, step: Optional[float] = None) -> Dict:
+        """Telemetry history of one metric, or the list of metrics when metric is omitted."""
+        return await self.request("GET", f"/devices/{device_id}/telemetry",
+                                  params={"metric": metric, "from": start, "to": end, "step": step})
+
+    async def recordings(self, device_id: str) -> List[Dict]:
+        return (await self.request("GET", f"/devices/{device_id}/recordings/index"))["recordings"]
+
+    async def download_recording(self, device_id: str, path: str, start: Optional[float] = None,
+                                 end: Optional[float] = None) -> Dict[str, float]:
+        """
+        Save the footage a device recorded in a time range to a file, chunk by chunk.
+
+        Returns:
+            dict: Times of the clip's first and last frames, in seconds since the epoch.
+
+        Raises:
+            DeviceNotFoundError, APIError, CommunicationError: As for request().
+        """
+        request_path = f"/devices/{device_id}/recordings"
+        params = {name: str(value) for name, value in (("from", start), ("to", end)) if value is not None}
+        try:
+            # Clips can take longer than a request timeout to transfer; only reads are bounded
+            timeout = aiohttp.ClientTimeout(total=None, sock_read=self.timeout)
+            async with self.session.get(self.base_url + request_path, params=params, timeout=timeout) as response:
+                if response.status >= 400:
+                    raise self._error("GET", request_path, response.status, await response.read())
+                with open(path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                return {'start': float(response.headers['X-Clip-Start']), 'end': float(response.headers['X-Clip-End'])}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise CommunicationError(f"Error communicating with {self.base_url}: {str(e) or type(e).__name__}")
+
+    async def stream_info(self, device_id: str) -> Dict[str, str]:
+        """The device's frame publisher address and, if it serves GOP replays, its replay address."""
+        return await self.request("GET", f"/devices/{device_id}/stream")
+
+    async def stream_address(self, device_id: str) -> str:
+        return (await self.stream_info(device_id))["address"]
+
+    def stream(self, device_id: str, sensor: Optional[str] = None, output: Optional[str] = None,
+               **options) -> FrameStream:
+        """
+        Receive a device's frames, as `async for frame in client.stream(device_id, sensor)`.
+        See FrameStream for the options.
+        """
+        return FrameStream(self, device_id, sensor, output, **options)
+
+    def synchronize(self, streams: Union[List[str], Dict[str, FrameStream]], tolerance: float = DEFAULT_TOLERANCE,
+                    **options) -> SynchronizedStreams:
+        """
+        Receive frame sets matched by capture time across devices, as
+        `async for frame_set in client.synchronize(["cam_0", "cam_1"])`.
+
+        Args:
+            streams: Device ids, each streamed whole, or FrameStreams by name,
+                e.g. to select one sensor per device. Each stream should carry
+                a single sensor.
+            tolerance (float): Largest difference in seconds between the frames of a set.
+            **options: Further FrameSynchronizer options, e.g. estimate_offsets=True
+                for devices whose clocks are not synchronized.
+        """
+        if not isinstance(streams, dict):
+            streams = {device_id: self.stream(device_id) for device_id in streams}
+        return SynchronizedStreams(streams, FrameSynchronizer(streams, tolerance, **options))
@@ -0,0 +1,186 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+import zmq.asyncio
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from ministream.client import MinistreamClient
+from edge_node.src.transport import ZmqFrameTransport
+from network_api.src.main import app, devices
+from shared.exceptions import APIError, DeviceNotFoundError
+from shared.frames import Frame, FrameMetadata
+from shared.models import Device, DeviceStatus, EdgeNodeCapabilities, SensorInfo
+
+API_URL = "http://127.0.0.1:28121"
+
+
+@pytest.fixture(scope="module")
+def api():
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=28121, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.05)
+    yield API_URL
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+@pytest.fixture
+def device(api):
+    devices.clear()
+    devices["cam_0"] = Device(
+        id="cam_0",
+        ip_address="127.0.0.1",
+        port=25559,
+        stream_port=25560,
+        capabilities=EdgeNodeCapabilities(
+            node_type="jetson",
+            hardware_info={"model": "Test"},
+            sensors=[SensorInfo(id="camera_1", name="Test Camera", resolutions=["64x48"], max_fps=30.0)],
+            supported_encodings=["h264"]
+        ),
+        status=DeviceStatus(id="cam_0", sensors=["camera_1"])
+    )
+    yield devices["cam_0"]
+    devices.clear()
+
+
+def frame(sequence, value=None):
+    data = np.full((48, 64, 3), sequence % 256 if value is None else value, dtype=np.uint8)
+    return Frame(data, FrameMetadata("camera_1", sequence, time.monotonic_ns(), 0, output="live"))
+
+
+async def publish(transport, sequences, interval=0.01):
+    for sequence in sequences:
+        await transport.send(frame(sequence))
+        await asyncio.sleep(interval)
+
+
+def test_client_rest_calls_and_errors(device):
+    async def scenario():
+        async with MinistreamClient(API_URL) as client:
+            assert await client.devices() == ["cam_0"]
+            capabilities = await client.capabilities("cam_0")
+            assert capabilities.sensors[0].id == "camera_1"
+            assert await client.stream_address("cam_0") == "tcp://127.0.0.1:25560"
+            with pytest.raises(DeviceNotFoundError):
+                await client.capabilities("missing")
+            with pytest.raises(APIError):
+                await client.telemetry("cam_0", metric="sensors.camera_1.fps")
+            # Requests reuse pooled connections
+            assert client.session.connector.limit == 32
+
+    asyncio.run(scenario())
+
+
+def test_client_stream_yields_views_and_detects_gaps(device):
+    context = zmq.asyncio.Context()
+    gaps = []
+
+    async def scenario():
+        transport = ZmqFrameTransport(25560, context=context)
+        async with MinistreamClient(API_URL, context=context) as client:
+            stream = client.stream("cam_0", "camera_1", "live", on_gap=lambda stream_id, missing: gaps.append(missing))
+            # Subscriptions take a moment to propagate, so publish until the stream is receiving
+            publisher = asyncio.ensure_future(publish(transport, list(range(0, 200)) + list(range(205, 300))))
+            first = await stream.next_frame()
+            # A view of the received message, not a copy
+            assert not first.data.flags.owndata and isinstance(first.data.base.base, memoryview)
+            received = [first]
+            async for received_frame in stream:
+                received.append(received_frame)
+                if received_frame.metadata.sequence >= 210:
+                    break
+            batch = await stream.batches(4, max_wait=1.0).next_batch()
+            publisher.cancel()
+            stream.close()
+        transport.close()
+        return received, batch, stream.stats()
+
+    try:
+        received, batch, stats = asyncio.run(scenario())
+    finally:
+        context.destroy(linger=0)
+    assert int(received[-1].data[0, 0, 0]) == received[-1].metadata.sequence % 256
+    assert gaps == [5]
+    assert stats["streams"]["camera_1/live"]["lost"] == 5
+    assert batch.frames.shape == (4, 48, 64, 3)
+
+
+def test_client_stream_reconnects_to_moved_device(device):
+    context = zmq.asyncio.Context()
+
+    async def scenario():
+        async with MinistreamClient(API_URL, context=context) as client:
+            stream = client.stream("cam_0", "camera_1", stale_timeout=0.3, reconnect_delay=0.05)
+            transport = ZmqFrameTransport(25560, context=context)
+            publisher = asyncio.ensure_future(publish(transport, range(1000, 1300)))
+            assert (await stream.next_frame()).metadata.sequence >= 1000
+            # The edge node restarts on another port and numbers its frames from zero again
+            publisher.cancel()
+            transport.close()
+            device.stream_port = 25561
+            transport = ZmqFrameTransport(25561, context=context)
+            publisher = asyncio.ensure_future(publish(transport, range(0, 300)))
+            restarted = await asyncio.wait_for(stream.next_frame(), 10)
+            publisher.cancel()
+            transport.close()
+            stream.close()
+            return restarted, stream.stats()
+
+    try:
+        restarted, stats = asyncio.run(scenario())
+    finally:
+        context.destroy(linger=0)
+    assert restarted.metadata.sequence < 300
+    assert stats["reconnects"] >= 1 and stats["address"] == "tcp://127.0.0.1:25561"
+    assert stats["streams"]["camera_1/live"]["out_of_order"] == 0
+
+
+def test_client_synchronizes_devices_by_capture_time(device):
+    context = zmq.asyncio.Context()
+    devices["cam_1"] = devices["cam_0"].to_model().copy(update={"id": "cam_1", "stream_port": 25562})
+
+    async def publish_pair(transports):
+        for sequence in range(500):
+            now = time.monotonic_ns()
+            # cam_1's clock runs 3 s ahead of cam_0's
+            for transport, wall_offset_ns in zip(transports, (0, 3_000_000_000)):
+                await transport.send(Frame(np.full((48, 64, 3), sequence % 256, dtype=np.uint8),
+                                           FrameMetadata("camera_1", sequence, now, wall_offset_ns)))
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        transports = [ZmqFrameTransport(25560, context=context), ZmqFrameTransport(25562, context=context)]
+        async with MinistreamClient(API_URL, context=context) as client:
+            synchronized = client.synchronize({device_id: client.stream(device_id, "camera_1")
+                                               for device_id in ("cam_0", "cam_1")}, tolerance=0.005, estimate_offsets=True)
+            publisher = asyncio.ensure_future(publish_pair(transports))
+            sets = []
+            async for frame_set in synchronized:
+                sets.append(frame_set)
+                if len(sets) == 20:
+                    break
+            publisher.cancel()
+            synchronized.close()
+        for transport in transports:
+            transport.close()
+        return sets, synchronized.stats()
+
+    try:
+        sets, stats = asyncio.run(scenario())
+    finally:
+        context.destroy(linger=0)
+    assert all(s.frames["cam_0"].metadata.sequence == s.frames["cam_1"].metadata.sequence for s in sets)
+    assert stats["sets"] == 20 and stats["alignment_error"]["max_ms"] <= 5
+    assert stats["streams"]["cam_1"]["stream"]["address"] == "tcp://127.0.0.1:25562"
@@ -0,0 +1,154 @@
+"""
+Memory per device and hot-path cost of the columnar device registry.
+
+Builds the same synthetic fleet as a dict of pydantic Device models, as the
+registry held them before, and as a DeviceRegistry, and reports the bytes
+allocated per device (measured with tracemalloc), the cost of applying one
+heartbeat to every device and the cost of one offline sweep over the fleet.
+Devices share a few hardware models, as real fleets do.
+
+Example:
+    python -m network_api.src.bench_registry --devices 10000 --hardware-models 4
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from functools import partial
+from typing import Callable, Dict, Iterator
+
+from network_api.src.registry import DeviceRegistry
+from shared.models import Device, DeviceStatus, EdgeNodeCapabilities, SensorInfo
+
+HEARTBEAT_TIMEOUT = 10
+HEARTBEAT_GRACE = 2.0
+
+
+def fleet_devices(size: int, hardware_models: int, telemetry: bool) -> Iterator[Device]:
+    now = time.time()
+    for index in range(size):
+        model = index % hardware_models
+        sensors = [SensorInfo(id=f"camera_{n}", name=f"Camera {n}",
+                              resolutions=["640x480", "1280x720", "1920x1080"], max_fps=30.0)
+                   for n in range(2)]
+        status = DeviceStatus(id=f"node_{index:06d}", sensors=[sensor.id for sensor in sensors])
+        if telemetry:
+            status.telemetry = {
+                'sensors': {sensor.id: {'fps': 29.9, 'dropped': index % 7} for sensor in sensors},
+                'system': {'cpu_percent': 35, 'memory_percent': 48, 'temperature_c': 51.5}
+            }
+            status.updated_at = now
+        yield Device(
+            id=status.id,
+            ip_address=f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+            port=5555,
+            capabilities=EdgeNodeCapabilities(
+                node_type="jetson",
+                hardware_info={"model": f"Jetson model {model}", "cpu": "Quad-core ARM Cortex-A57"},
+                sensors=sensors,
+                supported_encodings=["h264", "h265"]
+            ),
+            status=status,
+            last_heartbeat=now,
+            tags=["lobby"] if index % 2 else [],
+            heartbeat_interval=5.0
+        )
+
+
+def allocated(build: Callable[[], Dict]) -> tuple:
+    """Build a store and return it with the bytes still allocated for it."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return store, size
+
+
+def heartbeat_all(store, now: float) -> None:
+    """device_heartbeat as it was over Device models."""
+    for device_id in store:
+        device = store[device_id]
+        device.last_heartbeat = now
+        device.status.status = 'running'
+        device.status.online = True
+
+
+def registry_heartbeat_all(registry: DeviceRegistry, now: float) -> None:
+    for device_id in registry:
+        registry.record_heartbeat(device_id, now)
+
+
+def legacy_sweep(store, now: float) -> None:
+    """periodic_device_check as it was over Device models."""
+    for device_id, device in list(store.items()):
+        timeout = max(HEARTBEAT_TIMEOUT, 2 * (device.heartbeat_interval or 0) + HEARTBEAT_GRACE)
+        if now - device.last_heartbeat > timeout:
+            device.status.status = 'offline'
+            device.status.online = False
+        else:
+            device.status.status = 'running'
+            device.status.online = True
+
+
+def best_of(function: Callable[[], None], repeats: int = 5) -> float:
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure(heartbeat: Callable[[float], None], sweep: Callable[[float], None], devices: int, size: int) -> Dict:
+    now = time.time()
+    return {
+        'bytes_per_device': round(size / devices),
+        'heartbeat_us_per_device': round(best_of(lambda: heartbeat(now)) / devices * 1e6, 2),
+        'sweep_ms': round(best_of(lambda: sweep(now + 30)) * 1000, 2)
+    }
+
+
+def run(devices: int, hardware_models: int, telemetry: bool) -> Dict:
+    def build_models():
+        return {device.id: device for device in fleet_devices(devices, hardware_models, telemetry)}
+
+    def build_registry():
+        registry = DeviceRegistry()
+        for device in fleet_devices(devices, hardware_models, telemetry):
+            registry[device.id] = device
+        return registry
+
+    models, models_size = allocated(build_models)
+    before = measure(partial(heartbeat_all, models), partial(legacy_sweep, models), devices, models_size)
+    del models
+    registry, registry_size = allocated(build_registry)
+    after = measure(partial(registry_heartbeat_all, registry),
+                    partial(registry.sweep, min_timeout=HEARTBEAT_TIMEOUT, grace=HEARTBEAT_GRACE),
+                    devices, registry_size)
+    return {
+        'devices': devices,
+        'hardware_models': hardware_models,
+        'telemetry': telemetry,
+        'shared_capabilities': len(registry.capabilities),
+        'models': before,
+        'registry': after,
+        'memory_saved_percent': round(100 * (1 - registry_size / models_size), 1)
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark device registry memory and hot paths")
+    parser.add_argument("--devices", type=int, default=10000, help="Fleet size")
+    parser.add_argument("--hardware-models", type=int, default=4, help="Distinct capability sets in the fleet")
+    parser.add_argument("--telemetry", action="store_true", help="Give every device heartbeat telemetry")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(run(args.devices, args.hardware_models, args.telemetry), indent=2))
@@ -0,0 +1,152 @@
+"""
+Per-request CPU cost of the hot read endpoints at fleet scale.
+
+Serves /devices/{id}/status and /devices/{id}/capabilities for every device
+of a synthetic fleet through the real ASGI app, and through a copy of the
+endpoints as they were before the fast serialization path (response_model
+re-validation, jsonable_encoder and the standard json encoder), and reports
+process CPU per request for both. Requests are driven straight through the
+ASGI interface so HTTP client overhead is excluded. Statuses carry fresh heartbeat telemetry,
+so no device round trips are involved.
+
+Example:
+    python -m network_api.src.bench_serialization --devices 500 --rounds 5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from fastapi import FastAPI, HTTPException
+
+from network_api.src import main as api
+from shared.models import Device, DeviceStatus, EdgeNodeCapabilities, SensorInfo
+
+
+def make_fleet(size: int, sensors_per_device: int = 2) -> Dict[str, Device]:
+    now = time.time()
+    fleet = {}
+    for index in range(size):
+        device_id = f"bench_node_{index:05d}"
+        sensors = [SensorInfo(
+            id=f"camera_{n}", name=f"Camera {n}",
+            resolutions=["640x480", "1280x720", "1920x1080"], max_fps=30.0
+        ) for n in range(sensors_per_device)]
+        telemetry = {
+            'sensors': {sensor.id: {'fps': 29.9, 'dropped': index % 7} for sensor in sensors},
+            'queues': {'gop_cache': 12},
+            'system': {'cpu_percent': 35, 'gpu_percent': 20, 'memory_percent': 48, 'temperature_c': 51.5}
+        }
+        fleet[device_id] = Device(
+            id=device_id,
+            ip_address="127.0.0.1",
+            port=5555,
+            capabilities=EdgeNodeCapabilities(
+                node_type="jetson",
+                hardware_info={"model": "Jetson Nano", "cpu": "Quad-core ARM Cortex-A57", "encoders": "nvv4l2h264enc"},
+                sensors=sensors,
+                supported_encodings=["h264", "h265"]
+            ),
+            status=DeviceStatus(id=device_id, sensors=[sensor.id for sensor in sensors],
+                                telemetry=telemetry, updated_at=now),
+            last_heartbeat=now,
+            heartbeat_interval=3600.0
+        )
+    return fleet
+
+
+def legacy_app() -> FastAPI:
+    """The status and capabilities endpoints as they were before the fast path."""
+    legacy = FastAPI()
+    # Same middleware and status logic as the real app, so only serialization differs
+    legacy.user_middleware = list(api.app.user_middleware)
+
+    @legacy.get("/devices/{device_id}/status", response_model=DeviceStatus)
+    async def get_device_status(device_id: str):
+        if device_id not in api.devices:
+            raise HTTPException(status_code=404, detail="Device not found")
+        return await api.refresh_device_status(api.devices[device_id])
+
+    @legacy.get("/devices/{device_id}/capabilities", response_model=EdgeNodeCapabilities)
+    async def get_device_capabilities(device_id: str):
+        if device_id not in api.devices:
+            raise HTTPException(status_code=404, detail="Device not found")
+        device = api.devices[device_id]
+        return {
+            "id": device_id,
+            "node_type": device.capabilities.node_type,
+            "hardware_info": device.capabilities.hardware_info,
+            "sensors": [sensor.dict() for sensor in device.capabilities.sensors],
+            "supported_encodings": device.capabilities.supported_encodings
+        }
+
+    return legacy
+
+
+async def call(app: FastAPI, path: str) -> int:
+    """Drive one GET through the ASGI app directly, so client overhead isn't measured."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+        'headers': [(b'host', b'bench')], 'server': ('bench', 80), 'client': ('127.0.0.1', 1)
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def measure(app: FastAPI, paths: List[str], rounds: int, repeats: int = 3) -> Dict:
+    for path in paths[:50]:  # Warm up routing, middleware and serializer caches
+        await call(app, path)
+    best = None
+    # The best of several passes filters out scheduling and GC noise
+    for _ in range(repeats):
+        started = time.process_time()
+        for _ in range(rounds):
+            for path in paths:
+                if await call(app, path) != 200:
+                    raise RuntimeError(f"GET {path} failed")
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    requests = rounds * len(paths)
+    return {'requests': requests, 'cpu_us_per_request': round(best / requests * 1e6, 1)}
+
+
+async def run(devices: int, rounds: int) -> Dict:
+    api.devices.clear()
+    api.devices.update(make_fleet(devices))
+    report = {'devices': devices, 'rounds': rounds, 'endpoints': {}}
+    try:
+        for endpoint in ("status", "capabilities"):
+            paths = [f"/devices/{device_id}/{endpoint}" for device_id in api.devices]
+            before = await measure(legacy_app(), paths, rounds)
+            after = await measure(api.app, paths, rounds)
+            report['endpoints'][endpoint] = {
+                'before': before,
+                'after': after,
+                'cpu_saved_percent': round(100 * (1 - after['cpu_us_per_request'] / before['cpu_us_per_request']), 1)
+            }
+    finally:
+        api.devices.clear()
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hot endpoint serialization")
+    parser.add_argument("--devices", type=int, default=500, help="Fleet size")
+    parser.add_argument("--rounds", type=int, default=5, help="Requests per device per endpoint")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(asyncio.run(run(args.devices, args.rounds)), indent=2))
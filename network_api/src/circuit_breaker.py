@@ -0,0 +1,82 @@
+import time
+from typing import Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-device circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail fast. Once the backoff has elapsed a single probe is let through
+    (half-open): success closes the circuit, failure re-opens it with the
+    backoff doubled, up to max_backoff.
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.backoff = base_backoff
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """
+        Whether a call may be attempted now. Moving to half-open reserves the
+        single probe slot, so concurrent callers keep failing fast.
+        """
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN and now - self.opened_at >= self.backoff:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.backoff = self.base_backoff
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            self._open(now)
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(now)
+
+    def release_probe(self) -> None:
+        """Free the half-open probe slot without a verdict, e.g. when the probe was cancelled."""
+        self.probe_in_flight = False
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.probe_in_flight = False
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        if self.state != OPEN:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.opened_at + self.backoff - now)
+
+    def to_dict(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'backoff_s': self.backoff,
+            'retry_in_s': round(self.retry_in(), 3)
+        }
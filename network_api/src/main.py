@@ -1,27 +1,46 @@
-from fastapi import FastAPI, HTTPException
-from typing import List, Dict
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, List, Dict, Optional
 import zmq
 import asyncio
 import json
+import os
 from zeroconf import ServiceBrowser, Zeroconf, ServiceStateChange
 import socket
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 import time
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from shared.models import Device, EdgeNodeCapabilities, SensorInfo, StreamConfig, DeviceStatus
-from shared.exceptions import DeviceNotFoundError, CommunicationError, APIError
+from shared.exceptions import DeviceNotFoundError, CommunicationError, APIError, DeviceTimeoutError, CircuitOpenError
 from shared.logger import network_api_logger as logger
+from shared.telemetry import apply_delta, flatten_dict, unflatten_dict
+from network_api.src.utils import bounded_as_completed, chunked, SingleFlight
+from network_api.src.circuit_breaker import CircuitBreaker
+from network_api.src.timeseries import DeviceTimeSeries
+from network_api.src.responses import FastJSONResponse, ModelResponse
+from network_api.src.sharding import ShardMap, ShardRedirectMiddleware
+from network_api.src.registry import DeviceRegistry
+from shared.serialization import dumps, loads
+import aiohttp
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     device_check_task = asyncio.create_task(periodic_device_check())
     yield
     device_check_task.cancel()
-    await device_check_task
+    try:
+        await device_check_task
+    except asyncio.CancelledError:
+        pass
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
-app = FastAPI(lifespan=lifespan)
+# In sharded mode each instance tracks only the devices the hash ring assigns
+# to it, and requests for other devices are redirected to their owner
+shards = ShardMap.from_env()
+app.add_middleware(ShardRedirectMiddleware, shards=shards)
 
 # Configure CORS
 app.add_middleware(
@@ -32,21 +51,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-devices: Dict[str, Device] = {}
+# Device id -> DeviceView; hot state is held in columns and models are built only for responses
+devices = DeviceRegistry()
 
 HEARTBEAT_TIMEOUT = 10  # Timeout in seconds1
+# Heartbeat telemetry younger than the sender's announced interval plus this grace answers /status directly
+HEARTBEAT_GRACE = float(os.environ.get('HEARTBEAT_GRACE', 2.0))
+
+# Fixed-memory telemetry history per device, fed by heartbeats
+telemetry_history: Dict[str, DeviceTimeSeries] = {}
+
+
+def heartbeat_timeout(device: Device) -> float:
+    # Devices announcing a slow adaptive interval get proportionally longer before they count as offline
+    return max(HEARTBEAT_TIMEOUT, 2 * (device.heartbeat_interval or 0) + HEARTBEAT_GRACE)
+
+
+def has_fresh_telemetry(device: Device, now: Optional[float] = None) -> bool:
+    if not device.status.telemetry or device.status.updated_at is None:
+        return False
+    now = time.time() if now is None else now
+    return now - device.status.updated_at <= (device.heartbeat_interval or 0) + HEARTBEAT_GRACE
 
 async def periodic_device_check():
     while True:
-        current_time = time.time()
-        for device_id, device in list(devices.items()):
-            if current_time - device.last_heartbeat > HEARTBEAT_TIMEOUT:
-                logger.warning(f"Device {device_id} missed heartbeat")
-                device.status.status = 'offline'
-                device.status.online = False
-            else:
-                device.status.status = 'running'
-                device.status.online = True
+        # One vectorized pass over the heartbeat columns, with the same rule as heartbeat_timeout()
+        for device_id in devices.sweep(time.time(), HEARTBEAT_TIMEOUT, HEARTBEAT_GRACE):
+            logger.warning(f"Device {device_id} missed heartbeat")
         await asyncio.sleep(10)  # Check every 10 seconds
 
 def on_service_state_change(zeroconf, service_type, name, state_change):
@@ -56,7 +87,8 @@ def on_service_state_change(zeroconf, service_type, name, state_change):
         logger.warning(f"Failed to get service info for {name} of type {service_type}. State change: {state_change}")
         return
 
-    if state_change is ServiceStateChange.Added:
+    # Nodes update their record when a fresh probe finds capabilities other than the cached ones
+    if state_change in (ServiceStateChange.Added, ServiceStateChange.Updated):
         address = socket.inet_ntoa(info.addresses[0])
         port = info.port
         device_id = info.properties.get(b'device_id', b'').decode('utf-8')
@@ -65,38 +97,61 @@ def on_service_state_change(zeroconf, service_type, name, state_change):
         hardware_info = json.loads(info.properties.get(b'hardware_info', b'{}').decode('utf-8'))
         sensors = json.loads(info.properties.get(b'sensors', b'[]').decode('utf-8'))
         supported_encodings = json.loads(info.properties.get(b'supported_encodings', b'[]').decode('utf-8'))
+        measured_limits = json.loads(info.properties.get(b'measured_limits', b'{}').decode('utf-8'))
+        tags = json.loads(info.properties.get(b'tags', b'[]').decode('utf-8'))
+        stream_port = info.properties.get(b'stream_port')
+        replay_port = info.properties.get(b'replay_port')
+        recordings_port = info.properties.get(b'recordings_port')
+        if not shards.owns(device_id):
+            logger.debug(f"Device {device_id} belongs to {shards.owner(device_id)}, not tracking it")
+            return
         
         capabilities = EdgeNodeCapabilities(
             node_type=node_type,
             hardware_info=hardware_info,
             sensors=[SensorInfo(**sensor) for sensor in sensors],
-            supported_encodings=supported_encodings
+            supported_encodings=supported_encodings,
+            measured_limits=measured_limits
         )
         
-        status = DeviceStatus(
-            id=device_id,
-            status="running",
-            sensors=[sensor.id for sensor in capabilities.sensors],
-            online=True
-        )
-        
-        devices[device_id] = Device(
-            id=device_id,
-            ip_address=address,
-            port=port,
-            capabilities=capabilities,
-            status=status,
-            last_heartbeat=time.time()
-        )
+        announced = {
+            'ip_address': address,
+            'port': port,
+            'capabilities': capabilities,
+            'tags': tags,
+            'stream_port': int(stream_port) if stream_port else None,
+            'replay_port': int(replay_port) if replay_port else None,
+            'recordings_port': int(recordings_port) if recordings_port else None
+        }
+        # Runs on zeroconf's browser thread, so hold the registry lock while the event loop may sweep
+        with devices.lock:
+            device = devices.get(device_id)
+            if device is not None:
+                # Update in place: status, telemetry and heartbeat state carry over, and views held elsewhere stay valid
+                for field, value in announced.items():
+                    setattr(device, field, value)
+                device.status.sensors = [sensor.id for sensor in capabilities.sensors]
+                logger.info(f"Device updated: {device_id}")
+                return
+
+            status = DeviceStatus(
+                id=device_id,
+                status="running",
+                sensors=[sensor.id for sensor in capabilities.sensors],
+                online=True
+            )
+
+            devices[device_id] = Device(id=device_id, status=status, last_heartbeat=time.time(), **announced)
         logger.info(f"New device added: {device_id}")
     elif state_change is ServiceStateChange.Removed:
-        for device_id, device in list(devices.items()):
-            if device.ip_address == socket.inet_ntoa(info.addresses[0]):
-                del devices[device_id]
-                logger.info(f"Device removed: {device_id}")
-                break
-        else:
-            logger.warning(f"No matching device found for removed service: {name}")
+        with devices.lock:
+            for device_id, device in list(devices.items()):
+                if device.ip_address == socket.inet_ntoa(info.addresses[0]):
+                    del devices[device_id]
+                    logger.info(f"Device removed: {device_id}")
+                    break
+            else:
+                logger.warning(f"No matching device found for removed service: {name}")
     else:
         logger.warning(f"Unhandled service state change: {state_change} for service: {name}")
 
@@ -108,30 +163,130 @@ class ConfigureStreamRequest(BaseModel):
     device_id: str
     config: StreamConfig
 
+
+class DeviceSelector(BaseModel):
+    ids: Optional[List[str]] = None
+    node_type: Optional[str] = None
+    tags: List[str] = []
+
+
+class BulkConfigureRequest(BaseModel):
+    selector: DeviceSelector
+    config: StreamConfig
+    parallelism: int = Field(16, ge=1)
+    timeout: float = Field(5.0, gt=0)
+    stage_size: Optional[int] = Field(None, ge=1)
+    abort_on_failure: bool = False
+
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import zmq.asyncio
 
-executor = ThreadPoolExecutor()
+# Upper bound on any single device round trip, in seconds
+DEVICE_RPC_TIMEOUT = float(os.environ.get('DEVICE_RPC_TIMEOUT', 2.0))
 
-async def send_zmq_request(address: str, message: Dict) -> Dict:
-    def zmq_send_receive(address, message):
-        context = zmq.Context()
-        socket = context.socket(zmq.REQ)
-        socket.connect(address)
-        try:
-            socket.send_json(message)
-            return socket.recv_json()
-        finally:
-            socket.close()
-            context.term()
 
+async def send_zmq_request(address: str, message: Dict, timeout: float = DEVICE_RPC_TIMEOUT) -> Dict:
+    """
+    Send a request to a device and wait for its reply without tying up a thread.
+
+    The call is cancellable: cancelling the awaiting task closes the socket
+    and abandons the request.
+
+    Raises:
+        DeviceTimeoutError: If no reply arrives within `timeout` seconds.
+        CommunicationError: On any other transport error.
+    """
+    socket = zmq.asyncio.Context.instance().socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
     try:
-        return await asyncio.get_event_loop().run_in_executor(
-            executor, zmq_send_receive, address, message
-        )
-    except Exception as e:
+        socket.connect(address)
+        await socket.send(dumps(message))
+        return loads(await asyncio.wait_for(socket.recv(), timeout))
+    except asyncio.TimeoutError:
+        raise DeviceTimeoutError(f"Device at {address} did not respond within {timeout}s")
+    except zmq.ZMQError as e:
         logger.error(f"Error in send_zmq_request: {str(e)}", exc_info=True)
         raise CommunicationError(f"Error communicating with device at {address}: {str(e)}")
+    finally:
+        socket.close()
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 3))
+BREAKER_BACKOFF = float(os.environ.get('BREAKER_BACKOFF', 1.0))
+BREAKER_MAX_BACKOFF = float(os.environ.get('BREAKER_MAX_BACKOFF', 60.0))
+breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(device_id: str) -> CircuitBreaker:
+    breaker = breakers.get(device_id)
+    if breaker is None:
+        breaker = breakers[device_id] = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_BACKOFF, BREAKER_MAX_BACKOFF)
+    return breaker
+
+
+async def device_request(device: Device, message: Dict, timeout: float = DEVICE_RPC_TIMEOUT) -> Dict:
+    """
+    Send a request to a device with a deadline, guarded by its circuit breaker.
+
+    The timeout is also sent to the device, as a relative budget since clocks
+    differ between hosts, so it can skip work whose caller has already given up.
+
+    Args:
+        device (Device): The target device.
+        message (Dict): The Controller message.
+        timeout (float): Seconds to wait for the reply.
+
+    Returns:
+        Dict: The device's response.
+
+    Raises:
+        CircuitOpenError: If the device's breaker is open.
+        DeviceTimeoutError: If the device does not answer in time.
+        CommunicationError: On any other transport error.
+    """
+    breaker = breaker_for(device.id)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit open for device {device.id}, retry in {breaker.retry_in():.1f}s")
+    address = f"tcp://{device.ip_address}:{device.port}"
+    try:
+        response = await asyncio.wait_for(
+            send_zmq_request(address, dict(message, budget=timeout), timeout=timeout), timeout
+        )
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        raise DeviceTimeoutError(f"Device {device.id} did not respond within {timeout}s")
+    except asyncio.CancelledError:
+        breaker.release_probe()
+        raise
+    except Exception:
+        # Any other failure, such as an undecodable reply, counts too, so a probe never leaves the breaker half-open
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return response
+
+# Identical read-only RPCs in flight to the same device share one round trip,
+# and results are reused for DEVICE_RPC_FRESHNESS seconds
+DEVICE_RPC_FRESHNESS = float(os.environ.get('DEVICE_RPC_FRESHNESS', 1.0))
+device_rpc = SingleFlight(DEVICE_RPC_FRESHNESS)
+
+
+def device_rpc_key(device: Device, message: Dict):
+    return (device.id, json.dumps(message, sort_keys=True))
+
+
+async def coalesced_device_request(device: Device, message: Dict) -> Dict:
+    """
+    Send a read-only request to a device, coalescing it with identical
+    concurrent requests so device load does not grow with the number of callers.
+
+    Args:
+        device (Device): The target device.
+        message (Dict): An idempotent Controller message such as get_status.
+
+    Returns:
+        Dict: The device's response.
+    """
+    return await device_rpc.do(device_rpc_key(device, message), lambda: device_request(device, message))
 
 @app.get("/")
 async def root():
@@ -140,35 +295,57 @@ async def root():
 
 @app.get("/devices", response_model=List[str])
 async def get_devices():
-    """Get a list of all discovered device IDs."""
+    """Get a list of all discovered device IDs (in sharded mode, those owned by this instance)."""
     logger.debug(f"Devices in get_devices(): {list(devices.keys())}")
-    return list(devices.keys())
+    return FastJSONResponse(list(devices.keys()))
+
+
+async def refresh_device_status(device: Device) -> DeviceStatus:
+    """
+    Bring a device's status up to date, asking the device only when heartbeat
+    telemetry is stale.
+
+    Args:
+        device (Device): The device to refresh.
+
+    Returns:
+        DeviceStatus: The device's status model, updated in place.
+    """
+    device.status.circuit_state = breaker_for(device.id).state
+
+    # Check if the device is already marked as offline
+    if not device.status.online:
+        return device.status
+
+    # Recent heartbeat telemetry already describes the device; skip the round trip
+    if has_fresh_telemetry(device):
+        return device.status
+
+    try:
+        response = await coalesced_device_request(device, {"type": "get_status"})
+
+        device.status.status = response.get('status', device.status.status)
+        device.status.sensors = response.get('sensors', device.status.sensors)
+        device.status.online = True
+    except CircuitOpenError:
+        # The breaker failed fast without asking the device, so the last known status stands
+        pass
+    except CommunicationError:
+        # If communication fails, mark the device as offline
+        device.status.online = False
+        device.status.status = "Offline"
+
+    device.status.circuit_state = breaker_for(device.id).state
+    return device.status
 
 @app.get("/devices/{device_id}/status", response_model=DeviceStatus)
 async def get_device_status(device_id: str):
     try:
         if device_id not in devices:
             raise DeviceNotFoundError(f"Device not found: {device_id}")
-        
-        device = devices[device_id]
-        
-        # Check if the device is already marked as offline
-        if not device.status.online:
-            return device.status
-        
-        try:
-            address = f"tcp://{device.ip_address}:{device.port}"
-            response = await send_zmq_request(address, {"type": "get_status"})
-            
-            device.status.status = response.get('status', device.status.status)
-            device.status.sensors = response.get('sensors', device.status.sensors)
-            device.status.online = True
-        except CommunicationError:
-            # If communication fails, mark the device as offline
-            device.status.online = False
-            device.status.status = "Offline"
-        
-        return device.status
+
+        # The status model is already validated, so it is serialized directly
+        return ModelResponse(await refresh_device_status(devices[device_id]))
     except DeviceNotFoundError as e:
         logger.warning(str(e))
         raise HTTPException(status_code=404, detail=str(e))
@@ -196,8 +373,8 @@ async def configure_stream(device_id: str, config: StreamConfig):
             raise DeviceNotFoundError(f"Device not found: {device_id}")
         
         device = devices[device_id]
-        address = f"tcp://{device.ip_address}:{device.port}"
-        response = await send_zmq_request(address, {
+        config.validate_against(device.capabilities.sensors, device.capabilities.measured_limits)
+        response = await device_request(device, {
             "type": "configure_stream",
             "config": config.dict()
         })
@@ -205,10 +382,20 @@ async def configure_stream(device_id: str, config: StreamConfig):
         if "error" in response:
             raise HTTPException(status_code=500, detail=response["error"])
         
+        device_rpc.invalidate(device_rpc_key(device, {"type": "get_status"}))
         return {"status": "success", "message": "Stream configured successfully"}
     except DeviceNotFoundError as e:
         logger.warning(str(e))
         raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        logger.warning(f"Invalid stream configuration for device {device_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeviceTimeoutError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=504, detail=str(e))
     except CommunicationError as e:
         logger.error(f"Communication error with device {device_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -216,30 +403,536 @@ async def configure_stream(device_id: str, config: StreamConfig):
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
+
+def select_devices(selector: DeviceSelector):
+    """
+    Resolve a device selector against the registry.
+
+    Args:
+        selector (DeviceSelector): Explicit ids and/or node_type and tag filters.
+
+    Returns:
+        tuple: The matching device ids and the requested ids that are unknown.
+    """
+    candidates = selector.ids if selector.ids is not None else list(devices.keys())
+    matched, missing = [], []
+    for device_id in candidates:
+        device = devices.get(device_id)
+        if device is None:
+            missing.append(device_id)
+        elif selector.node_type and device.capabilities.node_type != selector.node_type:
+            continue
+        elif not set(selector.tags).issubset(device.tags):
+            continue
+        else:
+            matched.append(device_id)
+    return matched, missing
+
+
+async def configure_device(device_id: str, config: StreamConfig, timeout: float) -> Dict:
+    """
+    Configure a single device as part of a bulk operation, never raising.
+
+    Returns:
+        Dict: The per-device result with status "success", "invalid", "error",
+        "timeout" or "circuit_open".
+    """
+    device = devices[device_id]
+    started = time.monotonic()
+    result = {"device_id": device_id}
+    try:
+        config.validate_against(device.capabilities.sensors, device.capabilities.measured_limits)
+    except ValueError as e:
+        result.update(status="invalid", detail=str(e), elapsed_ms=0.0)
+        return result
+    try:
+        response = await device_request(device, {
+            "type": "configure_stream",
+            "config": config.dict()
+        }, timeout)
+        if "error" in response:
+            result.update(status="error", detail=response["error"])
+        else:
+            result["status"] = "success"
+            device_rpc.invalidate(device_rpc_key(device, {"type": "get_status"}))
+    except DeviceTimeoutError:
+        result.update(status="timeout", detail=f"No response within {timeout}s")
+    except CircuitOpenError as e:
+        result.update(status="circuit_open", detail=str(e))
+    except CommunicationError as e:
+        result.update(status="error", detail=str(e))
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 3)
+    return result
+
+
+async def bulk_configure_results(device_ids: List[str], missing: List[str], request: BulkConfigureRequest):
+    """
+    Fan a configuration out to many devices, yielding one NDJSON line per device
+    as results complete, followed by a summary line.
+    """
+    counts = {"success": 0, "invalid": 0, "error": 0, "timeout": 0, "circuit_open": 0, "not_found": 0, "skipped": 0}
+    for device_id in missing:
+        counts["not_found"] += 1
+        yield json.dumps({"device_id": device_id, "status": "not_found"}) + "\n"
+
+    stages = chunked(device_ids, request.stage_size or max(len(device_ids), 1))
+    for index, stage in enumerate(stages):
+        stage_failed = False
+        async for result in bounded_as_completed(
+            stage, lambda device_id: configure_device(device_id, request.config, request.timeout), request.parallelism
+        ):
+            counts[result["status"]] += 1
+            stage_failed = stage_failed or result["status"] != "success"
+            yield json.dumps(result) + "\n"
+        if stage_failed and request.abort_on_failure:
+            for remaining in stages[index + 1:]:
+                for device_id in remaining:
+                    counts["skipped"] += 1
+                    yield json.dumps({"device_id": device_id, "status": "skipped"}) + "\n"
+            logger.warning(f"Bulk configure aborted after stage {index + 1} of {len(stages)}")
+            break
+    yield json.dumps({"summary": counts}) + "\n"
+
+
+@app.post("/devices/configure")
+async def bulk_configure_stream(request: BulkConfigureRequest):
+    """
+    Configure the stream on every device matching a selector.
+
+    Devices are configured concurrently with bounded parallelism and a
+    per-device timeout, optionally in stages of `stage_size` devices. Results
+    are streamed back as newline-delimited JSON as each device completes.
+
+    Args:
+        request (BulkConfigureRequest): The selector, config and rollout settings.
+
+    Returns:
+        StreamingResponse: One JSON object per device, then a summary object.
+
+    Raises:
+        HTTPException: If the selector matches no devices.
+    """
+    device_ids, missing = select_devices(request.selector)
+    if not device_ids and not missing:
+        raise HTTPException(status_code=404, detail="No devices match selector")
+    logger.info(f"Bulk configuring {len(device_ids)} devices with {request.config}")
+    return StreamingResponse(
+        bulk_configure_results(device_ids, missing, request),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.get("/devices/{device_id}/latency")
+async def get_device_latency(device_id: str):
+    """
+    Get per-hop capture latency histograms and frame gap counts for a device.
+
+    Args:
+        device_id (str): The ID of the device.
+
+    Returns:
+        Dict: Latency statistics keyed by hop name and sensor id.
+
+    Raises:
+        HTTPException: If the device is not found or cannot be reached.
+    """
+    try:
+        if device_id not in devices:
+            raise DeviceNotFoundError(f"Device not found: {device_id}")
+
+        device = devices[device_id]
+        response = await coalesced_device_request(device, {"type": "get_latency"})
+        return response.get('latency', {})
+    except DeviceNotFoundError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+    except CommunicationError as e:
+        logger.error(f"Communication error with device {device_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/devices/{device_id}/telemetry")
+async def get_device_telemetry(
+    device_id: str,
+    metric: Optional[str] = None,
+    start: Optional[float] = Query(None, alias="from"),
+    end: Optional[float] = Query(None, alias="to"),
+    step: Optional[float] = Query(None, gt=0)
+):
+    """
+    Get a device's telemetry history, downsampled to evenly spaced buckets.
+
+    Args:
+        device_id (str): The ID of the device.
+        metric (str, optional): Flattened metric name such as "sensors.camera_1.fps".
+            Omit it to list the recorded metrics.
+        start (float, optional): Range start in seconds since the epoch, default one hour ago.
+        end (float, optional): Range end in seconds since the epoch, default now.
+        step (float, optional): Bucket width in seconds, chosen automatically if omitted.
+
+    Returns:
+        Dict: Column arrays t, mean, min, max and count, or {"metrics": [...]}.
+
+    Raises:
+        HTTPException: If the device or metric is unknown, or the range is invalid.
+    """
+    if device_id not in devices:
+        raise HTTPException(status_code=404, detail=f"Device not found: {device_id}")
+    history = telemetry_history.get(device_id)
+    if metric is None:
+        return {"metrics": sorted(history.metrics) if history else []}
+    if history is None or metric not in history.metrics:
+        raise HTTPException(status_code=404, detail=f"No telemetry recorded for metric: {metric}")
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    try:
+        return history.query(metric, start, end, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class ProfileRequest(BaseModel):
+    duration: float = Field(10.0, gt=0)
+    interval_ms: float = Field(10.0, gt=0)
+
+
+async def send_device_command(device_id: str, message: Dict, error_status: int = 409) -> Dict:
+    try:
+        if device_id not in devices:
+            raise DeviceNotFoundError(f"Device not found: {device_id}")
+
+        device = devices[device_id]
+        response = await device_request(device, message)
+        if "error" in response:
+            raise HTTPException(status_code=error_status, detail=response["error"])
+        return response
+    except DeviceNotFoundError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=404, detail=str(e))
+    except CircuitOpenError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeviceTimeoutError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=504, detail=str(e))
+    except CommunicationError as e:
+        logger.error(f"Communication error with device {device_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/devices/{device_id}/profile/start")
+async def start_device_profile(device_id: str, request: ProfileRequest):
+    """
+    Start a time-bounded sampling profile on an edge node. Profiling must be
+    enabled in the node's configuration.
+    """
+    return await send_device_command(device_id, {
+        "type": "start_profile",
+        "duration": request.duration,
+        "interval_ms": request.interval_ms
+    })
+
+
+@app.post("/devices/{device_id}/profile/stop")
+async def stop_device_profile(device_id: str):
+    """
+    Stop the running profile on an edge node and return the folded stacks of
+    its control loop and data plane threads, per-thread and per-task time and
+    event loop lag.
+    """
+    return await send_device_command(device_id, {"type": "stop_profile"})
+
+
+@app.get("/devices/{device_id}/outputs")
+async def get_device_outputs(device_id: str):
+    """
+    List the named output streams an edge node serves from its capture. Each
+    output is configured through /devices/{device_id}/configure with its
+    "output" name.
+    """
+    return await send_device_command(device_id, {"type": "get_outputs"})
+
+
+@app.delete("/devices/{device_id}/outputs/{output}")
+async def remove_device_output(device_id: str, output: str):
+    """
+    Stop one named output stream of an edge node; its other outputs keep streaming.
+    """
+    return await send_device_command(device_id, {"type": "remove_output", "output": output}, error_status=404)
+
+
+@app.get("/devices/{device_id}/stream")
+async def get_device_stream(device_id: str):
+    """
+    Get the ZMQ address a device publishes frames on. Subscribe to a sensor
+    id for every output of that sensor, or to "<sensor_id>/<output>" for one.
+    When the device serves GOP replays, replay_address is where a late joiner
+    requests the cached keyframe and deltas of the streams it subscribed to.
+    """
+    device = devices.get(device_id)
+    if device is None:
+        raise HTTPException(status_code=404, detail=f"Device not found: {device_id}")
+    if device.stream_port is None:
+        raise HTTPException(status_code=404, detail=f"Device {device_id} has not announced a stream port")
+    stream = {"address": f"tcp://{device.ip_address}:{device.stream_port}"}
+    if device.replay_port is not None:
+        stream["replay_address"] = f"tcp://{device.ip_address}:{device.replay_port}"
+    return stream
+
+# Upper bound on connecting to, and on each read from, a device's recordings server, in seconds.
+# Clips are streamed for as long as the client keeps reading, so there is no overall limit
+RECORDINGS_TIMEOUT = float(os.environ.get('RECORDINGS_TIMEOUT', 10.0))
+RECORDING_CHUNK_SIZE = 256 * 1024
+# Headers relayed between the client and the device so Range requests work end to end
+RECORDING_REQUEST_HEADERS = ('Range', 'If-Range')
+RECORDING_RESPONSE_HEADERS = ('Content-Length', 'Content-Range', 'Accept-Ranges', 'ETag',
+                              'X-Recording', 'X-Clip-Start', 'X-Clip-End', 'X-Clip-Frames')
+
+
+def recordings_url(device_id: str, path: str) -> str:
+    device = devices.get(device_id)
+    if device is None:
+        raise HTTPException(status_code=404, detail=f"Device not found: {device_id}")
+    if device.recordings_port is None:
+        raise HTTPException(status_code=404, detail=f"Device {device_id} does not serve recordings")
+    return f"http://{device.ip_address}:{device.recordings_port}{path}"
+
+
+def recordings_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(
+        total=None, sock_connect=RECORDINGS_TIMEOUT, sock_read=RECORDINGS_TIMEOUT
+    ))
+
+
+@app.get("/devices/{device_id}/recordings/index")
+async def get_device_recordings_index(device_id: str):
+    """
+    List the recordings an edge node serves, with the wall clock span of each.
+    """
+    url = recordings_url(device_id, "/recordings/index")
+    try:
+        async with recordings_session() as session:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    raise HTTPException(status_code=response.status, detail=await response.text())
+                return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error listing recordings of device {device_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/devices/{device_id}/recordings")
+async def get_device_recording(
+    device_id: str,
+    request: Request,
+    start: Optional[float] = Query(None, alias="from"),
+    end: Optional[float] = Query(None, alias="to")
+):
+    """
+    Stream the footage a device recorded in a time range, proxied from the
+    device's recordings server.
+
+    Range and If-Range are passed through, so players can scrub a long clip
+    and fetch only the bytes they show. The body is relayed chunk by chunk
+    and never held in memory.
+
+    Args:
+        device_id (str): The ID of the device.
+        start (float, optional): Range start in seconds since the epoch, default the oldest frame.
+        end (float, optional): Range end in seconds since the epoch, default the newest frame.
+
+    Returns:
+        StreamingResponse: A recording clip that ReplayHAL can play, with
+        X-Clip-Start and X-Clip-End giving the times of its first and last frames.
+        A range spanning several recordings returns the first; request the
+        rest from X-Clip-End onwards.
+
+    Raises:
+        HTTPException: If the device is unknown, has no frames in the range or
+            cannot be reached, or the byte range is not satisfiable (416).
+    """
+    url = recordings_url(device_id, "/recordings")
+    params = {name: str(value) for name, value in (("from", start), ("to", end)) if value is not None}
+    headers = {name: request.headers[name] for name in RECORDING_REQUEST_HEADERS if name in request.headers}
+    session = recordings_session()
+    try:
+        upstream = await session.get(url, params=params, headers=headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        await session.close()
+        logger.error(f"Error fetching recording from device {device_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    relayed = {name: upstream.headers[name] for name in RECORDING_RESPONSE_HEADERS if name in upstream.headers}
+    if upstream.status not in (200, 206):
+        detail = await upstream.text()
+        upstream.release()
+        await session.close()
+        raise HTTPException(status_code=upstream.status, detail=detail, headers=relayed or None)
+
+    async def relay():
+        try:
+            async for chunk in upstream.content.iter_chunked(RECORDING_CHUNK_SIZE):
+                yield chunk
+        finally:
+            upstream.release()
+            await session.close()
+
+    return StreamingResponse(relay(), status_code=upstream.status, headers=relayed,
+                             media_type=upstream.content_type)
+
 @app.get("/devices/{device_id}/capabilities", response_model=EdgeNodeCapabilities)
 async def get_device_capabilities(device_id: str):
     if device_id not in devices:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    device = devices[device_id]
-    return {
-        "id": device_id,
-        "node_type": device.capabilities.node_type,
-        "hardware_info": device.capabilities.hardware_info,
-        "sensors": [sensor.dict() for sensor in device.capabilities.sensors],
-        "supported_encodings": device.capabilities.supported_encodings
-    }
+    return ModelResponse(devices[device_id].capabilities)
+
+
+class HeartbeatPayload(BaseModel):
+    seq: int
+    full: bool = False
+    interval: Optional[float] = None
+    telemetry: Dict[str, Any] = {}
 
 @app.post("/devices/{device_id}/heartbeat")
-async def device_heartbeat(device_id: str):
+async def device_heartbeat(device_id: str, payload: Optional[HeartbeatPayload] = None):
+    """
+    Record a heartbeat, applying any delta-encoded telemetry it carries.
+
+    Args:
+        device_id (str): The ID of the device.
+        payload (HeartbeatPayload, optional): Telemetry produced by the edge node's DeltaEncoder.
+
+    Returns:
+        Dict: {"status": "ok"}, with "resync": true if a delta was missed and the
+        device must send a full snapshot.
+    """
     if device_id in devices:
-        devices[device_id].last_heartbeat = time.time()
-        devices[device_id].status.status = 'running'
-        devices[device_id].status.online = True
+        now = time.time()
+        devices.record_heartbeat(device_id, now)
+        if payload is None:
+            return {"status": "ok"}
+        device = devices[device_id]
+        device.heartbeat_interval = payload.interval
+        state = flatten_dict(device.status.telemetry)
+        seq = apply_delta(state, device.telemetry_seq, payload.dict())
+        if seq is None:
+            logger.info(f"Telemetry from {device_id} out of sequence, requesting resync")
+            device.telemetry_seq = None
+            return {"status": "ok", "resync": True}
+        device.telemetry_seq = seq
+        device.status.telemetry = unflatten_dict(state)
+        device.status.updated_at = now
+        telemetry_history.setdefault(device_id, DeviceTimeSeries()).record(now, state)
+        if device.status.telemetry.get('sensors'):
+            device.status.sensors = list(device.status.telemetry['sensors'])
         return {"status": "ok"}
     else:
         raise HTTPException(status_code=404, detail="Device not found")
 
+# Upper bound on a request to another API instance, in seconds
+CLUSTER_RPC_TIMEOUT = float(os.environ.get('CLUSTER_RPC_TIMEOUT', 5.0))
+
+
+class ClusterMembers(BaseModel):
+    members: List[str]
+    # Forward the new membership to every old and new member
+    propagate: bool = True
+
+
+async def cluster_request(method: str, member: str, path: str, body: Any) -> Dict:
+    """
+    Send a JSON request to another API instance.
+
+    Raises:
+        CommunicationError: If the instance cannot be reached or does not answer 200.
+    """
+    try:
+        timeout = aiohttp.ClientTimeout(total=CLUSTER_RPC_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.request(method, member + path, data=dumps(body),
+                                       headers={'content-type': 'application/json'}) as response:
+                if response.status != 200:
+                    raise CommunicationError(f"{method} {member}{path} answered {response.status}")
+                return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise CommunicationError(f"{method} {member}{path} failed: {str(e)}")
+
+
+async def rebalance() -> Dict[str, int]:
+    """
+    Hand every device this instance no longer owns to its new owner, with its
+    status and latest telemetry, and stop tracking it here.
+
+    Returns:
+        Dict[str, int]: Number of devices handed to each member.
+    """
+    moved = {}
+    for owner, device_ids in shards.foreign(list(devices)).items():
+        records = [devices[device_id].to_model() for device_id in device_ids]
+        try:
+            await cluster_request("POST", owner, "/cluster/handoff", records)
+        except CommunicationError as e:
+            # The owner still learns of them from discovery announcements and heartbeats
+            logger.error(f"Handoff of {len(records)} devices to {owner} failed: {str(e)}")
+        for device_id in device_ids:
+            devices.pop(device_id, None)
+            telemetry_history.pop(device_id, None)
+            breakers.pop(device_id, None)
+        moved[owner] = len(device_ids)
+    return moved
+
+
+@app.get("/cluster")
+async def get_cluster():
+    """This instance's view of the shard ring."""
+    return {
+        "enabled": shards.enabled,
+        "self": shards.self_url,
+        "members": shards.members,
+        "devices": len(devices)
+    }
+
+
+@app.put("/cluster/members")
+async def set_cluster_members(request: ClusterMembers):
+    """
+    Change the cluster membership and move the devices whose owner changed.
+    The consistent hash ring moves only about 1/N of the devices per member
+    added or removed. With propagate set, the membership is also sent to
+    every old and new member, each of which hands off its own moved devices.
+    """
+    if not shards.enabled:
+        raise HTTPException(status_code=409, detail="Sharding is not enabled on this instance")
+    previous = set(shards.members)
+    try:
+        shards.set_members(request.members)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    errors = {}
+    if request.propagate:
+        peers = sorted((previous | set(shards.members)) - {shards.self_url})
+        body = {"members": shards.members, "propagate": False}
+        results = await asyncio.gather(
+            *(cluster_request("PUT", peer, "/cluster/members", body) for peer in peers), return_exceptions=True
+        )
+        errors = {peer: str(result) for peer, result in zip(peers, results) if isinstance(result, Exception)}
+    moved = await rebalance()
+    logger.info(f"Cluster members now {shards.members}; handed off {moved}")
+    return {"members": shards.members, "moved": moved, "errors": errors}
+
+
+@app.post("/cluster/handoff")
+async def receive_handoff(records: List[Device]):
+    """
+    Adopt devices handed over by another instance after a membership change.
+    They are accepted as sent, since the sender decided ownership with the
+    newer membership.
+    """
+    for device in records:
+        devices[device.id] = device
+    logger.info(f"Adopted {len(records)} devices from handoff")
+    return {"status": "ok", "adopted": len(records)}
+
 # Add this route for testing CORS
 @app.get("/test-cors")
 async def test_cors():
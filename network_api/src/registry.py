@@ -0,0 +1,438 @@
+import math
+import threading
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Hashable, Iterator, List, Optional
+
+import numpy as np
+
+from shared.models import Device, DeviceStatus, EdgeNodeCapabilities
+from shared.serialization import model_json
+
+NAN = float('nan')
+# Stands in for None in integer columns
+NO_VALUE = -1
+
+
+class SharedValues:
+    """
+    Reference-counted table of immutable values shared between devices, such
+    as the capabilities of one hardware model or a common tag list. Values
+    are handed out by index and dropped when no device uses them any more.
+    """
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.keys: List[Optional[Hashable]] = []
+        self.refs: List[int] = []
+        self.index: Dict[Hashable, int] = {}
+        self.free: List[int] = []
+
+    def acquire(self, key: Hashable, value: Any) -> int:
+        code = self.index.get(key)
+        if code is None:
+            code = self.free.pop() if self.free else len(self.values)
+            if code == len(self.values):
+                self.values.append(value)
+                self.keys.append(key)
+                self.refs.append(0)
+            else:
+                self.values[code], self.keys[code] = value, key
+            self.index[key] = code
+        self.refs[code] += 1
+        return code
+
+    def release(self, code: int) -> None:
+        self.refs[code] -= 1
+        if self.refs[code] == 0:
+            del self.index[self.keys[code]]
+            self.values[code] = self.keys[code] = None
+            self.free.append(code)
+
+    def __getitem__(self, code: int) -> Any:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class StringCodes:
+    """Small, never-shrinking code table for enumerated strings such as status names."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self.strings[code]
+
+
+def _float_column(name: str):
+    def get(self):
+        value = getattr(self._registry, name)[self._resolve()]
+        return None if math.isnan(value) else value
+
+    def set(self, value):
+        getattr(self._registry, name)[self._resolve()] = NAN if value is None else value
+    return property(get, set)
+
+
+def _int_column(name: str):
+    def get(self):
+        value = getattr(self._registry, name)[self._resolve()]
+        return None if value == NO_VALUE else value
+
+    def set(self, value):
+        getattr(self._registry, name)[self._resolve()] = NO_VALUE if value is None else value
+    return property(get, set)
+
+
+def _string_column(name: str):
+    def get(self):
+        registry = self._registry
+        return registry.strings[getattr(registry, name)[self._resolve()]]
+
+    def set(self, value):
+        registry = self._registry
+        getattr(registry, name)[self._resolve()] = registry.strings.code(value)
+    return property(get, set)
+
+
+def _list_column(name: str):
+    def get(self):
+        registry = self._registry
+        return list(registry.lists[getattr(registry, name)[self._resolve()]])
+
+    def set(self, value):
+        column = getattr(self._registry, name)
+        slot = self._resolve()
+        column[slot] = self._registry.replace_list(column[slot], value)
+    return property(get, set)
+
+
+class SlotView:
+    __slots__ = ('_registry', '_slot', '_id')
+
+    def __init__(self, registry: "DeviceRegistry", slot: int, device_id: str):
+        self._registry = registry
+        self._slot = slot
+        self._id = device_id
+
+    def _resolve(self) -> int:
+        # A slot is reused once its device is removed; a view must not read its successor
+        if self._registry.ids[self._slot] is not self._id:
+            raise KeyError(f"Device {self._id} was removed from the registry")
+        return self._slot
+
+    @property
+    def id(self) -> str:
+        return self._id
+
+
+class DeviceStatusView(SlotView):
+    """Status of one registry device, read and written in place like DeviceStatus."""
+    __slots__ = ()
+
+    status = _string_column('status_codes')
+    circuit_state = _string_column('circuit_codes')
+    sensors = _list_column('sensor_lists')
+    updated_at = _float_column('updated_at')
+
+    @property
+    def online(self) -> bool:
+        return bool(self._registry.online[self._resolve()])
+
+    @online.setter
+    def online(self, value: bool) -> None:
+        self._registry.online[self._resolve()] = bool(value)
+
+    @property
+    def telemetry(self) -> Dict[str, Any]:
+        telemetry = self._registry.telemetry
+        slot = self._resolve()
+        if telemetry[slot] is None:
+            telemetry[slot] = {}  # Allocated on first use, so silent devices carry no dict
+        return telemetry[slot]
+
+    @telemetry.setter
+    def telemetry(self, value: Dict[str, Any]) -> None:
+        self._registry.telemetry[self._resolve()] = value or None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self._id,
+            'status': self.status,
+            'sensors': self.sensors,
+            'online': self.online,
+            'circuit_state': self.circuit_state,
+            'telemetry': self.telemetry,
+            'updated_at': self.updated_at
+        }
+
+    def to_model(self) -> DeviceStatus:
+        return DeviceStatus(**self.to_dict())
+
+
+class DeviceView(SlotView):
+    """
+    One registry device, with the attributes of a Device model. Reads and
+    writes go straight to the registry's columns; to_model() materializes a
+    Device for API responses and handoffs.
+    """
+    __slots__ = ()
+
+    port = _int_column('ports')
+    stream_port = _int_column('stream_ports')
+    replay_port = _int_column('replay_ports')
+    recordings_port = _int_column('recordings_ports')
+    last_heartbeat = _float_column('last_heartbeat')
+    heartbeat_interval = _float_column('heartbeat_interval')
+    telemetry_seq = _int_column('telemetry_seq')
+    tags = _list_column('tag_lists')
+
+    @property
+    def ip_address(self) -> str:
+        return self._registry.ip_addresses[self._resolve()]
+
+    @ip_address.setter
+    def ip_address(self, value: str) -> None:
+        self._registry.ip_addresses[self._resolve()] = value
+
+    @property
+    def capabilities(self) -> EdgeNodeCapabilities:
+        registry = self._registry
+        return registry.capabilities[registry.capability_codes[self._resolve()]]
+
+    @capabilities.setter
+    def capabilities(self, value: EdgeNodeCapabilities) -> None:
+        registry = self._registry
+        slot = self._resolve()
+        code = registry.share_capabilities(value)
+        registry.capabilities.release(registry.capability_codes[slot])
+        registry.capability_codes[slot] = code
+
+    @property
+    def status(self) -> DeviceStatusView:
+        return DeviceStatusView(self._registry, self._slot, self._id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self._id,
+            'ip_address': self.ip_address,
+            'port': self.port,
+            'capabilities': self.capabilities,
+            'status': self.status.to_dict(),
+            'last_heartbeat': self.last_heartbeat,
+            'tags': self.tags,
+            'heartbeat_interval': self.heartbeat_interval,
+            'telemetry_seq': self.telemetry_seq,
+            'stream_port': self.stream_port,
+            'replay_port': self.replay_port,
+            'recordings_port': self.recordings_port
+        }
+
+    def to_model(self) -> Device:
+        return Device(**self.to_dict())
+
+
+class DeviceRegistry(MutableMapping):
+    """
+    The fleet, held column-wise: each device owns a slot, and its hot mutable
+    state (last heartbeat, online flag, status, heartbeat interval, telemetry
+    sequence) lives in compact arrays indexed by that slot. Capabilities,
+    sensor lists and tags are shared between devices that report identical
+    ones, so a fleet of a few hardware models stores a few capability models.
+
+    The registry is a mapping from device id to a DeviceView, which reads and
+    writes the columns with the attributes of a Device, so request handlers
+    use it like the Device models it replaces. Assigning a Device stores it
+    in the columns; pydantic models are only built again at the API boundary,
+    through to_model().
+
+    Zeroconf announces devices on its own thread, so adding and removing
+    devices, recording heartbeats and sweeping hold the registry's lock:
+    the arrays cannot grow while sweep() holds NumPy views of them.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.slots: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.ids: List[Optional[str]] = []
+        self.ip_addresses: List[Optional[str]] = []
+        self.telemetry: List[Optional[Dict]] = []
+        self.used = array('B')
+        self.online = array('B')
+        self.status_codes = array('H')
+        self.circuit_codes = array('H')
+        self.last_heartbeat = array('d')
+        self.heartbeat_interval = array('d')
+        self.updated_at = array('d')
+        self.telemetry_seq = array('q')
+        self.ports = array('i')
+        self.stream_ports = array('i')
+        self.replay_ports = array('i')
+        self.recordings_ports = array('i')
+        self.capability_codes = array('I')
+        self.sensor_lists = array('I')
+        self.tag_lists = array('I')
+        self.strings = StringCodes()
+        self.running = self.strings.code('running')
+        self.capabilities = SharedValues()
+        self.lists = SharedValues()
+
+    def share_capabilities(self, capabilities: EdgeNodeCapabilities) -> int:
+        # Capabilities are keyed by content, so equal models from different devices share one instance
+        return self.capabilities.acquire(model_json(capabilities), capabilities)
+
+    def share_list(self, values) -> int:
+        values = tuple(values)
+        return self.lists.acquire(values, values)
+
+    def replace_list(self, code: int, values) -> int:
+        new_code = self.share_list(values)
+        self.lists.release(code)
+        return new_code
+
+    def _allocate(self) -> int:
+        if self.free:
+            return self.free.pop()
+        # Grow the arrays first and undo a partial growth, so a failed allocation leaves every column aligned
+        grown = []
+        try:
+            for column in (self.used, self.online, self.status_codes, self.circuit_codes, self.telemetry_seq,
+                           self.ports, self.stream_ports, self.replay_ports, self.recordings_ports,
+                           self.capability_codes, self.sensor_lists, self.tag_lists):
+                column.append(0)
+                grown.append(column)
+            for column in (self.last_heartbeat, self.heartbeat_interval, self.updated_at):
+                column.append(NAN)
+                grown.append(column)
+        except BufferError:
+            for column in grown:
+                column.pop()
+            raise
+        for column in (self.ids, self.ip_addresses, self.telemetry):
+            column.append(None)
+        return len(self.ids) - 1
+
+    def _store(self, slot: int, device: Device) -> None:
+        status = device.status
+        self.ip_addresses[slot] = device.ip_address
+        self.telemetry[slot] = status.telemetry or None
+        self.used[slot] = 1
+        self.online[slot] = status.online
+        self.status_codes[slot] = self.strings.code(status.status)
+        self.circuit_codes[slot] = self.strings.code(status.circuit_state)
+        self.last_heartbeat[slot] = NAN if device.last_heartbeat is None else device.last_heartbeat
+        self.heartbeat_interval[slot] = NAN if device.heartbeat_interval is None else device.heartbeat_interval
+        self.updated_at[slot] = NAN if status.updated_at is None else status.updated_at
+        self.telemetry_seq[slot] = NO_VALUE if device.telemetry_seq is None else device.telemetry_seq
+        self.ports[slot] = device.port
+        self.stream_ports[slot] = NO_VALUE if device.stream_port is None else device.stream_port
+        self.replay_ports[slot] = NO_VALUE if device.replay_port is None else device.replay_port
+        self.recordings_ports[slot] = NO_VALUE if device.recordings_port is None else device.recordings_port
+        self.capability_codes[slot] = self.share_capabilities(device.capabilities)
+        self.sensor_lists[slot] = self.share_list(status.sensors)
+        self.tag_lists[slot] = self.share_list(device.tags)
+
+    def _release(self, slot: int) -> None:
+        self.capabilities.release(self.capability_codes[slot])
+        self.lists.release(self.sensor_lists[slot])
+        self.lists.release(self.tag_lists[slot])
+        self.ids[slot] = self.ip_addresses[slot] = self.telemetry[slot] = None
+        self.used[slot] = 0
+        self.free.append(slot)
+
+    def __setitem__(self, device_id: str, device: Device) -> None:
+        if isinstance(device, DeviceView):
+            device = device.to_model()
+        if not isinstance(device, Device):
+            raise TypeError(f"DeviceRegistry stores Device models, not {type(device).__name__}")
+        with self.lock:
+            slot = self._allocate()
+            if device_id in self.slots:
+                self._release(self.slots[device_id])
+            self.ids[slot] = device_id
+            self._store(slot, device)
+            self.slots[device_id] = slot
+
+    def __getitem__(self, device_id: str) -> DeviceView:
+        slot = self.slots[device_id]
+        return DeviceView(self, slot, self.ids[slot])
+
+    def __delitem__(self, device_id: str) -> None:
+        with self.lock:
+            self._release(self.slots.pop(device_id))
+
+    def __contains__(self, device_id) -> bool:
+        return device_id in self.slots
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(self.slots)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def clear(self) -> None:
+        with self.lock:
+            lock = self.lock
+            self.__init__()
+            self.lock = lock
+
+    def copy(self) -> Dict[str, Device]:
+        """A plain dict of materialized Device models, e.g. for unittest.mock.patch.dict."""
+        return {device_id: device.to_model() for device_id, device in self.items()}
+
+    def record_heartbeat(self, device_id: str, now: float) -> None:
+        """
+        Mark a device running and online as of now. Writes the columns
+        directly, without the per-attribute lookups of a DeviceView, as
+        heartbeats arrive from the whole fleet every few seconds.
+
+        Raises:
+            KeyError: If the device is not in the registry.
+        """
+        with self.lock:
+            slot = self.slots[device_id]
+            self.last_heartbeat[slot] = now
+            self.status_codes[slot] = self.running
+            self.online[slot] = 1
+
+    def sweep(self, now: float, min_timeout: float, grace: float) -> List[str]:
+        """
+        Mark every device whose heartbeat is overdue offline, and every other
+        device running, in one vectorized pass over the columns. A device's
+        timeout is the longer of min_timeout and twice its announced heartbeat
+        interval plus grace.
+
+        Returns:
+            list: The ids of the devices that went offline in this sweep.
+        """
+        with self.lock:
+            # The views are dropped when _sweep returns, before the lock is released
+            return self._sweep(now, min_timeout, grace)
+
+    def _sweep(self, now: float, min_timeout: float, grace: float) -> List[str]:
+        if not self.ids:
+            return []
+        used = np.frombuffer(self.used, dtype=np.bool_)
+        online = np.frombuffer(self.online, dtype=np.bool_)
+        status = np.frombuffer(self.status_codes, dtype=np.uint16)
+        interval = np.nan_to_num(np.frombuffer(self.heartbeat_interval))
+        overdue = now - np.frombuffer(self.last_heartbeat) > np.maximum(min_timeout, 2 * interval + grace)
+        stale = used & overdue
+        fresh = used & ~overdue
+        went_offline = [self.ids[slot] for slot in np.flatnonzero(stale & online)]
+        online[stale] = False
+        online[fresh] = True
+        status[stale] = self.strings.code('offline')
+        status[fresh] = self.strings.code('running')
+        return went_offline
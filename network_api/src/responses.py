@@ -0,0 +1,30 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from shared.serialization import dumps, model_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ModelResponse(Response):
+    """
+    Response for data the API already holds as validated models.
+
+    Returning a Response from an endpoint bypasses FastAPI's response_model
+    re-validation and jsonable_encoder, so hot endpoints serialize their
+    internal models in a single pass. The endpoint's response_model still
+    documents the schema.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return model_json(content)
+        return dumps(content)
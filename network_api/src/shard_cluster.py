@@ -0,0 +1,91 @@
+"""
+Run a sharded Network API cluster on localhost.
+
+Starts one uvicorn process per instance on consecutive ports, each with
+SHARD_SELF set to its own URL and SHARD_MEMBERS listing the whole cluster,
+and stops them all on Ctrl-C. Point the fleet simulator or edge nodes at any
+instance; requests for devices owned by another instance are redirected.
+
+Example:
+    python -m network_api.src.shard_cluster --instances 3 --base-port 8001
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List
+
+
+def member_urls(instances: int, base_port: int, host: str = "127.0.0.1") -> List[str]:
+    return [f"http://{host}:{base_port + index}" for index in range(instances)]
+
+
+def start_instance(url: str, members: List[str], extra_env=None) -> subprocess.Popen:
+    env = dict(os.environ, SHARD_SELF=url, SHARD_MEMBERS=",".join(members), **(extra_env or {}))
+    host, port = url.rsplit("//", 1)[1].rsplit(":", 1)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "network_api.src.main:app", "--host", host, "--port", port,
+         "--log-level", "warning"],
+        env=env
+    )
+
+
+def wait_ready(urls: List[str], timeout: float = 30.0) -> None:
+    """
+    Raises:
+        TimeoutError: If an instance does not answer within timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                with urllib.request.urlopen(f"{url}/cluster", timeout=1):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{url} did not start within {timeout}s")
+                time.sleep(0.1)
+
+
+def start_cluster(instances: int, base_port: int, extra_env=None) -> List[subprocess.Popen]:
+    """Start the instances and wait until every one answers."""
+    urls = member_urls(instances, base_port)
+    processes = [start_instance(url, urls, extra_env) for url in urls]
+    try:
+        wait_ready(urls)
+    except Exception:
+        stop_cluster(processes)
+        raise
+    return processes
+
+
+def stop_cluster(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a sharded Network API cluster on localhost")
+    parser.add_argument("--instances", type=int, default=3, help="Number of API instances")
+    parser.add_argument("--base-port", type=int, default=8001, help="Port of the first instance")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cluster = start_cluster(args.instances, args.base_port)
+    print("Cluster members: " + ", ".join(member_urls(args.instances, args.base_port)))
+    try:
+        while all(process.poll() is None for process in cluster):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_cluster(cluster)
@@ -0,0 +1,166 @@
+import bisect
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+from fastapi.responses import RedirectResponse
+
+DEFAULT_VNODES = 128
+# Paths under /devices/ that are not device ids
+RESERVED_DEVICE_PATHS = {"configure"}
+DEVICE_PATH = re.compile(r"^/devices/([^/]+)")
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def normalize_member(url: str) -> str:
+    return url.strip().rstrip('/')
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping keys to members.
+
+    Each member is placed on the ring at `vnodes` pseudo-random points, and a
+    key belongs to the member owning the first point at or after the key's
+    hash. Adding or removing a member therefore only moves the keys between
+    that member's points and their predecessors, about 1/N of all keys, and
+    the virtual nodes keep the load within a few percent of even.
+    """
+
+    def __init__(self, members: Iterable[str] = (), vnodes: int = DEFAULT_VNODES):
+        if vnodes < 1:
+            raise ValueError("vnodes must be at least 1")
+        self.vnodes = vnodes
+        self.members: List[str] = sorted(set(members))
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        points = sorted(
+            (ring_hash(f"{member}#{replica}"), member)
+            for member in self.members for replica in range(self.vnodes)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def add(self, member: str) -> None:
+        if member not in self.members:
+            self.members = sorted(self.members + [member])
+            self._rebuild()
+
+    def remove(self, member: str) -> None:
+        if member in self.members:
+            self.members = [existing for existing in self.members if existing != member]
+            self._rebuild()
+
+    def owner(self, key: str) -> str:
+        """
+        Raises:
+            LookupError: If the ring has no members.
+        """
+        if not self._points:
+            raise LookupError("Hash ring has no members")
+        index = bisect.bisect_left(self._points, ring_hash(key))
+        return self._owners[index % len(self._owners)]
+
+
+class ShardMap:
+    """
+    This API instance's view of the cluster: which instance owns each device.
+
+    Members are identified by their base URL, which is where requests for the
+    devices they own are redirected. Sharding is off when this instance's URL
+    is not set, and every device is then owned locally. An instance left out
+    of the membership owns nothing, so it hands all its devices over.
+    """
+
+    def __init__(self, self_url: Optional[str] = None, members: Iterable[str] = (), vnodes: int = DEFAULT_VNODES):
+        self.self_url = normalize_member(self_url) if self_url else None
+        self.ring = HashRing(vnodes=vnodes)
+        members = list(members)
+        if self.self_url and not members:
+            members = [self.self_url]  # A cluster of one until members are announced
+        if members:
+            self.set_members(members)
+
+    @classmethod
+    def from_env(cls) -> "ShardMap":
+        """Build from SHARD_SELF, SHARD_MEMBERS (comma separated URLs) and SHARD_VNODES."""
+        members = [member for member in os.environ.get('SHARD_MEMBERS', '').split(',') if member.strip()]
+        return cls(os.environ.get('SHARD_SELF') or None, members, int(os.environ.get('SHARD_VNODES', DEFAULT_VNODES)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.self_url is not None
+
+    @property
+    def members(self) -> List[str]:
+        return list(self.ring.members)
+
+    def set_members(self, members: Iterable[str]) -> None:
+        """
+        Replace the membership.
+
+        Raises:
+            ValueError: If no members are given.
+        """
+        members = {normalize_member(member) for member in members if member.strip()}
+        if not members:
+            raise ValueError("A cluster needs at least one member")
+        self.ring = HashRing(members, vnodes=self.ring.vnodes)
+
+    def owner(self, device_id: str) -> Optional[str]:
+        """Base URL of the instance owning a device, or None when sharding is off."""
+        return self.ring.owner(device_id) if self.enabled else None
+
+    def owns(self, device_id: str) -> bool:
+        return not self.enabled or self.ring.owner(device_id) == self.self_url
+
+    def foreign(self, device_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Group the device ids this instance does not own by their owner."""
+        groups: Dict[str, List[str]] = {}
+        if self.enabled:
+            for device_id in device_ids:
+                owner = self.ring.owner(device_id)
+                if owner != self.self_url:
+                    groups.setdefault(owner, []).append(device_id)
+        return groups
+
+
+def device_id_from_path(path: str) -> Optional[str]:
+    match = DEVICE_PATH.match(path)
+    if match is None or match.group(1) in RESERVED_DEVICE_PATHS:
+        return None
+    return match.group(1)
+
+
+class ShardRedirectMiddleware:
+    """
+    Redirects requests for devices owned by another instance to that instance
+    with 307, so the method and body are kept and clients that follow
+    redirects (browsers, aiohttp, httpx with follow_redirects) need no
+    knowledge of the ring. Written as plain ASGI middleware, so requests for
+    local devices pay only for a path match and a hash.
+    """
+
+    def __init__(self, app, shards: ShardMap):
+        self.app = app
+        self.shards = shards
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and self.shards.enabled:
+            device_id = device_id_from_path(scope['path'])
+            if device_id is not None and not self.shards.owns(device_id):
+                # raw_path keeps any percent-encoding of the device id intact
+                path = scope['raw_path'].decode('latin-1') if scope.get('raw_path') else scope['path']
+                location = self.shards.owner(device_id) + scope.get('root_path', '') + path
+                if scope.get('query_string'):
+                    location += '?' + scope['query_string'].decode('latin-1')
+                await RedirectResponse(location, status_code=307)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,357 @@
+"""
+In-process fleet simulator for scale-testing the network API.
+
+Runs thousands of lightweight virtual edge nodes in a single asyncio process.
+Each node answers the edge Controller protocol over its own ZMQ REP socket,
+sends heartbeats like edge_node/src/main.py, and can announce itself through a
+loopback discovery stub that feeds the API's Zeroconf handler directly.
+
+Example:
+    python -m network_api.src.simulator --in-process-api --announce --steps 100,500,1000,2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import socket
+import time
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+import zmq
+import zmq.asyncio
+from pydantic import BaseModel
+from zeroconf import ServiceInfo, ServiceStateChange
+
+from shared.latency import LatencyHistogram
+from shared.logger import network_api_logger as logger
+from shared.models import DeviceStatus, EdgeNodeCapabilities, SensorInfo, StreamConfig
+from shared.telemetry import DeltaEncoder
+
+SERVICE_TYPE = "_ministream._tcp.local."
+
+
+class FaultProfile(BaseModel):
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    flap_fraction: float = 0.0
+    flap_period: float = 30.0
+    dead_fraction: float = 0.0
+
+
+class LoopbackDiscovery:
+    """
+    Stand-in for Zeroconf that delivers service registrations straight to
+    in-process handlers such as network_api.src.main.on_service_state_change.
+    """
+
+    def __init__(self, handlers: List[Callable]):
+        self.handlers = handlers
+        self.services: Dict[str, ServiceInfo] = {}
+
+    def get_service_info(self, service_type: str, name: str) -> Optional[ServiceInfo]:
+        return self.services.get(name)
+
+    def register_service(self, info: ServiceInfo) -> None:
+        self.services[info.name] = info
+        self._notify(info, ServiceStateChange.Added)
+
+    def update_service(self, info: ServiceInfo) -> None:
+        self.services[info.name] = info
+        self._notify(info, ServiceStateChange.Updated)
+
+    def unregister_service(self, info: ServiceInfo) -> None:
+        self._notify(info, ServiceStateChange.Removed)
+        self.services.pop(info.name, None)
+
+    def _notify(self, info: ServiceInfo, state_change: ServiceStateChange) -> None:
+        for handler in self.handlers:
+            handler(self, info.type, info.name, state_change)
+
+
+class VirtualEdgeNode:
+    """
+    A simulated edge node. Healthy nodes answer every request, flapping nodes
+    alternate between up and down every flap_period seconds, and dead nodes
+    never heartbeat or answer.
+    """
+
+    def __init__(self, index: int, port: int, profile: FaultProfile, mode: str = "healthy", host: str = "127.0.0.1"):
+        self.device_id = f"sim_node_{index:05d}"
+        self.port = port
+        self.host = host
+        self.profile = profile
+        self.mode = mode
+        self.phase = random.uniform(0, profile.flap_period)
+        self.stream_config: Dict = {}
+        self.requests_served = 0
+        self.telemetry = DeltaEncoder()
+
+    def is_up(self, now: Optional[float] = None) -> bool:
+        if self.mode == "dead":
+            return False
+        if self.mode == "flapping":
+            now = time.monotonic() if now is None else now
+            return int((now + self.phase) / self.profile.flap_period) % 2 == 0
+        return True
+
+    def get_capabilities(self) -> EdgeNodeCapabilities:
+        return EdgeNodeCapabilities(
+            node_type="simulated",
+            hardware_info={"model": "Virtual Edge Node", "cpu": "Simulated", "gpu": "Simulated"},
+            sensors=[SensorInfo(
+                id="sim_camera_0",
+                name="Simulated Camera",
+                resolutions=["640x480", "1280x720", "1920x1080"],
+                max_fps=30.0
+            )],
+            supported_encodings=["h264", "h265"]
+        )
+
+    def service_info(self) -> ServiceInfo:
+        """Build the same ServiceInfo the real edge node registers."""
+        capabilities = self.get_capabilities()
+        return ServiceInfo(
+            SERVICE_TYPE,
+            f"EdgeNode_{self.device_id}.{SERVICE_TYPE}",
+            addresses=[socket.inet_aton(self.host)],
+            port=self.port,
+            properties={
+                b"device_id": self.device_id.encode('utf-8'),
+                b"node_type": capabilities.node_type.encode('utf-8'),
+                b"hardware_info": json.dumps(capabilities.hardware_info).encode('utf-8'),
+                b"sensors": json.dumps([sensor.dict() for sensor in capabilities.sensors]).encode('utf-8'),
+                b"supported_encodings": json.dumps(capabilities.supported_encodings).encode('utf-8')
+            }
+        )
+
+    def handle_message(self, message: Dict) -> Dict:
+        """Answer a Controller protocol message the way edge_node's Controller does."""
+        if message.get('type') == 'get_status':
+            return DeviceStatus(
+                id=self.device_id,
+                status="running",
+                sensors=["sim_camera_0"],
+                online=True
+            ).dict()
+        elif message.get('type') == 'configure_stream':
+            try:
+                self.stream_config = StreamConfig(**message['config']).dict()
+            except (KeyError, ValueError) as e:
+                return {'error': f"Invalid stream configuration: {str(e)}"}
+            return {'status': 'success'}
+        return {'error': 'Unknown message type'}
+
+    async def serve(self, context: zmq.asyncio.Context) -> None:
+        if self.mode == "dead":
+            return  # Dead nodes never bind, so requests to them go unanswered
+        sock = context.socket(zmq.REP)
+        sock.bind(f"tcp://{self.host}:{self.port}")
+        try:
+            while True:
+                message = await sock.recv_json()
+                while not self.is_up():
+                    await asyncio.sleep(0.5)
+                delay_ms = self.profile.latency_ms + random.uniform(0, self.profile.jitter_ms)
+                if delay_ms > 0:
+                    await asyncio.sleep(delay_ms / 1000.0)
+                self.requests_served += 1
+                await sock.send_json(self.handle_message(message))
+        finally:
+            sock.close(linger=0)
+
+    def telemetry_snapshot(self) -> Dict:
+        """Telemetry shaped like edge_node's TelemetryCollector produces."""
+        return {
+            'sensors': {'sim_camera_0': {'fps': float(self.stream_config.get('fps', 30)), 'dropped': 0}},
+            'queues': {'gop_cache': 0},
+            'system': {'cpu_percent': 20, 'memory_percent': 40, 'temperature_c': 45.0}
+        }
+
+    async def heartbeat(self, session: aiohttp.ClientSession, api_url: str, interval: float) -> None:
+        await asyncio.sleep(random.uniform(0, interval))  # Spread heartbeats across the interval
+        while True:
+            if self.is_up():
+                try:
+                    payload = self.telemetry.encode(self.telemetry_snapshot())
+                    payload['interval'] = interval
+                    async with session.post(f"{api_url}/devices/{self.device_id}/heartbeat", json=payload) as response:
+                        if response.status == 200 and (await response.json()).get('resync'):
+                            self.telemetry.request_full()
+                except Exception as e:
+                    logger.debug(f"Simulated heartbeat failed for {self.device_id}: {e}")
+            await asyncio.sleep(interval)
+
+
+class FleetSimulator:
+    """
+    Grows a fleet of virtual edge nodes in steps and measures API latency and
+    process CPU usage at each fleet size.
+    """
+
+    def __init__(self, api_url: str, profile: FaultProfile, base_port: int = 20000,
+                 heartbeat_interval: float = 5.0, discovery: Optional[LoopbackDiscovery] = None):
+        self.api_url = api_url.rstrip('/')
+        self.profile = profile
+        self.base_port = base_port
+        self.heartbeat_interval = heartbeat_interval
+        self.discovery = discovery
+        self.nodes: List[VirtualEdgeNode] = []
+        self.tasks: List[asyncio.Task] = []
+        self.context = zmq.asyncio.Context()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def _pick_mode(self) -> str:
+        roll = random.random()
+        if roll < self.profile.dead_fraction:
+            return "dead"
+        if roll < self.profile.dead_fraction + self.profile.flap_fraction:
+            return "flapping"
+        return "healthy"
+
+    async def grow(self, target: int) -> None:
+        """Start virtual nodes until the fleet has `target` nodes."""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=256))
+        self.context.set(zmq.MAX_SOCKETS, target + 1024)
+        while len(self.nodes) < target:
+            index = len(self.nodes)
+            node = VirtualEdgeNode(index, self.base_port + index, self.profile, self._pick_mode())
+            self.nodes.append(node)
+            self.tasks.append(asyncio.create_task(node.serve(self.context)))
+            if node.mode != "dead":
+                self.tasks.append(asyncio.create_task(
+                    node.heartbeat(self.session, self.api_url, self.heartbeat_interval)
+                ))
+            if self.discovery is not None:
+                self.discovery.register_service(node.service_info())
+            if index % 100 == 0:
+                await asyncio.sleep(0)  # Let the loop breathe while spawning
+
+    async def measure(self, duration: float, concurrency: int = 8, request_timeout: float = 5.0) -> Dict:
+        """
+        Probe the API for `duration` seconds and report latency and CPU usage.
+
+        Returns:
+            dict: Fleet size, per-endpoint latency stats, timeouts and CPU percent.
+        """
+        histograms = {"devices": LatencyHistogram(), "status": LatencyHistogram()}
+        errors = {"devices": 0, "status": 0}
+        timeout = aiohttp.ClientTimeout(total=request_timeout)
+        deadline = time.monotonic() + duration
+
+        async def probe():
+            while time.monotonic() < deadline:
+                endpoint = random.choice(["devices", "status"])
+                path = "/devices" if endpoint == "devices" else f"/devices/{random.choice(self.nodes).device_id}/status"
+                started = time.monotonic()
+                try:
+                    async with self.session.get(f"{self.api_url}{path}", timeout=timeout) as response:
+                        await response.read()
+                        if response.status >= 500:
+                            errors[endpoint] += 1
+                except Exception:
+                    errors[endpoint] += 1
+                histograms[endpoint].record((time.monotonic() - started) * 1000)
+
+        cpu_started, wall_started = time.process_time(), time.monotonic()
+        await asyncio.gather(*(probe() for _ in range(concurrency)))
+        cpu_used, wall_used = time.process_time() - cpu_started, time.monotonic() - wall_started
+        return {
+            "fleet_size": len(self.nodes),
+            "modes": {mode: sum(1 for n in self.nodes if n.mode == mode) for mode in ("healthy", "flapping", "dead")},
+            "latency": {name: histogram.to_dict() for name, histogram in histograms.items()},
+            "errors": errors,
+            "cpu_percent": round(100.0 * cpu_used / wall_used, 1) if wall_used else None
+        }
+
+    async def run(self, steps: List[int], duration: float, concurrency: int) -> List[Dict]:
+        report = []
+        for step in steps:
+            await self.grow(step)
+            await asyncio.sleep(min(self.heartbeat_interval, duration))  # Let heartbeats settle
+            result = await self.measure(duration, concurrency)
+            logger.info(f"Fleet of {step}: {json.dumps({k: v for k, v in result.items() if k != 'latency'})}")
+            report.append(result)
+        return report
+
+    async def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+        self.context.term()
+
+
+def raise_fd_limit() -> None:
+    """Each virtual node holds a few file descriptors; lift the soft limit to the hard limit."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def main(args) -> None:
+    raise_fd_limit()
+    profile = FaultProfile(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        flap_fraction=args.flap_fraction,
+        flap_period=args.flap_period,
+        dead_fraction=args.dead_fraction
+    )
+    server = None
+    discovery = None
+    if args.in_process_api:
+        import uvicorn
+        from network_api.src.main import app, on_service_state_change
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.api_port, log_level="warning"))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        if args.announce:
+            discovery = LoopbackDiscovery([on_service_state_change])
+    elif args.announce:
+        raise SystemExit("--announce requires --in-process-api")
+
+    api_url = args.api_url or f"http://127.0.0.1:{args.api_port}"
+    simulator = FleetSimulator(api_url, profile, args.base_port, args.heartbeat_interval, discovery)
+    try:
+        report = await simulator.run([int(s) for s in args.steps.split(',')], args.duration, args.concurrency)
+    finally:
+        await simulator.close()
+        if server is not None:
+            server.should_exit = True
+            await server_task
+
+    output = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scale-test the network API with a simulated fleet")
+    parser.add_argument("--api-url", help="URL of an already running network API")
+    parser.add_argument("--in-process-api", action="store_true", help="Host the network API in this process")
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--announce", action="store_true", help="Announce nodes through loopback discovery")
+    parser.add_argument("--steps", default="100,500,1000,2000", help="Comma-separated fleet sizes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to probe the API at each step")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent API probes")
+    parser.add_argument("--base-port", type=int, default=20000, help="First ZMQ port for virtual nodes")
+    parser.add_argument("--heartbeat-interval", type=float, default=5.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added RPC latency per node")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra RPC latency")
+    parser.add_argument("--flap-fraction", type=float, default=0.0, help="Fraction of nodes that flap")
+    parser.add_argument("--flap-period", type=float, default=30.0, help="Seconds between flaps")
+    parser.add_argument("--dead-fraction", type=float, default=0.0, help="Fraction of nodes that never respond")
+    parser.add_argument("--report", help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
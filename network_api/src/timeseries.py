@@ -0,0 +1,184 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.logger import network_api_logger as logger
+
+# (bucket width in seconds, buckets kept); 0 means one bucket per heartbeat
+DEFAULT_TIERS: Tuple[Tuple[float, int], ...] = ((0.0, 720), (10.0, 360), (60.0, 1440))
+MAX_METRICS = 256
+MAX_POINTS = 2000
+DEFAULT_POINTS = 500
+
+
+class Tier:
+    """
+    One downsampling tier: a ring of time buckets with per-metric sum, count,
+    min and max held in 2-D NumPy arrays (metrics x buckets).
+    """
+
+    def __init__(self, resolution: float, capacity: int, metrics: int):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.times = np.full(capacity, np.nan)
+        self.sum = np.zeros((metrics, capacity), dtype=np.float32)
+        self.count = np.zeros((metrics, capacity), dtype=np.uint16)
+        self.min = np.full((metrics, capacity), np.inf, dtype=np.float32)
+        self.max = np.full((metrics, capacity), -np.inf, dtype=np.float32)
+        self.head = -1
+
+    def grow(self, metrics: int) -> None:
+        extra = metrics - self.sum.shape[0]
+        self.sum = np.vstack([self.sum, np.zeros((extra, self.capacity), dtype=np.float32)])
+        self.count = np.vstack([self.count, np.zeros((extra, self.capacity), dtype=np.uint16)])
+        self.min = np.vstack([self.min, np.full((extra, self.capacity), np.inf, dtype=np.float32)])
+        self.max = np.vstack([self.max, np.full((extra, self.capacity), -np.inf, dtype=np.float32)])
+
+    def oldest(self) -> Optional[float]:
+        return None if self.head < 0 else float(np.nanmin(self.times))
+
+    def add(self, timestamp: float, rows: np.ndarray, values: np.ndarray) -> None:
+        bucket = math.floor(timestamp / self.resolution) * self.resolution if self.resolution else timestamp
+        if self.resolution == 0 or self.head < 0 or bucket > self.times[self.head]:
+            self.head = (self.head + 1) % self.capacity
+            self.times[self.head] = bucket
+            self.sum[:, self.head] = 0
+            self.count[:, self.head] = 0
+            self.min[:, self.head] = np.inf
+            self.max[:, self.head] = -np.inf
+        # Samples are only ever folded into the newest bucket, even if they arrive slightly late
+        column = self.head
+        self.sum[rows, column] += values
+        self.count[rows, column] += 1
+        self.min[rows, column] = np.minimum(self.min[rows, column], values)
+        self.max[rows, column] = np.maximum(self.max[rows, column], values)
+
+
+class DeviceTimeSeries:
+    """
+    Fixed-memory telemetry history for one device.
+
+    Every heartbeat records all numeric metrics at once into each tier (raw,
+    10 s and 1 min by default), so memory is bounded by tier capacities times
+    the number of distinct metrics, which is itself capped: about 35 KB per
+    metric with the default tiers, whose 1 min tier keeps 24 h. Queries
+    re-bucket the best-fitting tier to the requested step with vectorized
+    NumPy reductions instead of scanning Python objects.
+    """
+
+    def __init__(self, tiers: Sequence[Tuple[float, int]] = DEFAULT_TIERS, max_metrics: int = MAX_METRICS):
+        self.metrics: Dict[str, int] = {}
+        self.max_metrics = max_metrics
+        self.tiers = [Tier(resolution, capacity, 0) for resolution, capacity in tiers]
+        self._dropped_metrics = set()
+
+    def _row(self, metric: str) -> Optional[int]:
+        row = self.metrics.get(metric)
+        if row is not None:
+            return row
+        if len(self.metrics) >= self.max_metrics:
+            if metric not in self._dropped_metrics:
+                self._dropped_metrics.add(metric)
+                logger.warning(f"Telemetry metric limit of {self.max_metrics} reached, not recording {metric}")
+            return None
+        row = self.metrics[metric] = len(self.metrics)
+        return row
+
+    def record(self, timestamp: float, values: Dict[str, float]) -> None:
+        """
+        Record one sample of every numeric metric.
+
+        Args:
+            timestamp (float): Sample time in seconds since the epoch.
+            values (dict): Flattened metric name to value; non-numeric values are ignored.
+        """
+        rows, samples = [], []
+        for metric, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            row = self._row(metric)
+            if row is not None:
+                rows.append(row)
+                samples.append(value)
+        if not rows:
+            return
+        if len(self.metrics) > self.tiers[0].sum.shape[0]:
+            # Rows are added once per batch of new metrics; the metric set is stable after the first heartbeat
+            for tier in self.tiers:
+                tier.grow(len(self.metrics))
+        rows = np.array(rows, dtype=np.intp)
+        samples = np.array(samples, dtype=np.float32)
+        for tier in self.tiers:
+            tier.add(timestamp, rows, samples)
+
+    def select_tier(self, start: float, step: float) -> Tier:
+        """
+        The finest tier that still covers start and is no finer than needed for
+        step; the tier with the longest history if none covers start.
+        """
+        covering = [tier for tier in self.tiers if tier.oldest() is not None and tier.oldest() <= start]
+        fitting = [tier for tier in covering if tier.resolution <= step]
+        if fitting:
+            return max(fitting, key=lambda tier: tier.resolution)
+        if covering:
+            return min(covering, key=lambda tier: tier.resolution)
+        return max(self.tiers, key=lambda tier: tier.resolution * tier.capacity)
+
+    def query(self, metric: str, start: float, end: float, step: Optional[float] = None) -> Dict:
+        """
+        Aggregate a metric into evenly spaced buckets.
+
+        Args:
+            metric (str): Flattened metric name, e.g. "sensors.camera_1.fps".
+            start (float): Range start in seconds since the epoch, inclusive.
+            end (float): Range end, exclusive.
+            step (float, optional): Bucket width in seconds; chosen automatically if omitted.
+
+        Returns:
+            dict: Column arrays t, mean, min, max and count, with None for empty buckets.
+
+        Raises:
+            KeyError: If the metric has never been recorded.
+            ValueError: If the range or step is invalid.
+        """
+        if end <= start:
+            raise ValueError("'to' must be after 'from'")
+        span = end - start
+        if step is None:
+            step = span / DEFAULT_POINTS
+        if step <= 0:
+            raise ValueError("step must be positive")
+        row = self.metrics[metric]
+        tier = self.select_tier(start, step)
+        step = max(step, tier.resolution, span / MAX_POINTS)
+        buckets = int(math.ceil(span / step))
+
+        mask = (tier.times >= start) & (tier.times < end) & (tier.count[row] > 0)
+        index = ((tier.times[mask] - start) // step).astype(np.intp)
+        count = np.bincount(index, weights=tier.count[row, mask], minlength=buckets)
+        total = np.bincount(index, weights=tier.sum[row, mask], minlength=buckets)
+        low = np.full(buckets, np.inf)
+        high = np.full(buckets, -np.inf)
+        np.minimum.at(low, index, tier.min[row, mask])
+        np.maximum.at(high, index, tier.max[row, mask])
+
+        empty = count == 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+
+        def column(values: np.ndarray) -> List[Optional[float]]:
+            return [None if missing else float(value) for value, missing in zip(values.tolist(), empty.tolist())]
+
+        return {
+            'metric': metric,
+            'from': start,
+            'to': end,
+            'step': step,
+            'tier': tier.resolution,
+            't': (start + np.arange(buckets) * step).tolist(),
+            'mean': column(mean),
+            'min': column(low),
+            'max': column(high),
+            'count': count.astype(int).tolist()
+        }
@@ -1 +1,101 @@
-# This file can be left empty as we've implemented the ZMQ communication directly in the API file
\ No newline at end of file
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, List, Tuple
+
+
+async def bounded_as_completed(
+    items: Iterable[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    parallelism: int
+) -> AsyncIterator[Any]:
+    """
+    Run worker(item) for every item with at most `parallelism` calls in flight,
+    yielding results in completion order.
+
+    Args:
+        items (Iterable): The items to process.
+        worker (Callable): Coroutine function applied to each item.
+        parallelism (int): Maximum number of concurrent worker calls.
+
+    Yields:
+        The result of each worker call as soon as it completes.
+    """
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def run(item):
+        async with semaphore:
+            return await worker(item)
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """Split a list into consecutive chunks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent async calls so one upstream call serves
+    every waiter, and optionally reuses a completed result for a short
+    freshness window.
+
+    The shared call runs as its own task, so a waiter that is cancelled (for
+    example because its HTTP client disconnected) does not cancel the call for
+    everyone else.
+    """
+
+    def __init__(self, freshness: float = 0.0, max_entries: int = 10000):
+        """
+        Args:
+            freshness (float): Seconds a completed result may be reused; 0 disables reuse.
+            max_entries (int): Completed results kept before expired ones are pruned.
+        """
+        self.freshness = freshness
+        self.max_entries = max_entries
+        self.in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.recent: Dict[Hashable, Tuple[float, Any]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return func()'s result, sharing it with any identical call for `key`.
+
+        Args:
+            key (Hashable): Identity of the call; equal keys are coalesced.
+            func (Callable): Zero-argument coroutine function performing the call.
+        """
+        if self.freshness > 0:
+            cached = self.recent.get(key)
+            if cached is not None and time.monotonic() - cached[0] <= self.freshness:
+                self.coalesced += 1
+                return cached[1]
+        task = self.in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future) -> None:
+        self.in_flight.pop(key, None)
+        if self.freshness <= 0 or task.cancelled() or task.exception() is not None:
+            return
+        now = time.monotonic()
+        if len(self.recent) >= self.max_entries:
+            self.recent = {k: v for k, v in self.recent.items() if now - v[0] <= self.freshness}
+        self.recent[key] = (now, task.result())
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a cached result, e.g. after a write that changes it."""
+        self.recent.pop(key, None)
@@ -1,3 +1,5 @@
+import asyncio
+import time
 import pytest
 from fastapi.testclient import TestClient
 import sys
@@ -12,17 +14,19 @@ import socket
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from network_api.src.main import app, devices
-from shared.models import EdgeNodeCapabilities, SensorInfo, StreamConfig
-from shared.exceptions import DeviceNotFoundError, CommunicationError
+from shared.models import Device, DeviceStatus, EdgeNodeCapabilities, SensorInfo, StreamConfig
+from shared.exceptions import DeviceNotFoundError, CommunicationError, DeviceTimeoutError, CircuitOpenError
 
 client = TestClient(app)
 
 @pytest.fixture
 def mock_devices(monkeypatch):
     mock_data = {
-        "test_device_1": {
-            "address": "tcp://192.168.1.100:5000",
-            "capabilities": EdgeNodeCapabilities(
+        "test_device_1": Device(
+            id="test_device_1",
+            ip_address="192.168.1.100",
+            port=5000,
+            capabilities=EdgeNodeCapabilities(
                 node_type="jetson",
                 hardware_info={
                     "model": "Jetson Nano",
@@ -33,11 +37,14 @@ def mock_devices(monkeypatch):
                     SensorInfo(id="camera_1", name="Main Camera", resolutions=["1920x1080", "1280x720"], max_fps=30.0)
                 ],
                 supported_encodings=["h264", "h265"]
-            )
-        },
-        "test_device_2": {
-            "address": "tcp://192.168.1.101:5000",
-            "capabilities": EdgeNodeCapabilities(
+            ),
+            status=DeviceStatus(id="test_device_1", sensors=["camera_1"])
+        ),
+        "test_device_2": Device(
+            id="test_device_2",
+            ip_address="192.168.1.101",
+            port=5000,
+            capabilities=EdgeNodeCapabilities(
                 node_type="raspberry_pi",
                 hardware_info={
                     "model": "Raspberry Pi 4",
@@ -48,8 +55,9 @@ def mock_devices(monkeypatch):
                     SensorInfo(id="camera_1", name="Pi Camera V2", resolutions=["1920x1080", "1280x720"], max_fps=30.0)
                 ],
                 supported_encodings=["h264"]
-            )
-        }
+            ),
+            status=DeviceStatus(id="test_device_2", sensors=["camera_1"])
+        )
     }
     devices.clear()  # Clear existing devices
     devices.update(mock_data)  # Update with mock data
@@ -76,7 +84,7 @@ def test_get_device_capabilities(mock_devices):
     device_id = "test_device_1"
     response = client.get(f"/devices/{device_id}/capabilities")
     assert response.status_code == 200
-    assert response.json() == mock_devices[device_id]["capabilities"].dict()
+    assert response.json() == mock_devices[device_id].capabilities.dict()
 
 def test_get_device_capabilities_not_found():
     response = client.get("/devices/non_existent_device/capabilities")
@@ -155,26 +163,29 @@ def test_on_service_state_change():
     on_service_state_change(mock_zeroconf, "_ministream._tcp.local.", "New Device._ministream._tcp.local.", ServiceStateChange.Added)
 
     assert "new_device" in devices
-    assert devices["new_device"]["address"] == "tcp://192.168.1.102:5000"
-    assert devices["new_device"]["capabilities"].node_type == "jetson"
-    assert devices["new_device"]["capabilities"].hardware_info["model"] == "Jetson Xavier"
-    assert len(devices["new_device"]["capabilities"].sensors) == 1
-    assert devices["new_device"]["capabilities"].sensors[0].name == "Xavier Camera"
-    assert devices["new_device"]["capabilities"].supported_encodings == ["h264", "h265"]
+    assert (devices["new_device"].ip_address, devices["new_device"].port) == ("192.168.1.102", 5000)
+    assert devices["new_device"].capabilities.node_type == "jetson"
+    assert devices["new_device"].capabilities.hardware_info["model"] == "Jetson Xavier"
+    assert len(devices["new_device"].capabilities.sensors) == 1
+    assert devices["new_device"].capabilities.sensors[0].name == "Xavier Camera"
+    assert devices["new_device"].capabilities.supported_encodings == ["h264", "h265"]
 
 def test_on_service_state_change_remove():
     from network_api.src.main import on_service_state_change, devices
 
     # First, add a device
-    devices["test_device"] = {
-        "address": "tcp://192.168.1.103:5000",
-        "capabilities": EdgeNodeCapabilities(
+    devices["test_device"] = Device(
+        id="test_device",
+        ip_address="192.168.1.103",
+        port=5000,
+        capabilities=EdgeNodeCapabilities(
             node_type="jetson",
             hardware_info={"model": "Jetson Nano"},
             sensors=[SensorInfo(id="camera_1", name="Test Camera", resolutions=["1920x1080"], max_fps=30.0)],
             supported_encodings=["h264"]
-        )
-    }
+        ),
+        status=DeviceStatus(id="test_device", sensors=["camera_1"])
+    )
     mock_info = ServiceInfo(
         "_ministream._tcp.local.",
         "Test Device._ministream._tcp.local.",
@@ -217,3 +228,565 @@ def test_on_service_state_change_no_info():
 
     # Assert that no device was added
     assert "NonExistent Device" not in devices
+
+
+def make_device(device_id, node_type="jetson", tags=None):
+    return Device(
+        id=device_id,
+        ip_address="127.0.0.1",
+        port=5555,
+        capabilities=EdgeNodeCapabilities(
+            node_type=node_type,
+            hardware_info={"model": "Test"},
+            sensors=[SensorInfo(id="camera_1", name="Test Camera", resolutions=["1920x1080", "1280x720"], max_fps=30.0)],
+            supported_encodings=["h264"]
+        ),
+        status=DeviceStatus(id=device_id, sensors=["camera_1"]),
+        last_heartbeat=time.time(),
+        tags=tags or []
+    )
+
+
+@pytest.fixture
+def fleet():
+    from network_api.src.main import breakers, telemetry_history
+    breakers.clear()
+    telemetry_history.clear()
+    devices.clear()
+    for i in range(6):
+        devices[f"cam_{i}"] = make_device(f"cam_{i}", tags=["lobby"] if i < 4 else [])
+    devices["pi_0"] = make_device("pi_0", node_type="raspberry_pi", tags=["lobby"])
+    yield devices
+    devices.clear()
+
+
+def bulk_configure(body):
+    response = client.post("/devices/configure", json=body)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return response, lines[:-1], lines[-1]["summary"]
+
+
+def test_bulk_configure_selects_by_node_type_and_tags(fleet, mock_send_zmq_request):
+    mock_send_zmq_request.return_value = {"status": "success"}
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264")
+    response, results, summary = bulk_configure({
+        "selector": {"node_type": "jetson", "tags": ["lobby"]},
+        "config": config.dict()
+    })
+    assert response.status_code == 200
+    assert sorted(r["device_id"] for r in results) == ["cam_0", "cam_1", "cam_2", "cam_3"]
+    assert summary["success"] == 4
+    assert mock_send_zmq_request.call_count == 4
+
+
+def test_bulk_configure_passes_its_timeout_to_the_device(fleet, mock_send_zmq_request):
+    mock_send_zmq_request.return_value = {"status": "success"}
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264")
+    _, results, summary = bulk_configure({"selector": {"ids": ["cam_0"]}, "config": config.dict(), "timeout": 8.0})
+    assert summary["success"] == 1
+    (address, message), options = mock_send_zmq_request.call_args
+    # Longer than DEVICE_RPC_TIMEOUT, and sent as a budget rather than a wall-clock deadline
+    assert options["timeout"] == 8.0 and message["budget"] == 8.0 and "deadline" not in message
+
+
+def test_bulk_configure_reports_timeouts_and_unknown_ids(fleet, monkeypatch):
+    async def slow_send_zmq_request(address, message, timeout=None):
+        await asyncio.sleep(1)
+        return {"status": "success"}
+
+    monkeypatch.setattr("network_api.src.main.send_zmq_request", slow_send_zmq_request)
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264")
+    _, results, summary = bulk_configure({
+        "selector": {"ids": ["cam_0", "missing"]},
+        "config": config.dict(),
+        "timeout": 0.05
+    })
+    statuses = {r["device_id"]: r["status"] for r in results}
+    assert statuses == {"cam_0": "timeout", "missing": "not_found"}
+    assert summary["timeout"] == 1 and summary["not_found"] == 1
+
+
+def test_bulk_configure_staged_rollout_aborts_on_failure(fleet, mock_send_zmq_request):
+    mock_send_zmq_request.return_value = {"error": "bad config"}
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264")
+    _, results, summary = bulk_configure({
+        "selector": {"node_type": "jetson"},
+        "config": config.dict(),
+        "stage_size": 2,
+        "abort_on_failure": True
+    })
+    assert summary["error"] == 2
+    assert summary["skipped"] == 4
+    assert mock_send_zmq_request.call_count == 2
+
+
+def test_bulk_configure_no_match(fleet):
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264")
+    response = client.post("/devices/configure", json={"selector": {"node_type": "zynq"}, "config": config.dict()})
+    assert response.status_code == 404
+
+
+def test_simulated_node_answers_controller_protocol():
+    from network_api.src.simulator import VirtualEdgeNode, FaultProfile
+
+    node = VirtualEdgeNode(0, 20000, FaultProfile())
+    assert node.handle_message({"type": "get_status"})["id"] == node.device_id
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264").dict()
+    assert node.handle_message({"type": "configure_stream", "config": config}) == {"status": "success"}
+    assert "error" in node.handle_message({"type": "configure_stream", "config": {"fps": "fast"}})
+    assert not VirtualEdgeNode(1, 20001, FaultProfile(), mode="dead").is_up()
+
+
+def test_loopback_discovery_registers_with_api():
+    from network_api.src.main import on_service_state_change
+    from network_api.src.simulator import LoopbackDiscovery, VirtualEdgeNode, FaultProfile
+
+    devices.clear()
+    discovery = LoopbackDiscovery([on_service_state_change])
+    node = VirtualEdgeNode(7, 20007, FaultProfile())
+    discovery.register_service(node.service_info())
+    assert devices[node.device_id].port == 20007
+    assert devices[node.device_id].capabilities.node_type == "simulated"
+    discovery.unregister_service(node.service_info())
+    assert node.device_id not in devices
+
+
+def test_updated_announcement_keeps_device_state():
+    from network_api.src.main import on_service_state_change
+    from network_api.src.simulator import LoopbackDiscovery, VirtualEdgeNode, FaultProfile
+
+    devices.clear()
+    discovery = LoopbackDiscovery([on_service_state_change])
+    node = VirtualEdgeNode(8, 20008, FaultProfile())
+    discovery.register_service(node.service_info())
+    view = devices[node.device_id]
+    view.heartbeat_interval = 3.0
+    view.telemetry_seq = 12
+    view.status.telemetry["system"] = {"cpu_percent": 40}
+
+    # A fresh probe found another encoder and the node re-announced itself
+    announced = node.service_info()
+    properties = dict(announced.properties)
+    properties.update({b"supported_encodings": b'["h264", "h265", "mjpeg"]', b"tags": b'["dock"]', b"stream_port": b"5600"})
+    info = ServiceInfo(announced.type, announced.name, addresses=announced.addresses, port=announced.port,
+                       properties=properties)
+    discovery.update_service(info)
+    assert view.capabilities.supported_encodings == ["h264", "h265", "mjpeg"]
+    assert view.tags == ["dock"] and view.stream_port == 5600
+    assert view.heartbeat_interval == 3.0 and view.telemetry_seq == 12
+    assert view.status.telemetry == {"system": {"cpu_percent": 40}} and view.status.online
+    devices.clear()
+
+
+def test_configure_stream_rejects_roi_outside_sensor(fleet, mock_send_zmq_request):
+    config = {"resolution": "1280x720", "fps": 30.0, "encoding": "h264", "roi": {"x": 1200, "y": 0, "w": 200, "h": 100}}
+    response = client.post("/devices/cam_0/configure", json=config)
+    assert response.status_code == 400
+    mock_send_zmq_request.assert_not_called()
+
+
+def test_concurrent_status_requests_are_coalesced(fleet, monkeypatch):
+    from network_api.src.main import refresh_device_status, device_rpc
+    calls = []
+
+    async def slow_send_zmq_request(address, message, timeout=None):
+        calls.append(message)
+        await asyncio.sleep(0.05)
+        return {"status": "running", "sensors": ["camera_1"]}
+
+    async def scenario():
+        results = await asyncio.gather(*(refresh_device_status(devices["cam_0"]) for _ in range(20)))
+        # A request inside the freshness window is served without a device round trip
+        await refresh_device_status(devices["cam_0"])
+        return results
+
+    monkeypatch.setattr("network_api.src.main.send_zmq_request", slow_send_zmq_request)
+    monkeypatch.setattr(device_rpc, "freshness", 5.0)
+    device_rpc.recent.clear()
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(r.status == "running" for r in results)
+    device_rpc.recent.clear()
+
+
+def test_single_flight_shares_failures_and_survives_cancelled_waiter():
+    from network_api.src.utils import SingleFlight
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise CommunicationError("down")
+
+    async def scenario():
+        flight = SingleFlight()
+        cancelled = asyncio.ensure_future(flight.do("k", failing))
+        waiter = asyncio.ensure_future(flight.do("k", failing))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        with pytest.raises(CommunicationError):
+            await waiter
+        assert flight.in_flight == {}
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_opens_and_probes_with_backoff():
+    from network_api.src.circuit_breaker import CircuitBreaker
+
+    breaker = CircuitBreaker(failure_threshold=2, base_backoff=1.0, max_backoff=4.0)
+    breaker.record_failure(now=0.0)
+    assert breaker.allow(now=0.0)
+    breaker.record_failure(now=0.0)
+    assert breaker.state == "open" and not breaker.allow(now=0.5)
+    # One probe after the backoff; concurrent callers still fail fast
+    assert breaker.allow(now=1.0) and not breaker.allow(now=1.0)
+    breaker.record_failure(now=1.0)
+    assert breaker.backoff == 2.0 and not breaker.allow(now=2.5)
+    assert breaker.allow(now=3.0)
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.backoff == 1.0
+
+
+def test_unreachable_device_times_out_and_trips_breaker(fleet, monkeypatch):
+    from network_api.src.main import device_request, breaker_for
+
+    monkeypatch.setattr("network_api.src.main.BREAKER_FAILURE_THRESHOLD", 2)
+    devices["cam_0"].port = 1  # Nothing listens here, so the REQ never gets a reply
+
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(2):
+            with pytest.raises(DeviceTimeoutError):
+                await device_request(devices["cam_0"], {"type": "get_status"}, timeout=0.1)
+        assert time.monotonic() - started < 1.0
+        with pytest.raises(CircuitOpenError):
+            await device_request(devices["cam_0"], {"type": "get_status"}, timeout=0.1)
+
+    asyncio.run(scenario())
+    assert breaker_for("cam_0").state == "open"
+    response = client.get("/devices/cam_0/status")
+    assert response.json()["circuit_state"] == "open"
+    # Failing fast says nothing new about the device, so its last known status is kept
+    assert response.json()["online"] is True and response.json()["status"] == "running"
+    assert client.get("/devices/cam_0/outputs").status_code == 503
+    breaker_for("cam_0").record_success()
+    assert client.get("/devices/cam_0/outputs").status_code == 504
+
+
+def test_unexpected_probe_error_reopens_breaker(fleet, mock_send_zmq_request):
+    from network_api.src.main import device_request, breaker_for
+    breaker = breaker_for("cam_0")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(now=0.0)  # Opened long ago, so the next call is the half-open probe
+    mock_send_zmq_request.side_effect = ValueError("Undecodable reply")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await device_request(devices["cam_0"], {"type": "get_status"}, timeout=0.1)
+
+    asyncio.run(scenario())
+    # The half-open probe failed, so the breaker opens again instead of staying half-open with its slot taken
+    assert breaker.state == "open" and not breaker.probe_in_flight
+
+
+def test_heartbeat_telemetry_answers_status_without_rpc(fleet, mock_send_zmq_request):
+    telemetry = {"sensors.camera_1.fps": 29.9, "sensors.camera_1.dropped": 0, "system.cpu_percent": 35}
+    response = client.post("/devices/cam_0/heartbeat", json={"seq": 1, "full": True, "interval": 4.0, "telemetry": telemetry})
+    assert response.json() == {"status": "ok"}
+    client.post("/devices/cam_0/heartbeat", json={"seq": 2, "interval": 2.0, "telemetry": {"sensors.camera_1.dropped": 5}})
+    status = client.get("/devices/cam_0/status").json()
+    mock_send_zmq_request.assert_not_called()
+    assert status["telemetry"]["sensors"]["camera_1"] == {"fps": 29.9, "dropped": 5}
+    assert devices["cam_0"].heartbeat_interval == 2.0
+    # A skipped sequence number asks the device for a full snapshot
+    response = client.post("/devices/cam_0/heartbeat", json={"seq": 4, "telemetry": {"system.cpu_percent": 90}})
+    assert response.json()["resync"] is True
+    assert devices["cam_0"].status.telemetry["system"]["cpu_percent"] == 35
+
+
+def test_plain_heartbeat_still_accepted(fleet):
+    response = client.post("/devices/cam_1/heartbeat")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+    assert devices["cam_1"].status.telemetry == {}
+
+
+def test_device_time_series_downsamples_into_tiers():
+    from network_api.src.timeseries import DeviceTimeSeries
+
+    series = DeviceTimeSeries(tiers=((0.0, 10), (10.0, 100)))
+    for second in range(60):
+        series.record(1000.0 + second, {"fps": float(second), "state": "running", "online": True})
+    assert list(series.metrics) == ["fps"]
+    # Raw tier only holds the last 10 seconds, so an older range falls back to 10 s buckets
+    result = series.query("fps", 1000.0, 1060.0, step=20.0)
+    assert result["tier"] == 10.0
+    assert result["mean"] == [9.5, 29.5, 49.5]
+    assert result["min"] == [0.0, 20.0, 40.0] and result["max"] == [19.0, 39.0, 59.0]
+    recent = series.query("fps", 1055.0, 1060.0, step=1.0)
+    assert recent["tier"] == 0.0 and recent["mean"] == [55.0, 56.0, 57.0, 58.0, 59.0]
+    assert series.query("fps", 900.0, 920.0, step=10.0)["mean"] == [None, None]
+
+
+def test_telemetry_history_endpoint(fleet):
+    for seq in range(1, 4):
+        client.post("/devices/cam_0/heartbeat", json={
+            "seq": seq, "full": True, "interval": 1.0, "telemetry": {"sensors.camera_1.fps": 30.0 - seq}
+        })
+    assert client.get("/devices/cam_0/telemetry").json() == {"metrics": ["sensors.camera_1.fps"]}
+    now = time.time()
+    response = client.get("/devices/cam_0/telemetry", params={
+        "metric": "sensors.camera_1.fps", "from": now - 60, "to": now + 1, "step": 61
+    })
+    assert response.status_code == 200
+    assert response.json()["mean"] == [28.0] and response.json()["count"] == [3]
+    assert client.get("/devices/cam_0/telemetry", params={"metric": "nope"}).status_code == 404
+    assert client.get("/devices/cam_0/telemetry", params={
+        "metric": "sensors.camera_1.fps", "from": now, "to": now - 1
+    }).status_code == 400
+
+
+def test_hot_endpoints_serialize_models_directly(fleet):
+    response = client.get("/devices/cam_0/capabilities")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == devices["cam_0"].capabilities.dict()
+    devices["cam_0"].status.telemetry = {"system": {"cpu_percent": 12}}
+    devices["cam_0"].status.updated_at = time.time()
+    assert client.get("/devices/cam_0/status").json()["telemetry"] == {"system": {"cpu_percent": 12}}
+    assert sorted(client.get("/devices").json()) == sorted(devices)
+
+
+def test_device_outputs_listed_and_removed(fleet, mock_send_zmq_request):
+    mock_send_zmq_request.return_value = {"outputs": [{"output": "live", "frames_sent": 3}], "capture": None}
+    response = client.get("/devices/cam_0/outputs")
+    assert response.status_code == 200
+    assert response.json()["outputs"][0]["output"] == "live"
+    assert mock_send_zmq_request.call_args[0][1]["type"] == "get_outputs"
+
+    mock_send_zmq_request.return_value = {"error": "Unknown output: preview"}
+    response = client.delete("/devices/cam_0/outputs/preview")
+    assert response.status_code == 404
+    assert mock_send_zmq_request.call_args[0][1]["output"] == "preview"
+
+
+def test_hash_ring_balances_and_moves_few_keys():
+    from network_api.src.sharding import HashRing
+    keys = [f"node_{i:05d}" for i in range(6000)]
+    members = [f"http://127.0.0.1:{8001 + i}" for i in range(3)]
+    ring = HashRing(members)
+    before = {key: ring.owner(key) for key in keys}
+    counts = [list(before.values()).count(member) for member in members]
+    assert max(counts) < 1.25 * len(keys) / 3
+    ring.add("http://127.0.0.1:8004")
+    moved = [key for key in keys if ring.owner(key) != before[key]]
+    # Only keys taken over by the new member move, about a quarter of them
+    assert all(ring.owner(key) == "http://127.0.0.1:8004" for key in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    ring.remove("http://127.0.0.1:8004")
+    assert {key: ring.owner(key) for key in keys} == before
+
+
+def test_shard_redirects_foreign_devices(fleet):
+    from network_api.src.main import shards
+    from network_api.src.sharding import ShardMap
+    previous = (shards.self_url, shards.ring)
+    try:
+        shards.self_url = "http://api-a:8000"
+        shards.set_members(["http://api-a:8000", "http://api-b:8000"])
+        owned = [device_id for device_id in fleet if shards.owns(device_id)]
+        foreign = [device_id for device_id in fleet if not shards.owns(device_id)]
+        assert owned and foreign
+        response = client.post(f"/devices/{foreign[0]}/heartbeat?x=1", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == f"http://api-b:8000/devices/{foreign[0]}/heartbeat?x=1"
+        assert client.get(f"/devices/{owned[0]}/capabilities").status_code == 200
+        # Fleet-wide routes are served locally
+        assert client.get("/devices").status_code == 200
+        assert not ShardMap(None).enabled and ShardMap(None).owns("anything")
+    finally:
+        shards.self_url, shards.ring = previous
+
+
+@pytest.fixture
+def shard_cluster():
+    import httpx
+    from network_api.src.shard_cluster import member_urls, start_cluster, stop_cluster
+    # Instances have no devices until they are handed some, so discovery is irrelevant here
+    processes = start_cluster(2, 28101)
+    try:
+        with httpx.Client(timeout=10) as http:
+            yield http, member_urls(2, 28101)
+    finally:
+        stop_cluster(processes)
+
+
+def test_sharded_cluster_on_localhost(shard_cluster):
+    http, (first, second) = shard_cluster
+    records = [make_device(f"node_{i:03d}").dict() for i in range(40)]
+    assert http.post(f"{first}/cluster/handoff", json=records).json()["adopted"] == 40
+    # Re-announcing the membership makes the first instance hand over what it doesn't own
+    moved = http.put(f"{first}/cluster/members", json={"members": [first, second]}).json()["moved"]
+    owned = {url: set(http.get(f"{url}/devices").json()) for url in (first, second)}
+    assert len(owned[second]) == moved[second] and 0 < moved[second] < 40
+    assert owned[first] | owned[second] == {record["id"] for record in records}
+    # Heartbeats sent to the wrong instance are redirected to the owner
+    device_id = sorted(owned[second])[0]
+    response = http.post(f"{first}/devices/{device_id}/heartbeat", follow_redirects=True)
+    assert response.status_code == 200 and str(response.url).startswith(second)
+    # Shrinking the cluster moves every device back to the remaining member
+    result = http.put(f"{first}/cluster/members", json={"members": [first]}).json()
+    assert result["errors"] == {}
+    assert len(http.get(f"{first}/devices").json()) == 40
+    assert http.get(f"{second}/devices").json() == []
+
+
+@pytest.fixture
+def recording_device(tmp_path, fleet):
+    import threading
+    from edge_node.src.hardware_abstraction.replay_hal import write_recording
+    from edge_node.src.recordings import RecordingLibrary, RecordingServer
+    # 100 KB frames ten times a second, starting at 1000 s on the wall clock
+    frames = [(bytes([i]) * 100_000, i * 100_000_000, True) for i in range(50)]
+    write_recording(str(tmp_path / "lobby.msrec"), frames, encoding="h264", width=64, height=48,
+                    wall_offset_ns=1_000_000_000_000)
+    server = RecordingServer(RecordingLibrary(str(tmp_path)), host="127.0.0.1", port=28111)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(timeout=10)
+    devices["cam_0"].recordings_port = 28111
+    try:
+        yield "cam_0"
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result(timeout=10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+
+
+def test_recordings_proxied_with_range_requests(recording_device):
+    url = f"/devices/{recording_device}/recordings"
+    index = client.get(f"{url}/index").json()["recordings"]
+    assert index[0]["name"] == "lobby.msrec" and index[0]["frames"] == 50
+    full = client.get(url, params={"from": 1001.0, "to": 1002.0})
+    assert full.status_code == 200 and full.headers["x-clip-frames"] == "10"
+    assert full.headers["accept-ranges"] == "bytes"
+    # Scrubbing fetches only the requested bytes of the clip
+    partial = client.get(url, params={"from": 1001.0, "to": 1002.0}, headers={"Range": "bytes=500000-500099"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 500000-500099/{len(full.content)}"
+    assert partial.content == full.content[500000:500100]
+    assert client.get(url, headers={"Range": "bytes=999999999-"}).status_code == 416
+    assert client.get(url, params={"from": 2000}).status_code == 404
+    assert client.get("/devices/cam_1/recordings").status_code == 404
+
+
+def test_registry_shares_capabilities_and_writes_through_views():
+    from network_api.src.registry import DeviceRegistry
+    registry = DeviceRegistry()
+    for i in range(3):
+        registry[f"cam_{i}"] = make_device(f"cam_{i}", tags=["lobby"])
+    assert len(registry.capabilities) == 1
+    assert registry["cam_0"].capabilities is registry["cam_2"].capabilities
+    view = registry["cam_1"]
+    view.status.status = "error"
+    view.status.telemetry["system"] = {"cpu_percent": 12}
+    view.port = 6000
+    device = registry["cam_1"].to_model()
+    assert isinstance(device, Device)
+    assert device.status.status == "error" and device.port == 6000
+    assert device.status.telemetry == {"system": {"cpu_percent": 12}}
+    assert device.stream_port is None and device.tags == ["lobby"]
+    # Capabilities are released with the last device that reports them
+    for i in range(3):
+        del registry[f"cam_{i}"]
+    assert len(registry.capabilities) == 0 and len(registry) == 0
+
+
+def test_registry_views_do_not_follow_reused_slots():
+    from network_api.src.registry import DeviceRegistry
+    registry = DeviceRegistry()
+    registry["cam_0"] = make_device("cam_0")
+    stale = registry["cam_0"]
+    del registry["cam_0"]
+    registry["cam_1"] = make_device("cam_1")
+    with pytest.raises(KeyError):
+        stale.last_heartbeat
+
+
+def test_registry_sweep_marks_overdue_devices_offline():
+    from network_api.src.registry import DeviceRegistry
+    registry = DeviceRegistry()
+    now = time.time()
+    for device_id, age, interval in (("fresh", 1, None), ("late", 30, None), ("slow", 30, 20.0)):
+        device = make_device(device_id)
+        device.last_heartbeat = now - age
+        device.heartbeat_interval = interval
+        registry[device_id] = device
+    assert registry.sweep(now, 10, 2.0) == ["late"]
+    assert registry["late"].status.status == "offline" and not registry["late"].status.online
+    # A device announcing a long heartbeat interval gets twice that plus grace
+    assert registry["slow"].status.online and registry["fresh"].status.status == "running"
+    assert registry.sweep(now, 10, 2.0) == []
+    registry.record_heartbeat("late", now)
+    assert registry["late"].last_heartbeat == now and registry["late"].status.status == "running"
+    assert registry["late"].status.online and registry.sweep(now, 10, 2.0) == []
+
+
+def test_registry_stores_only_devices():
+    from network_api.src.registry import DeviceRegistry
+    registry = DeviceRegistry()
+    with pytest.raises(TypeError):
+        registry["legacy"] = {"address": "tcp://192.168.1.100:5000"}
+    assert "legacy" not in registry and len(registry) == 0
+
+
+def test_registry_allocation_is_all_or_nothing():
+    import numpy as np
+    from network_api.src.registry import DeviceRegistry
+    registry = DeviceRegistry()
+    registry["cam_0"] = make_device("cam_0")
+    # An outstanding view of the last array to grow stops the allocation after all the others have grown
+    view = np.frombuffer(registry.updated_at)
+    with pytest.raises(BufferError):
+        registry["cam_1"] = make_device("cam_1")
+    del view
+    assert "cam_1" not in registry
+    assert {len(registry.used), len(registry.ports), len(registry.updated_at), len(registry.ids)} == {1}
+    registry["cam_1"] = make_device("cam_1")
+    assert registry["cam_1"].port == 5555 and registry.sweep(time.time(), 10, 2.0) == []
+
+
+def test_registry_writes_from_another_thread_wait_for_sweep():
+    import threading
+    from network_api.src.registry import DeviceRegistry
+    registry = DeviceRegistry()
+    registry["cam_0"] = make_device("cam_0")
+    added = threading.Event()
+
+    def announce():
+        registry["cam_1"] = make_device("cam_1")
+        added.set()
+    # Holding the lock stands in for a sweep in progress on the event loop
+    with registry.lock:
+        thread = threading.Thread(target=announce)
+        thread.start()
+        assert not added.wait(0.1)
+    thread.join(1)
+    assert added.is_set() and registry["cam_1"].status.online
+
+
+def test_configure_checked_against_measured_limits(fleet, mock_send_zmq_request):
+    mock_send_zmq_request.return_value = {"status": "success"}
+    for device_id in ("cam_0", "cam_1"):
+        capabilities = devices[device_id].capabilities.copy(update={"measured_limits": {"1920x1080": {"h264": 12.5}}})
+        devices[device_id].capabilities = capabilities
+    config = StreamConfig(resolution="1920x1080", fps=30.0, encoding="h264")
+    response = client.post("/devices/cam_0/configure", json=config.dict())
+    assert response.status_code == 400 and "measured limit of 12.5 fps" in response.json()["detail"]
+    _, results, summary = bulk_configure({"selector": {"ids": ["cam_1", "cam_2"]}, "config": config.dict()})
+    assert {r["device_id"]: r["status"] for r in results} == {"cam_1": "invalid", "cam_2": "success"}
+    # Combinations the calibration did not cover fall back to the sensor limits
+    config = StreamConfig(resolution="1280x720", fps=30.0, encoding="h264")
+    assert client.post("/devices/cam_0/configure", json=config.dict()).status_code == 200
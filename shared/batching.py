@@ -0,0 +1,179 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .frames import FrameMetadata
+
+
+class FrameBatch(NamedTuple):
+    """
+    A batch of frames as contiguous arrays. frames has shape (N, H, W[, C]);
+    the metadata arrays have length N. All arrays are views of a reusable
+    buffer and stay valid until the batcher has assembled `buffers` more batches.
+    """
+    frames: np.ndarray
+    sensor_ids: np.ndarray
+    sequences: np.ndarray
+    capture_ns: np.ndarray
+    wall_offset_ns: np.ndarray
+    keyframes: np.ndarray
+
+    def __len__(self) -> int:
+        return self.frames.shape[0]
+
+    @property
+    def capture_wall_ns(self) -> np.ndarray:
+        return self.capture_ns + self.wall_offset_ns
+
+
+class BatchBuffer:
+    """
+    Preallocated storage for one batch. Each appended frame is copied exactly
+    once, straight into its slot; strided views such as ROI crops are copied
+    without an intermediate contiguous copy.
+    """
+
+    def __init__(self, batch_size: int, shape: Tuple[int, ...], dtype):
+        self.frames = np.empty((batch_size,) + tuple(shape), dtype=dtype)
+        self.sensor_ids = np.empty(batch_size, dtype=object)
+        self.sequences = np.empty(batch_size, dtype=np.int64)
+        self.capture_ns = np.empty(batch_size, dtype=np.int64)
+        self.wall_offset_ns = np.empty(batch_size, dtype=np.int64)
+        self.keyframes = np.empty(batch_size, dtype=bool)
+        self.count = 0
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        return self.frames.shape[1:]
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.frames.shape[0]
+
+    def append(self, data, metadata: FrameMetadata) -> None:
+        slot = self.count
+        if isinstance(data, np.ndarray):
+            np.copyto(self.frames[slot], data)
+        else:
+            # Encoded or bytes-like payloads are reinterpreted in place, then copied once
+            self.frames[slot] = np.frombuffer(data, dtype=self.frames.dtype).reshape(self.frame_shape)
+        self.sensor_ids[slot] = metadata.sensor_id
+        self.sequences[slot] = metadata.sequence
+        self.capture_ns[slot] = metadata.capture_ns
+        self.wall_offset_ns[slot] = metadata.wall_offset_ns
+        self.keyframes[slot] = metadata.keyframe
+        self.count += 1
+
+    def batch(self) -> FrameBatch:
+        n = self.count
+        return FrameBatch(self.frames[:n], self.sensor_ids[:n], self.sequences[:n],
+                          self.capture_ns[:n], self.wall_offset_ns[:n], self.keyframes[:n])
+
+
+def _frame_shape(data, shape: Optional[Tuple[int, ...]]) -> Tuple[int, ...]:
+    if shape is not None:
+        return tuple(shape)
+    if isinstance(data, np.ndarray):
+        return data.shape
+    raise ValueError("shape is required for non-NumPy frame payloads")
+
+
+class FrameBatcher:
+    """
+    Assembles frames from any consumer (ShmFrameReader, ZmqFrameSubscriber, a
+    HAL) into batches for inference.
+
+    A batch is returned as soon as batch_size frames have arrived, or max_wait
+    seconds after its first frame, whichever comes first, so latency is
+    bounded when the stream is slow. Batches are assembled in a small ring of
+    preallocated buffers: every frame costs one copy into its slot and no
+    stacking is needed. When the frame shape changes (for example after a
+    reconfiguration) the current batch is returned early and the buffers are
+    reallocated for the new shape.
+    """
+
+    def __init__(self, source: Callable[[], Awaitable[Any]], batch_size: int, max_wait: float,
+                 shape: Optional[Tuple[int, ...]] = None, dtype=None, buffers: int = 2):
+        """
+        Args:
+            source (Callable): Coroutine function returning the next frame; anything
+                with .data and .metadata. Frames with a valid() method are dropped if
+                they were overwritten while being copied.
+            batch_size (int): Maximum frames per batch.
+            max_wait (float): Seconds to wait for a batch to fill after its first frame.
+            shape (tuple, optional): Frame shape; inferred from the first NumPy frame.
+            dtype (optional): Frame dtype; inferred from the first NumPy frame, or uint8.
+            buffers (int): Batches kept alive before a buffer is reused.
+        """
+        if batch_size < 1 or buffers < 1:
+            raise ValueError("batch_size and buffers must be at least 1")
+        self.source = source
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.shape = tuple(shape) if shape is not None else None
+        self.dtype = np.dtype(dtype) if dtype is not None else None
+        self.ring: List[BatchBuffer] = []
+        self.ring_size = buffers
+        self.next_buffer = 0
+        self.dropped = 0
+        self._pending = None
+
+    def _buffer(self, data) -> BatchBuffer:
+        shape = _frame_shape(data, self.shape)
+        dtype = self.dtype or (data.dtype if isinstance(data, np.ndarray) else np.dtype(np.uint8))
+        if not self.ring or self.ring[0].frame_shape != shape or self.ring[0].frames.dtype != dtype:
+            self.ring = [BatchBuffer(self.batch_size, shape, dtype) for _ in range(self.ring_size)]
+            self.next_buffer = 0
+        buffer = self.ring[self.next_buffer]
+        self.next_buffer = (self.next_buffer + 1) % len(self.ring)
+        buffer.count = 0
+        return buffer
+
+    def _fits(self, buffer: BatchBuffer, data) -> bool:
+        return _frame_shape(data, self.shape) == buffer.frame_shape
+
+    def _add(self, buffer: BatchBuffer, frame) -> None:
+        buffer.append(frame.data, frame.metadata)
+        if hasattr(frame, 'valid') and not frame.valid():
+            buffer.count -= 1  # The source slot was overwritten mid-copy
+            self.dropped += 1
+
+    async def next_batch(self) -> FrameBatch:
+        """
+        Wait for the next batch.
+
+        Returns:
+            FrameBatch: Between 1 and batch_size frames.
+        """
+        buffer = None
+        deadline = None
+        while buffer is None or not buffer.full:
+            if self._pending is not None:
+                frame, self._pending = self._pending, None
+            else:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(self.source(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if buffer is None:
+                buffer = self._buffer(frame.data)
+            elif not self._fits(buffer, frame.data):
+                if buffer.count:
+                    self._pending = frame  # Starts the next batch with the new shape
+                    break
+                buffer = self._buffer(frame.data)
+            self._add(buffer, frame)
+            if deadline is None and buffer.count:
+                deadline = time.monotonic() + self.max_wait
+        return buffer.batch()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> FrameBatch:
+        return await self.next_batch()
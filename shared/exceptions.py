@@ -39,3 +39,11 @@ class APIError(MiniStreamException):
 
 class GUIError(MiniStreamException):
     """Raised when there's a GUI-related error"""
+
+
+class DeviceTimeoutError(CommunicationError):
+    """Raised when a device does not answer before the request deadline"""
+
+
+class CircuitOpenError(CommunicationError):
+    """Raised when a device's circuit breaker is open and calls fail fast"""
@@ -0,0 +1,129 @@
+import json
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+
+class FrameMetadata(NamedTuple):
+    """
+    Metadata envelope carried alongside every captured frame.
+
+    Capture time is recorded on the monotonic clock of the capturing process
+    together with the wall-clock offset of that clock, so consumers on other
+    hosts can compute latency without trusting the edge node's monotonic epoch.
+    """
+    sensor_id: str
+    sequence: int
+    capture_ns: int
+    wall_offset_ns: int
+    keyframe: bool = True
+    # Named output the frame was rendered for; empty for frames straight from the capture
+    output: str = ""
+
+    @property
+    def stream_id(self) -> str:
+        """Topic of the frame's stream: the sensor id, plus "/<output>" for named outputs."""
+        return f"{self.sensor_id}/{self.output}" if self.output else self.sensor_id
+
+    @property
+    def capture_wall_ns(self) -> int:
+        """Capture time expressed on the wall clock, in nanoseconds."""
+        return self.capture_ns + self.wall_offset_ns
+
+    @property
+    def capture_time(self) -> float:
+        """Capture time expressed on the wall clock, in seconds."""
+        return self.capture_wall_ns / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FrameMetadata":
+        return cls(
+            sensor_id=data['sensor_id'],
+            sequence=int(data['sequence']),
+            capture_ns=int(data['capture_ns']),
+            wall_offset_ns=int(data['wall_offset_ns']),
+            keyframe=bool(data.get('keyframe', True)),
+            output=data.get('output', "")
+        )
+
+
+class Frame(NamedTuple):
+    """A captured frame payload together with its metadata."""
+    data: Any
+    metadata: FrameMetadata
+
+
+class FrameClock:
+    """
+    Monotonic capture clock anchored to the wall clock.
+
+    The offset between the wall clock and the monotonic clock is sampled once
+    and refreshed on demand with resync(), so timestamps never jump backwards
+    when NTP adjusts the system time mid-stream.
+    """
+
+    def __init__(self):
+        self.wall_offset_ns = 0
+        self.resync()
+
+    def resync(self) -> None:
+        """Re-sample the offset between the wall clock and the monotonic clock."""
+        self.wall_offset_ns = time.time_ns() - time.monotonic_ns()
+
+    def now_ns(self) -> int:
+        """Current monotonic time in nanoseconds."""
+        return time.monotonic_ns()
+
+    def wall_now_ns(self) -> int:
+        """Current wall-clock time in nanoseconds, derived from the monotonic clock."""
+        return time.monotonic_ns() + self.wall_offset_ns
+
+
+class FrameStamper:
+    """
+    Assigns per-sensor sequence numbers and capture timestamps to raw frames.
+    HAL implementations call stamp() as close to the capture point as possible.
+    """
+
+    def __init__(self, clock: Optional[FrameClock] = None):
+        self.clock = clock or FrameClock()
+        self._sequences: Dict[str, int] = {}
+
+    def stamp(self, sensor_id: str, data: Any, capture_ns: Optional[int] = None, keyframe: bool = True) -> Frame:
+        """
+        Wrap raw frame data in a Frame envelope.
+
+        Args:
+            sensor_id (str): The sensor that produced the frame.
+            data: The raw frame payload.
+            capture_ns (int, optional): Monotonic capture time if known, defaults to now.
+            keyframe (bool): Whether the payload decodes on its own. Raw frames always
+                do; encoded streams set this False for delta frames.
+
+        Returns:
+            Frame: The stamped frame.
+        """
+        sequence = self._sequences.get(sensor_id, 0)
+        self._sequences[sensor_id] = sequence + 1
+        metadata = FrameMetadata(
+            sensor_id=sensor_id,
+            sequence=sequence,
+            capture_ns=self.clock.now_ns() if capture_ns is None else capture_ns,
+            wall_offset_ns=self.clock.wall_offset_ns,
+            keyframe=keyframe
+        )
+        return Frame(data, metadata)
+
+
+def encode_frame_header(metadata: FrameMetadata, **extra) -> bytes:
+    """Serialize frame metadata (plus any transport-specific fields) for the wire."""
+    header = metadata.to_dict()
+    header.update(extra)
+    return json.dumps(header).encode('utf-8')
+
+
+def decode_frame_header(header: bytes) -> Dict[str, Any]:
+    """Parse a header produced by encode_frame_header()."""
+    return json.loads(header.decode('utf-8'))
@@ -0,0 +1,85 @@
+from typing import Dict, List
+
+from .frames import Frame
+
+DEFAULT_MAX_FRAMES = 300
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def frame_nbytes(frame: Frame) -> int:
+    data = frame.data
+    return data.nbytes if hasattr(data, 'nbytes') else len(data)
+
+
+class GopEntry:
+    """The most recent keyframe of one stream and the delta frames that followed it."""
+
+    def __init__(self, keyframe: Frame):
+        self.frames: List[Frame] = [keyframe]
+        self.nbytes = frame_nbytes(keyframe)
+        self.overflowed = False
+
+
+class GopCache:
+    """
+    Per-stream cache of the current group of pictures, so a late joiner can be
+    sent the last keyframe plus every delta since and start decoding at once
+    instead of waiting for the next keyframe.
+
+    Memory is bounded per stream: if a GOP outgrows max_frames or max_bytes the
+    stream's cache is dropped until the next keyframe arrives, since a GOP with
+    missing deltas cannot be decoded anyway.
+    """
+
+    def __init__(self, max_frames: int = DEFAULT_MAX_FRAMES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.streams: Dict[str, GopEntry] = {}
+
+    def add(self, frame: Frame) -> None:
+        """
+        Record a frame that was just published.
+
+        Args:
+            frame (Frame): The published frame; its payload must not be mutated afterwards.
+        """
+        key = frame.metadata.stream_id
+        if frame.metadata.keyframe:
+            self.streams[key] = GopEntry(frame)
+            return
+        entry = self.streams.get(key)
+        if entry is None or entry.overflowed:
+            return  # No decodable starting point until the next keyframe
+        nbytes = frame_nbytes(frame)
+        if len(entry.frames) >= self.max_frames or entry.nbytes + nbytes > self.max_bytes:
+            entry.frames = []
+            entry.nbytes = 0
+            entry.overflowed = True
+            return
+        entry.frames.append(frame)
+        entry.nbytes += nbytes
+
+    def frames_for(self, topic_prefix: str = "") -> List[Frame]:
+        """
+        Cached frames for every stream whose id starts with topic_prefix, in
+        decode order per stream. An empty prefix matches all streams, mirroring
+        ZMQ subscription semantics.
+        """
+        frames = []
+        for key, entry in self.streams.items():
+            if key.startswith(topic_prefix):
+                frames.extend(entry.frames)
+        return frames
+
+    def discard(self, stream_id: str) -> None:
+        """Drop one stream's cached GOP, e.g. after that output was reconfigured."""
+        self.streams.pop(stream_id, None)
+
+    def clear(self) -> None:
+        self.streams.clear()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            key: {'frames': len(entry.frames), 'bytes': entry.nbytes, 'overflowed': entry.overflowed}
+            for key, entry in list(self.streams.items())
+        }
@@ -0,0 +1,185 @@
+import bisect
+import time
+from typing import Dict, List, Optional
+
+from .frames import FrameMetadata
+
+# Bucket upper bounds in milliseconds, roughly logarithmic from 0.5 ms to 10 s
+DEFAULT_BUCKETS_MS = [
+    0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750,
+    1000, 2000, 5000, 10000
+]
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram. Recording is O(log buckets) and memory is
+    constant regardless of how many samples are observed.
+    """
+
+    def __init__(self, buckets_ms: Optional[List[float]] = None):
+        self.buckets_ms = list(buckets_ms or DEFAULT_BUCKETS_MS)
+        self.counts = [0] * (len(self.buckets_ms) + 1)  # Last bucket is overflow
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = None
+
+    def record(self, latency_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        if self.min_ms is None or latency_ms < self.min_ms:
+            self.min_ms = latency_ms
+        if self.max_ms is None or latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Estimate a percentile as the upper bound of the bucket that contains it.
+
+        Args:
+            p (float): Percentile in the range [0, 100].
+
+        Returns:
+            float: The estimated latency in milliseconds, or None if empty.
+        """
+        if self.count == 0:
+            return None
+        target = p / 100.0 * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target and bucket_count:
+                if index < len(self.buckets_ms):
+                    return min(self.buckets_ms[index], self.max_ms)
+                return self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else None,
+            'min_ms': self.min_ms,
+            'max_ms': self.max_ms,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'buckets_ms': self.buckets_ms,
+            'counts': list(self.counts)
+        }
+
+
+class SequenceTracker:
+    """
+    Detects lost, duplicated and reordered frames from their sequence numbers.
+
+    A sequence number more than reorder_window behind the expected one is not
+    a late frame but a restarted stream, e.g. a reconfigured output counting
+    from 0 again; the tracker resyncs to it.
+    """
+
+    def __init__(self, reorder_window: int = 64):
+        self.reorder_window = reorder_window
+        self.expected = None
+        self.received = 0
+        self.gaps = 0
+        self.lost = 0
+        self.out_of_order = 0
+        self.restarts = 0
+
+    def observe(self, sequence: int) -> int:
+        """
+        Record a received sequence number.
+
+        Returns:
+            int: The number of frames missing immediately before this one.
+        """
+        self.received += 1
+        missing = 0
+        if self.expected is None or sequence == self.expected:
+            self.expected = sequence + 1
+        elif sequence > self.expected:
+            missing = sequence - self.expected
+            self.gaps += 1
+            self.lost += missing
+            self.expected = sequence + 1
+        elif self.expected - sequence > self.reorder_window:
+            self.restarts += 1
+            self.expected = sequence + 1
+        else:
+            # Late or duplicate frame; it was already counted as lost
+            self.out_of_order += 1
+        return missing
+
+    def to_dict(self) -> Dict:
+        return {
+            'received': self.received,
+            'gaps': self.gaps,
+            'lost': self.lost,
+            'out_of_order': self.out_of_order,
+            'restarts': self.restarts
+        }
+
+
+class HopStats:
+    """Latency histogram and sequence-gap counters for one hop of one stream."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.sequence = SequenceTracker()
+
+    def observe(self, metadata: FrameMetadata, now_wall_ns: int) -> float:
+        latency_ms = max(0.0, (now_wall_ns - metadata.capture_wall_ns) / 1e6)
+        self.histogram.record(latency_ms)
+        self.sequence.observe(metadata.sequence)
+        return latency_ms
+
+    def to_dict(self) -> Dict:
+        stats = self.histogram.to_dict()
+        stats.update(self.sequence.to_dict())
+        return stats
+
+
+class LatencyTracker:
+    """
+    Capture-to-hop latency and loss statistics, keyed by hop name and sensor.
+
+    Every stage a frame passes through (streamer, transport, relay, client)
+    calls observe() with the frame's metadata; latency is measured against the
+    wall-clock capture time so hops on different hosts are comparable.
+    """
+
+    def __init__(self):
+        self.hops: Dict[str, Dict[str, HopStats]] = {}
+
+    def observe(self, hop: str, metadata: FrameMetadata, now_wall_ns: Optional[int] = None) -> float:
+        """
+        Record a frame passing through a hop.
+
+        Args:
+            hop (str): Name of the hop, e.g. "streamer" or "transport".
+            metadata (FrameMetadata): The frame's metadata.
+            now_wall_ns (int, optional): Observation time on the wall clock, defaults to now.
+
+        Returns:
+            float: The capture-to-hop latency in milliseconds.
+        """
+        if now_wall_ns is None:
+            now_wall_ns = time.time_ns()
+        sensors = self.hops.setdefault(hop, {})
+        # Named outputs are numbered independently, so sequence gaps are tracked per stream
+        stats = sensors.get(metadata.stream_id)
+        if stats is None:
+            stats = sensors[metadata.stream_id] = HopStats()
+        return stats.observe(metadata, now_wall_ns)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict]]:
+        return {
+            # list() copies atomically, so the snapshot is safe to take from another thread
+            hop: {sensor_id: stats.to_dict() for sensor_id, stats in list(sensors.items())}
+            for hop, sensors in list(self.hops.items())
+        }
+
+    def reset(self) -> None:
+        self.hops.clear()
@@ -30,3 +30,4 @@ def setup_logger(name, log_file, level=logging.INFO, max_size=5*1024*1024, backu
 edge_node_logger = setup_logger('edge_node', 'logs/edge_node.log')
 network_api_logger = setup_logger('network_api', 'logs/network_api.log')
 gui_logger = setup_logger('gui', 'logs/gui.log')
+client_logger = setup_logger('client', 'logs/client.log')
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field
+from typing import Any, List, Dict, Optional, Tuple
 
 class SensorInfo(BaseModel):
     id: str
@@ -7,22 +7,88 @@ class SensorInfo(BaseModel):
     resolutions: List[str]
     max_fps: float
 
+
+class RegionOfInterest(BaseModel):
+    x: int = Field(..., ge=0)
+    y: int = Field(..., ge=0)
+    w: int = Field(..., gt=0)
+    h: int = Field(..., gt=0)
+
+# Name of the output a StreamConfig applies to when none is given
+DEFAULT_OUTPUT = "default"
+
 class StreamConfig(BaseModel):
     resolution: str
     fps: float
     encoding: str
+    roi: Optional[RegionOfInterest] = None
+    output_scale: Optional[float] = Field(None, gt=0, le=1)
+    # Named output stream this configuration applies to; one capture can feed several
+    output: str = DEFAULT_OUTPUT
+
+    def sensor_size(self) -> Tuple[int, int]:
+        """Capture width and height parsed from the resolution string."""
+        width, height = self.resolution.lower().split('x')
+        return int(width), int(height)
+
+    def output_size(self) -> Tuple[int, int]:
+        """
+        Width and height of the frames actually sent, after cropping to the ROI
+        and applying output_scale. Scaled sizes are rounded down to even values
+        since hardware encoders require them.
+        """
+        width, height = (self.roi.w, self.roi.h) if self.roi else self.sensor_size()
+        if self.output_scale and self.output_scale != 1:
+            width = max(2, int(width * self.output_scale) // 2 * 2)
+            height = max(2, int(height * self.output_scale) // 2 * 2)
+        return width, height
+
+    def validate_against(self, sensors: List[SensorInfo],
+                         measured_limits: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        """
+        Check this configuration against the resolutions the sensors support
+        and, if the device was calibrated, the frame rate it measured.
+
+        Args:
+            sensors (List[SensorInfo]): The sensors of the target device.
+            measured_limits (Dict[str, Dict[str, float]], optional): The device's
+                EdgeNodeCapabilities.measured_limits.
+
+        Raises:
+            ValueError: If no sensor supports the resolution, the ROI does not fit in it,
+                the fps exceeds the measured limit or the output name is not usable as
+                a topic suffix.
+        """
+        if not self.output or '/' in self.output:
+            raise ValueError(f"Invalid output name: '{self.output}'")
+        if sensors and not any(self.resolution in sensor.resolutions for sensor in sensors):
+            raise ValueError(f"Resolution {self.resolution} is not supported by any sensor")
+        if self.roi:
+            width, height = self.sensor_size()
+            if self.roi.x + self.roi.w > width or self.roi.y + self.roi.h > height:
+                raise ValueError(f"ROI {self.roi.dict()} exceeds the {self.resolution} sensor frame")
+        limit = (measured_limits or {}).get(self.resolution, {}).get(self.encoding)
+        if limit is not None and self.fps > limit:
+            raise ValueError(f"{self.fps} fps exceeds the measured limit of {limit} fps "
+                             f"for {self.resolution} {self.encoding}")
 
 class EdgeNodeCapabilities(BaseModel):
     node_type: str
     hardware_info: Dict[str, str]
     sensors: List[SensorInfo]
     supported_encodings: List[str]
+    # Highest fps measured by startup calibration, by resolution and encoding; empty if not calibrated
+    measured_limits: Dict[str, Dict[str, float]] = {}
 
 class DeviceStatus(BaseModel):
     id: str
     status: Optional[str] = "running"
     sensors: List[str] = []
     online: bool = True
+    circuit_state: str = "closed"
+    # Latest heartbeat telemetry (fps and drops per sensor, queue depths, host metrics)
+    telemetry: Dict[str, Any] = {}
+    updated_at: Optional[float] = None
 
 class Device(BaseModel):
     id: str
@@ -31,6 +97,15 @@ class Device(BaseModel):
     capabilities: EdgeNodeCapabilities
     status: DeviceStatus
     last_heartbeat: Optional[float] = None
+    tags: List[str] = []
+    heartbeat_interval: Optional[float] = None
+    telemetry_seq: Optional[int] = None
+    # Port of the device's ZMQ frame publisher, if it announced one
+    stream_port: Optional[int] = None
+    # Port answering GOP replay requests of late-joining subscribers, if it announced one
+    replay_port: Optional[int] = None
+    # HTTP port of the device's recordings server, if it serves recordings
+    recordings_port: Optional[int] = None
 
 class EdgeNodeInfo(BaseModel):
     id: str
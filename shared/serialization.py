@@ -0,0 +1,48 @@
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is used without it
+    orjson = None
+
+
+def model_dict(model) -> dict:
+    """Plain dict of a pydantic model under pydantic v1 or v2."""
+    return model.model_dump() if hasattr(model, 'model_dump') else model.dict()
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return model_dict(obj)
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def model_json(model) -> bytes:
+    """
+    Serialize a trusted pydantic model straight to JSON bytes, without
+    re-validating it or building an intermediate dict where pydantic allows.
+    """
+    serializer = getattr(model, '__pydantic_serializer__', None)
+    if serializer is not None:
+        return serializer.to_json(model)
+    return dumps(model.dict())
@@ -0,0 +1,123 @@
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import zmq
+import zmq.asyncio
+
+from .frames import Frame, FrameMetadata, decode_frame_header
+from .logger import client_logger as logger
+
+# Seconds a subscriber waits for the publisher to answer its GOP replay request
+DEFAULT_REPLAY_TIMEOUT = 1.0
+
+
+class ZmqFrameSubscriber:
+    """
+    Consumer side of the edge node's ZmqFrameTransport.
+
+    Payloads are received without copying: NumPy frames are returned as
+    read-only views of the ZMQ message buffer, other payloads as memoryviews.
+
+    Given the publisher's replay address, the subscriber asks for the cached
+    GOPs of its topics as soon as its first live frame proves the
+    subscription is active, and yields them ahead of that frame. Replayed
+    frames already received (e.g. before a reconnect) and live frames the
+    replay already covered are dropped, so decoding can start at once
+    without gaps or repeats.
+    """
+
+    def __init__(self, address: str, topics: Iterable[str] = ("",), context=None,
+                 replay_address: Optional[str] = None, replay_timeout: float = DEFAULT_REPLAY_TIMEOUT):
+        """
+        Connect and subscribe.
+
+        Args:
+            address (str): Publisher address, e.g. "tcp://edge-node:5556".
+            topics (Iterable[str]): Stream id prefixes to subscribe to, e.g. "cam_0" for every
+                output of a sensor or "cam_0/live" for one; "" for all.
+            context (zmq.asyncio.Context, optional): ZMQ context to use.
+            replay_address (str, optional): The publisher's GOP replay address, e.g.
+                "tcp://edge-node:5557"; no replay is requested without one.
+            replay_timeout (float): Seconds to wait for the replay before continuing without it.
+        """
+        self.context = context or zmq.asyncio.Context.instance()
+        self.topics = list(topics)
+        self.socket = self.context.socket(zmq.SUB)
+        for topic in self.topics:
+            self.socket.setsockopt(zmq.SUBSCRIBE, topic.encode('utf-8'))
+        self.socket.connect(address)
+        self.replay_address = replay_address
+        self.replay_timeout = replay_timeout
+        self.last_sequence: Dict[str, int] = {}
+        self.duplicates = 0
+        self.replayed = 0
+        self._replay_pending = replay_address is not None
+        # Last replayed sequence per stream, until live frames move past it
+        self._replayed_to: Dict[str, int] = {}
+        self._ready = deque()
+
+    @staticmethod
+    def _decode(parts) -> Frame:
+        _, header, payload = parts
+        fields = decode_frame_header(header.bytes)
+        data = payload.buffer
+        if 'shape' in fields:
+            data = np.frombuffer(data, dtype=fields['dtype']).reshape(fields['shape'])
+        return Frame(data, FrameMetadata.from_dict(fields))
+
+    async def next_frame(self) -> Frame:
+        """Wait for the next frame not already received."""
+        while True:
+            if self._ready:
+                return self._ready.popleft()
+            frame = self._decode(await self.socket.recv_multipart(copy=False))
+            if self._replay_pending:
+                self._replay_pending = False
+                await self._replay(frame)
+            if self._accept_live(frame):
+                if not self._ready:
+                    return frame
+                self._ready.append(frame)  # After the replayed frames that precede it
+
+    def _accept_live(self, frame: Frame) -> bool:
+        stream_id, sequence = frame.metadata.stream_id, frame.metadata.sequence
+        replayed_to = self._replayed_to.pop(stream_id, None)
+        if replayed_to is not None and sequence <= replayed_to:
+            self._replayed_to[stream_id] = replayed_to
+            self.duplicates += 1
+            return False
+        self.last_sequence[stream_id] = sequence
+        return True
+
+    async def _replay(self, first: Frame) -> None:
+        """Fetch the cached GOPs of every topic and queue the frames that precede first."""
+        socket = self.context.socket(zmq.DEALER)
+        socket.connect(self.replay_address)
+        try:
+            for topic in self.topics:
+                await socket.send(topic.encode('utf-8'))
+            pending = len(self.topics)
+            while pending:
+                if not await socket.poll(self.replay_timeout * 1000, zmq.POLLIN):
+                    logger.warning(f"No GOP replay from {self.replay_address} within {self.replay_timeout}s")
+                    return
+                parts = await socket.recv_multipart(copy=False)
+                if len(parts) == 1:
+                    pending -= 1  # End of one topic's replay
+                    continue
+                frame = self._decode(parts)
+                stream_id, sequence = frame.metadata.stream_id, frame.metadata.sequence
+                if stream_id == first.metadata.stream_id and sequence >= first.metadata.sequence:
+                    continue  # Received live
+                if sequence <= max(self.last_sequence.get(stream_id, -1), self._replayed_to.get(stream_id, -1)):
+                    self.duplicates += 1  # Received before a reconnect, or replayed for an overlapping topic
+                    continue
+                self._replayed_to[stream_id] = self.last_sequence[stream_id] = sequence
+                self.replayed += 1
+                self._ready.append(frame)
+        finally:
+            socket.close(linger=0)
+
+    def close(self) -> None:
+        self.socket.close(linger=0)
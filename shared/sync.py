@@ -0,0 +1,207 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .latency import LatencyHistogram
+
+DEFAULT_TOLERANCE = 0.010
+# Frames buffered per stream while waiting for the other streams to catch up
+DEFAULT_BUFFER_SIZE = 32
+# Transit time samples per window of the offset estimate
+DEFAULT_OFFSET_WINDOW = 300
+# Alignment errors are mostly sub-frame, so the histogram starts finer than the latency one
+ALIGNMENT_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 50, 75, 100]
+
+
+class FrameSet(NamedTuple):
+    """Frames from every synchronized stream captured at (about) the same time."""
+    # Aligned capture time of the set on the local clock, in nanoseconds
+    time_ns: int
+    frames: Dict[str, Any]
+    # Largest difference between the aligned capture times of the frames in the set
+    spread_ns: int
+
+
+class OffsetEstimator:
+    """
+    Estimates the offset from a stream's capture clock to the local clock as
+    the smallest transit time (arrival minus capture) seen over the last one
+    to two windows of frames. The minimum filters out queueing delay; the
+    sliding windows let the estimate follow clock drift in constant memory.
+    """
+
+    def __init__(self, window: int = DEFAULT_OFFSET_WINDOW):
+        self.window = window
+        self.count = 0
+        self.current: Optional[int] = None
+        self.previous: Optional[int] = None
+
+    def observe(self, transit_ns: int) -> None:
+        self.current = transit_ns if self.current is None else min(self.current, transit_ns)
+        self.count += 1
+        if self.count >= self.window:
+            self.previous, self.current, self.count = self.current, None, 0
+
+    @property
+    def offset_ns(self) -> int:
+        candidates = [value for value in (self.previous, self.current) if value is not None]
+        return min(candidates) if candidates else 0
+
+
+class SyncQueue:
+    """Bounded buffer of one stream's frames as (aligned time, frame), oldest first."""
+
+    def __init__(self, buffer_size: int, offset_window: int, offset_ns: int):
+        self.frames: Deque[Tuple[int, Any]] = deque(maxlen=buffer_size)
+        self.estimator = OffsetEstimator(offset_window)
+        self.fixed_offset_ns = offset_ns
+        self.received = 0
+        self.matched = 0
+        self.unmatched = 0
+        self.overflowed = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'received': self.received,
+            'matched': self.matched,
+            'unmatched': self.unmatched,
+            'overflowed': self.overflowed,
+            'buffered': len(self.frames),
+            'offset_ms': (self.estimator.offset_ns + self.fixed_offset_ns) / 1e6
+        }
+
+
+class FrameSynchronizer:
+    """
+    Joins frames from several streams into sets captured at the same time.
+
+    By default the edge nodes' wall clocks are trusted as they are (e.g.
+    when they run PTP or NTP), optionally corrected by a fixed per-stream
+    offset, for example from calibrating the rig against a common flash.
+    With estimate_offsets, each capture time is instead mapped onto the
+    local clock by the stream's estimated transit time from OffsetEstimator,
+    so clocks that disagree or drift still line up. One-way arrival times
+    cannot tell clock offset from network delay, though: a stream whose
+    frames take 20 ms longer to arrive is taken to run 20 ms behind. Only
+    estimate offsets when the streams reach this host over similar paths.
+
+    A set is emitted once every stream has buffered the frame closest in
+    time to the latest of the streams' oldest frames, and only if all the
+    chosen frames lie within tolerance of each other; frames that cannot be
+    part of any set are dropped. Each stream buffers at most buffer_size
+    frames, the oldest being dropped when a stream stalls or lags, so memory
+    stays constant however far apart the clocks drift.
+    """
+
+    def __init__(self, streams: Iterable[str], tolerance: float = DEFAULT_TOLERANCE,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, estimate_offsets: bool = False,
+                 offset_window: int = DEFAULT_OFFSET_WINDOW, offsets: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            streams (Iterable[str]): Names of the streams to synchronize.
+            tolerance (float): Largest difference in seconds between the frames of a set.
+            buffer_size (int): Frames buffered per stream.
+            estimate_offsets (bool): Estimate each stream's clock offset from frame arrival
+                times, for clocks that are not synchronized. Differences in network delay
+                between the streams are mistaken for clock offset.
+            offset_window (int): Frames per window of the offset estimate.
+            offsets (Dict[str, float], optional): Fixed corrections in seconds added to
+                the capture times of the named streams.
+
+        Raises:
+            ValueError: If fewer than two streams are given or buffer_size is below 2.
+        """
+        names = list(streams)
+        if len(names) < 2:
+            raise ValueError("At least two streams are needed to synchronize")
+        if buffer_size < 2:
+            raise ValueError("buffer_size must be at least 2")
+        offsets = offsets or {}
+        self.tolerance_ns = int(tolerance * 1e9)
+        self.estimate_offsets = estimate_offsets
+        self.queues: Dict[str, SyncQueue] = {
+            name: SyncQueue(buffer_size, offset_window, int(offsets.get(name, 0.0) * 1e9)) for name in names
+        }
+        self.sets = 0
+        self.alignment = LatencyHistogram(ALIGNMENT_BUCKETS_MS)
+
+    def push(self, stream: str, frame, arrival_ns: Optional[int] = None) -> List[FrameSet]:
+        """
+        Add a frame of a stream.
+
+        Args:
+            stream (str): The stream the frame belongs to.
+            frame: Anything with .metadata carrying the capture time, usually a Frame.
+            arrival_ns (int, optional): Local wall-clock arrival time, defaults to now.
+
+        Returns:
+            list: The frame sets completed by this frame, oldest first.
+
+        Raises:
+            KeyError: If the stream is not being synchronized.
+        """
+        queue = self.queues[stream]
+        capture_ns = frame.metadata.capture_wall_ns
+        if self.estimate_offsets:
+            queue.estimator.observe((time.time_ns() if arrival_ns is None else arrival_ns) - capture_ns)
+        aligned_ns = capture_ns + queue.estimator.offset_ns + queue.fixed_offset_ns
+        if queue.frames:
+            # A lower offset estimate must not reorder the buffer
+            aligned_ns = max(aligned_ns, queue.frames[-1][0])
+        if len(queue.frames) == queue.frames.maxlen:
+            queue.overflowed += 1
+        queue.frames.append((aligned_ns, frame))
+        queue.received += 1
+        completed = []
+        while True:
+            frame_set = self._match()
+            if frame_set is None:
+                return completed
+            completed.append(frame_set)
+
+    def _match(self) -> Optional[FrameSet]:
+        while all(queue.frames for queue in self.queues.values()):
+            pivot = max(self.queues.values(), key=lambda queue: queue.frames[0][0])
+            target = pivot.frames[0][0]
+            chosen = {}
+            for name, queue in self.queues.items():
+                frames = queue.frames
+                # Frames followed by one still no later than the target can never be the closest
+                while len(frames) > 1 and frames[1][0] <= target:
+                    frames.popleft()
+                    queue.unmatched += 1
+                index = 0
+                if frames[0][0] < target:
+                    if len(frames) == 1:
+                        return None  # A closer frame may still arrive
+                    if frames[1][0] - target < target - frames[0][0]:
+                        index = 1
+                chosen[name] = index
+            times = [self.queues[name].frames[index][0] for name, index in chosen.items()]
+            spread = max(times) - min(times)
+            if spread > self.tolerance_ns:
+                # No frame of some stream is close enough to the pivot's
+                pivot.frames.popleft()
+                pivot.unmatched += 1
+                continue
+            frames = {}
+            for name, index in chosen.items():
+                queue = self.queues[name]
+                if index:
+                    queue.frames.popleft()
+                    queue.unmatched += 1
+                frames[name] = queue.frames.popleft()[1]
+                queue.matched += 1
+            self.sets += 1
+            self.alignment.record(spread / 1e6)
+            return FrameSet(target, frames, spread)
+        return None
+
+    def stats(self) -> Dict:
+        """Sets emitted, the alignment error histogram and per-stream counts and offsets."""
+        return {
+            'sets': self.sets,
+            'tolerance_ms': self.tolerance_ns / 1e6,
+            'alignment_error': self.alignment.to_dict(),
+            'streams': {name: queue.to_dict() for name, queue in self.queues.items()}
+        }
@@ -0,0 +1,124 @@
+from typing import Any, Dict, Optional
+
+SEPARATOR = '.'
+
+
+def flatten_dict(data: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """Flatten nested dictionaries into dotted keys: {"a": {"b": 1}} -> {"a.b": 1}."""
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{SEPARATOR}{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten_dict(value, path))
+        else:
+            flat[path] = value
+    return flat
+
+
+def unflatten_dict(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of flatten_dict()."""
+    data: Dict[str, Any] = {}
+    for path, value in flat.items():
+        node = data
+        *parents, leaf = path.split(SEPARATOR)
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return data
+
+
+class DeltaEncoder:
+    """
+    Delta-encodes successive telemetry snapshots.
+
+    Only keys whose value changed by more than the relative tolerance since
+    the last transmitted value are sent; removed keys are sent as None. Keys
+    given an absolute tolerance, such as noisy host metrics, are compared
+    against it instead. A full snapshot is sent first, every full_every
+    encodes, and whenever the receiver asks for a resync.
+    """
+
+    def __init__(self, tolerance: float = 0.02, full_every: int = 60,
+                 absolute_tolerances: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            tolerance (float): Relative change below which a number counts as unchanged.
+            full_every (int): Encodes between full snapshots.
+            absolute_tolerances (Dict[str, float], optional): Absolute change below which
+                the number under a flattened key counts as unchanged, by key.
+        """
+        self.tolerance = tolerance
+        self.absolute_tolerances = absolute_tolerances or {}
+        self.full_every = full_every
+        self.sent: Dict[str, Any] = {}
+        self.seq = 0
+        # Number of keys that changed in the last encode, whether or not they were sent as a delta
+        self.changed = 0
+        self._since_full = None
+
+    def request_full(self) -> None:
+        self._since_full = None
+
+    def _changed(self, key: str, old: Any, new: Any) -> bool:
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)) \
+                and not isinstance(old, bool) and not isinstance(new, bool):
+            absolute = self.absolute_tolerances.get(key)
+            if absolute is not None:
+                return abs(new - old) > absolute
+            return abs(new - old) > self.tolerance * max(abs(old), abs(new), 1e-9)
+        return old != new
+
+    def encode(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Encode a snapshot relative to what the receiver already has.
+
+        Args:
+            snapshot (dict): The current (possibly nested) telemetry.
+
+        Returns:
+            dict: {"seq", "full", "telemetry"} where telemetry holds flattened changed keys.
+        """
+        flat = flatten_dict(snapshot)
+        self.seq += 1
+        changes = {key: value for key, value in flat.items()
+                   if key not in self.sent or self._changed(key, self.sent[key], value)}
+        changes.update({key: None for key in self.sent if key not in flat})
+        self.changed = len(changes)
+        full = self._since_full is None or self._since_full >= self.full_every
+        if full:
+            delta = dict(flat)
+            self.sent = dict(flat)
+            self._since_full = 0
+        else:
+            delta = changes
+            self.sent.update(delta)
+            for key in [key for key, value in delta.items() if value is None]:
+                self.sent.pop(key, None)
+            self._since_full += 1
+        return {'seq': self.seq, 'full': full, 'telemetry': delta}
+
+
+def apply_delta(state: Dict[str, Any], last_seq: Optional[int], message: Dict[str, Any]) -> Optional[int]:
+    """
+    Apply a DeltaEncoder message to a receiver's flattened state in place.
+
+    Args:
+        state (dict): The receiver's flattened telemetry.
+        last_seq (int, optional): Sequence number of the last applied message.
+        message (dict): The message produced by DeltaEncoder.encode().
+
+    Returns:
+        int: The new sequence number, or None if a message was missed and the
+        sender must resend a full snapshot. State is left untouched in that case.
+    """
+    seq = message.get('seq')
+    if message.get('full'):
+        state.clear()
+    elif last_seq is None or seq != last_seq + 1:
+        return None
+    for key, value in message.get('telemetry', {}).items():
+        if value is None:
+            state.pop(key, None)
+        else:
+            state[key] = value
+    return seq
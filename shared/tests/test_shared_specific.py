@@ -1,2 +1,198 @@
+import sys
+import os
+
+# Add the project root directory to the Python path
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from shared.frames import Frame, FrameMetadata, FrameStamper, encode_frame_header, decode_frame_header
+from shared.latency import LatencyHistogram, SequenceTracker, LatencyTracker
+from shared.gop_cache import GopCache
+from shared.batching import FrameBatcher
+from shared.sync import FrameSynchronizer
+from shared.serialization import dumps, loads, model_json
+from shared.models import DeviceStatus
+from shared.telemetry import DeltaEncoder, apply_delta, unflatten_dict
+
+
 def test_placeholder():
     assert True
+
+
+def test_frame_stamper_sequences_per_sensor():
+    stamper = FrameStamper()
+    first = stamper.stamp("cam_0", b"a")
+    second = stamper.stamp("cam_0", b"b")
+    other = stamper.stamp("cam_1", b"c")
+    assert (first.metadata.sequence, second.metadata.sequence, other.metadata.sequence) == (0, 1, 0)
+    assert second.metadata.capture_ns >= first.metadata.capture_ns
+    assert first.data == b"a"
+
+
+def test_frame_header_round_trip():
+    metadata = FrameMetadata("cam_0", 7, 1000, 5000)
+    header = decode_frame_header(encode_frame_header(metadata, shape=[2, 2]))
+    assert FrameMetadata.from_dict(header) == metadata
+    assert header["shape"] == [2, 2]
+    assert metadata.capture_wall_ns == 6000
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for latency_ms in [1] * 90 + [40] * 10:
+        histogram.record(latency_ms)
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(99) == 40
+    assert histogram.to_dict()["count"] == 100
+
+
+def test_sequence_tracker_counts_gaps():
+    tracker = SequenceTracker()
+    for sequence in [0, 1, 4, 5, 3]:
+        tracker.observe(sequence)
+    assert tracker.gaps == 1
+    assert tracker.lost == 2
+    assert tracker.out_of_order == 1
+
+
+def test_sequence_tracker_resyncs_on_restarted_stream():
+    tracker = SequenceTracker(reorder_window=8)
+    for sequence in [*range(100), 0, 1, 2, 1]:
+        tracker.observe(sequence)
+    # A reconfigured output counts from 0 again; only the repeated frame after the restart is out of order
+    assert tracker.restarts == 1
+    assert tracker.out_of_order == 1 and tracker.lost == 0
+    assert tracker.to_dict()["restarts"] == 1
+
+
+def test_latency_tracker_per_hop():
+    tracker = LatencyTracker()
+    metadata = FrameMetadata("cam_0", 0, 0, 1_000_000_000)
+    latency_ms = tracker.observe("transport", metadata, now_wall_ns=1_020_000_000)
+    assert latency_ms == 20.0
+    assert tracker.snapshot()["transport"]["cam_0"]["count"] == 1
+
+
+def test_gop_cache_keeps_current_gop():
+    stamper = FrameStamper()
+    cache = GopCache()
+    cache.add(stamper.stamp("cam_0", b"delta", keyframe=False))
+    assert cache.frames_for() == []
+    cache.add(stamper.stamp("cam_0", b"key"))
+    cache.add(stamper.stamp("cam_0", b"d1", keyframe=False))
+    cache.add(stamper.stamp("cam_1", b"other"))
+    assert [f.data for f in cache.frames_for("cam_0")] == [b"key", b"d1"]
+    cache.add(stamper.stamp("cam_0", b"key2"))
+    assert [f.data for f in cache.frames_for("cam_0")] == [b"key2"]
+    assert len(cache.frames_for()) == 2
+
+
+def test_gop_cache_is_bounded():
+    stamper = FrameStamper()
+    cache = GopCache(max_frames=3)
+    cache.add(stamper.stamp("cam_0", b"key"))
+    for _ in range(5):
+        cache.add(stamper.stamp("cam_0", b"d", keyframe=False))
+    assert cache.frames_for("cam_0") == []
+    assert cache.stats()["cam_0"]["overflowed"]
+
+
+def test_delta_encoder_sends_only_changes():
+    encoder = DeltaEncoder(tolerance=0.05)
+    state = {}
+    first = encoder.encode({"sensors": {"cam_0": {"fps": 30.0, "dropped": 0}}, "system": {"cpu_percent": 20}})
+    assert first["full"]
+    seq = apply_delta(state, None, first)
+    second = encoder.encode({"sensors": {"cam_0": {"fps": 29.5, "dropped": 3}}, "system": {}})
+    assert second["telemetry"] == {"sensors.cam_0.dropped": 3, "system.cpu_percent": None}
+    seq = apply_delta(state, seq, second)
+    assert unflatten_dict(state) == {"sensors": {"cam_0": {"fps": 30.0, "dropped": 3}}}
+    # A missed delta leaves state untouched and asks for a full snapshot
+    encoder.encode({"sensors": {"cam_0": {"fps": 10.0, "dropped": 3}}})
+    assert apply_delta(state, seq, encoder.encode({"sensors": {}})) is None
+    encoder.request_full()
+    assert apply_delta(state, seq, encoder.encode({"sensors": {"cam_0": {"fps": 10.0}}})) == 5
+    assert state == {"sensors.cam_0.fps": 10.0}
+
+
+def test_serialization_round_trips_models_and_numpy():
+    import numpy as np
+    status = DeviceStatus(id="cam_0", sensors=["camera_1"], telemetry={"fps": 30.0})
+    assert loads(model_json(status)) == status.dict()
+    assert loads(dumps({"status": status, "counts": np.arange(3)})) == {"status": status.dict(), "counts": [0, 1, 2]}
+
+
+def test_frame_batcher_fills_preallocated_batches():
+    import asyncio
+    import numpy as np
+    stamper = FrameStamper()
+    frames = [stamper.stamp("cam_0", np.full((4, 6, 3), i, dtype=np.uint8)) for i in range(5)]
+    frames.append(stamper.stamp("cam_0", np.zeros((8, 6, 3), dtype=np.uint8)[:, ::2]))  # Strided view, new shape
+    frames.append(stamper.stamp("cam_0", np.zeros((2, 2), dtype=np.uint8)))
+    queue = asyncio.Queue()
+
+    async def scenario():
+        for frame in frames:
+            queue.put_nowait(frame)
+        batcher = FrameBatcher(queue.get, batch_size=3, max_wait=0.05)
+        return [await asyncio.wait_for(batcher.next_batch(), 1) for _ in range(4)], batcher
+
+    batches, batcher = asyncio.run(scenario())
+    first, second, third, fourth = batches
+    assert first.frames.shape == (3, 4, 6, 3) and first.frames.flags["C_CONTIGUOUS"]
+    assert list(first.frames[:, 0, 0, 0]) == [0, 1, 2] and list(first.sequences) == [0, 1, 2]
+    assert not np.shares_memory(first.frames, frames[0].data)
+    # The shape of the next frame doesn't match, so the second batch closes with two frames
+    assert second.frames.shape == (2, 4, 6, 3) and list(second.sequences) == [3, 4]
+    assert third.frames.shape == (1, 8, 3, 3) and list(third.capture_wall_ns) == [frames[5].metadata.capture_wall_ns]
+    # A batch that never fills is returned after max_wait
+    assert fourth.frames.shape == (1, 2, 2) and fourth.sensor_ids[0] == "cam_0"
+
+
+def test_frame_synchronizer_follows_drifting_clocks():
+    import random
+    jitter = random.Random(1)
+    interval = 33_333_333
+    arrivals = []
+    for k in range(3000):
+        true_ns = k * interval
+        arrivals.append((true_ns + 5_000_000 + jitter.randrange(3_000_000), "cam_a", k, true_ns))
+        if k % 50 != 7:  # cam_b loses a frame now and then
+            # cam_b's clock is 2 s ahead and runs 200 ppm fast, 20 ms apart by the end
+            arrivals.append((true_ns + 5_000_000 + jitter.randrange(3_000_000), "cam_b", k,
+                             true_ns + 2_000_000_000 + true_ns // 5000))
+    synchronizer = FrameSynchronizer(["cam_a", "cam_b"], tolerance=0.008, estimate_offsets=True, offset_window=30)
+    sets = []
+    for arrival_ns, stream, k, capture_ns in sorted(arrivals):
+        sets += synchronizer.push(stream, Frame(k, FrameMetadata(stream, k, capture_ns, 0)), arrival_ns)
+    assert all(s.frames["cam_a"].data == s.frames["cam_b"].data for s in sets)
+    assert len(sets) >= 2930
+    stats = synchronizer.stats()
+    assert stats["alignment_error"]["max_ms"] <= 8
+    assert stats["streams"]["cam_a"]["unmatched"] >= 59
+
+
+def test_frame_synchronizer_memory_is_bounded_when_a_stream_stalls():
+    synchronizer = FrameSynchronizer(["cam_a", "cam_b"], buffer_size=8, estimate_offsets=False)
+    for k in range(1000):
+        assert synchronizer.push("cam_a", Frame(k, FrameMetadata("cam_a", k, k * 10_000_000, 0))) == []
+    stats = synchronizer.stats()["streams"]["cam_a"]
+    assert stats["buffered"] == 8 and stats["overflowed"] == 992
+    # cam_b catches up far in the future: the stale frames can't match and are dropped
+    sets = synchronizer.push("cam_b", Frame(0, FrameMetadata("cam_b", 0, 20_000_000_000, 0)))
+    assert sets == [] and synchronizer.stats()["streams"]["cam_a"]["buffered"] == 1
+    sets = synchronizer.push("cam_a", Frame(1000, FrameMetadata("cam_a", 1000, 20_002_000_000, 0)))
+    assert [s.frames["cam_a"].data for s in sets] == [1000] and sets[0].spread_ns == 2_000_000
+
+
+def test_frame_synchronizer_trusts_clocks_over_unequal_transit_times():
+    synchronizer = FrameSynchronizer(["cam_a", "cam_b"])
+    sets = []
+    for k in range(100):
+        capture_ns = k * 33_333_333
+        # Synchronized clocks, but cam_b's frames take 24 ms longer to arrive
+        sets += synchronizer.push("cam_a", Frame(k, FrameMetadata("cam_a", k, capture_ns, 0)), capture_ns + 1_000_000)
+        sets += synchronizer.push("cam_b", Frame(k, FrameMetadata("cam_b", k, capture_ns, 0)), capture_ns + 25_000_000)
+    assert [s.frames["cam_a"].data for s in sets] == list(range(100))
+    assert all(s.frames["cam_b"].data == s.frames["cam_a"].data and s.spread_ns == 0 for s in sets)
+    assert synchronizer.stats()["streams"]["cam_b"]["unmatched"] == 0
@@ -6,7 +6,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from network_api.src.main import app
-from shared.models import EdgeNodeCapabilities, SensorInfo, StreamConfig
+from shared.models import Device, DeviceStatus, EdgeNodeCapabilities, SensorInfo, StreamConfig
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -37,9 +37,11 @@ def setup_logging(caplog):
 @pytest.fixture
 def mock_devices(monkeypatch):
     mock_data = {
-        "test_device_1": {
-            "address": "tcp://192.168.1.100:5000",
-            "capabilities": EdgeNodeCapabilities(
+        "test_device_1": Device(
+            id="test_device_1",
+            ip_address="192.168.1.100",
+            port=5000,
+            capabilities=EdgeNodeCapabilities(
                 node_type="jetson",
                 hardware_info={
                     "model": "Jetson Nano",
@@ -50,8 +52,9 @@ def mock_devices(monkeypatch):
                     SensorInfo(id="camera_1", name="Main Camera", resolutions=["1920x1080", "1280x720"], max_fps=30.0)
                 ],
                 supported_encodings=["h264", "h265"]
-            )
-        }
+            ),
+            status=DeviceStatus(id="test_device_1", sensors=["camera_1"])
+        )
     }
     monkeypatch.setattr("network_api.src.main.devices", mock_data)
 
@@ -76,7 +79,7 @@ def test_configure_stream(mock_devices, monkeypatch):
     logger.info(f"Created StreamConfig: {config}")
     
     # Mock the send_zmq_request function to return immediately
-    async def mock_send_zmq_request(address, message):
+    async def mock_send_zmq_request(address, message, timeout=None):
         return {"status": "success"}
     
     monkeypatch.setattr("network_api.src.main.send_zmq_request", mock_send_zmq_request)